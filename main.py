@@ -1,6 +1,6 @@
 import streamlit as st
-import pandas as pd
-from PIL import Image
+
+from rh.logo import LARGURA_EXIBICAO, caminho_logo
 
 # Configuração inicial da página
 st.set_page_config(page_title="Bem-vindo ao Dashboard STOG", layout="wide")
@@ -45,9 +45,8 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Exibir o logo com tamanho ajustado (altere o valor de width conforme necessário)
-logo = Image.open("STOG.png")  # Substituir pelo caminho correto da imagem do logo
-st.image(logo, width=300)  # Ajuste a largura aqui
+# Logo já reduzido (rh/logo.py): o arquivo é entregue como está, sem abrir e recodificar a imagem
+st.image(caminho_logo(), width=LARGURA_EXIBICAO)
 
 # Texto de boas-vindas
 st.markdown("""
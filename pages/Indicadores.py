@@ -1,10 +1,30 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 import datetime as dt
-import plotly.express as px
-import json
-import requests
+import inspect
+import math
+from concurrent.futures import CancelledError
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from rh.armazem import ArmazemIncremental
+from rh.base_preparada import BasePreparada
+from rh.cache_dados import carregar_com_cache, hash_conteudo
+from rh.cache_figuras import CacheFiguras
+from rh import coortes, previsao
+from rh.cubo_turnover import CuboTurnover
+from rh.efetivo import IndiceEfetivoSegmentado
+from rh.fonte_sql import TABELA_PADRAO, URL_PADRAO, VALIDADE_AGREGADOS, VALIDADE_VERSAO, FonteSQL
+from rh.figuras import (figura_municipios, figuras_demografia, figuras_idade_tempo_casa, figuras_localizacao,
+                        figuras_rotatividade)
+from rh.geografia import escolher_nivel, geojson_estados, geojson_microrregioes, geojson_municipios, municipios_disponiveis
+from rh.ingestao import FORMATOS_ACEITOS, LimiteMemoriaExcedido, ler_base, validar_base
+from rh.instrumentacao import Instrumentacao
+from rh.paginacao import TAMANHOS_PAGINA, ConsultaPaginada, colunas_texto
+from rh.registro_bases import memoria_base, registro_processo
+from rh.tarefas import TarefaCancelada, TarefasSegundoPlano, verificar_cancelamento
+from rh.validacao import contar_inconsistencias, sem_quarentena, tabela_quarentena
+from rh import motor
 
 # Configuração inicial do aplicativo
 st.set_page_config(
@@ -14,6 +34,22 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Medição de desempenho opcional (tempo, linhas e memória de cada etapa; painel na barra lateral)
+instrumentacao = st.session_state.setdefault('instrumentacao', Instrumentacao())
+instrumentacao.ativa = st.sidebar.toggle("Medir desempenho", key="medir_desempenho")
+instrumentacao.nova_execucao()
+
+# Filtros das abas Rotatividade e Tendência mantidos enquanto a aba não é renderizada (o Streamlit descarta o
+# estado de widgets que não aparecem em uma execução)
+for chave in ('filtro_genero', 'filtro_funcao', 'tendencia_quebra', 'tendencia_genero', 'tendencia_funcao',
+              'coorte_frequencia', 'sobrevivencia_grupo', 'previsao_dimensao', 'previsao_horizonte',
+              'municipios_estado', 'municipios_nivel'):
+    if chave in st.session_state:
+        st.session_state[chave] = st.session_state[chave]
+
+# Fragmentos (st.fragment) reexecutam só a própria aba quando um filtro muda; sem suporte, roda a página toda
+fragmento = getattr(st, "fragment", lambda funcao: funcao)
+
 # Estilização com CSS (para personalizar fontes e espaçamento)
 st.markdown("""
     <style>
@@ -57,361 +93,759 @@ st.markdown("<p class='sub-text'>Aqui você encontra os principais indicadores s
 # Inicialização das métricas usando st.empty()
 col1, col2, col3 = st.columns(3)
 
-# Função para leitura da base de dados
-def carregar_base_dados(uploaded_file):
-    if uploaded_file is not None:
-        df = pd.read_excel(uploaded_file, sheet_name='BD')
-        return df
-    return None
-
-# Função para calcular as métricas principais
-def calcular_metricas_principais(df):
-    # Converter datas de contratação e desligamento
-    df['Contratado'] = pd.to_datetime(df['Contratado'], errors='coerce')
-    df['Desligado'] = pd.to_datetime(df['Desligado'], errors='coerce')
-
-    hoje = pd.Timestamp.now()
-    ano_atual = hoje.year
-
-    # Calcular colaboradores ativos atualmente
-    colaboradores_ativos = len(df[(df['Contratado'] <= hoje) & ((df['Desligado'].isna()) | (df['Desligado'] > hoje))])
+# Bases já lidas neste processo, uma cópia por conteúdo para todas as sessões (o cache em disco cobre reinícios)
+def _sessao_ativa(sessao):
+    return not Runtime.exists() or Runtime.instance().is_active_session(sessao)
 
-    # Entradas e saídas no ano atual
-    entradas_ano = len(df[df['Contratado'].dt.year == ano_atual])
-    saidas_ano = len(df[df['Desligado'].dt.year == ano_atual])
+def obter_registro_bases():
+    return registro_processo(sessao_ativa=_sessao_ativa)
 
-    # Calcular colaboradores ativos no início e final do ano
-    colaboradores_inicio_ano = len(df[(df['Contratado'] <= f'{ano_atual}-01-01') & 
-                                      ((df['Desligado'].isna()) | (df['Desligado'] > f'{ano_atual}-01-01'))])
-    
-    colaboradores_fim_ano = len(df[(df['Contratado'] <= f'{ano_atual}-12-31') & 
-                                   ((df['Desligado'].isna()) | (df['Desligado'] > f'{ano_atual}-12-31'))])
+def _sessao_atual():
+    contexto = get_script_run_ctx()
+    return None if contexto is None else contexto.session_id
 
-    # Média de colaboradores no período
-    media_colaboradores = (colaboradores_inicio_ano + colaboradores_fim_ano) / 2
-
-    # Cálculo do turnover e taxa de retenção
-    turnover_anual = (saidas_ano / media_colaboradores * 100) if media_colaboradores > 0 else 0
-    taxa_retencao = ((media_colaboradores - saidas_ano) / media_colaboradores * 100) if media_colaboradores > 0 else 100
-
-    return colaboradores_ativos, turnover_anual, taxa_retencao
+# Função para leitura da base de dados (xlsx, csv ou parquet), em blocos e com barra de progresso
+@instrumentacao.instrumentar()
+def carregar_base_dados(uploaded_file):
+    if uploaded_file is not None:
+        # Evita recalcular o hash do arquivo a cada rerun enquanto o upload for o mesmo
+        if st.session_state.get('id_arquivo_base') != uploaded_file.file_id:
+            st.session_state['id_arquivo_base'] = uploaded_file.file_id
+            st.session_state['hash_arquivo'] = hash_conteudo(uploaded_file.getvalue())
+        chave = st.session_state['hash_arquivo']
+        # Chave dos caches derivados (índice, cubo, base preparada); o histórico acumulado a substitui
+        st.session_state['hash_base'] = chave
+
+        def ler():
+            barra = st.progress(0.0, text="Lendo base de dados...")
+
+            def progresso(linhas, fracao):
+                barra.progress(fracao or 0.0, text=f"Lendo base de dados... {linhas} linhas")
+
+            df = carregar_com_cache(
+                uploaded_file.getvalue(),
+                lambda conteudo: ler_base(conteudo, uploaded_file.name, progresso=progresso, validar=True),
+                chave=chave
+            )
+            barra.empty()
+            return validar_base(df)
+
+        # Visão somente leitura da base compartilhada: as funções abaixo reatribuem colunas sem alterá-la
+        return obter_registro_bases().obter_ou_carregar(chave, ler, _sessao_atual())
+    return None
 
+# Objeto derivado da base atual, guardado na entrada dela no registro (descartado junto com a base)
+def _derivado(nome, calcular, parametros=None, memoria=None, chave=None):
+    chave = chave or st.session_state.get('hash_base')
+    if chave is None:
+        return calcular()
+    return obter_registro_bases().derivado(chave, nome, calcular, parametros, memoria)
+
+# Base preparada (datas, tipos compactos, idade e tempo de casa) para cada conteúdo e data de referência
+@instrumentacao.instrumentar()
+def obter_base_preparada(df, data_referencia=None):
+    def preparar():
+        with st.spinner("Preparando base de dados..."):
+            return BasePreparada(sem_quarentena(df), data_referencia)
+
+    return _derivado("base_preparada", preparar, data_referencia, lambda base: base.memoria()['preparada'])
+
+# Linhas em quarentena (rh.validacao), contagem por regra e CSV para download, uma vez por arquivo
+def _quarentena(df):
+    quarentena = tabela_quarentena(df)
+    return quarentena, contar_inconsistencias(df), quarentena.to_csv(index=False).encode("utf-8")
+
+def _memoria_quarentena(resultado):
+    quarentena, regras, csv_quarentena = resultado
+    return memoria_base(quarentena) + len(csv_quarentena)
+
+LINHAS_QUARENTENA_EXIBIDAS = 1_000
+
+def quadro_quarentena(df_arquivo):
+    quarentena, regras, csv_quarentena = _derivado("quarentena", lambda: _quarentena(df_arquivo), memoria=_memoria_quarentena,
+                                                   chave=st.session_state['hash_arquivo'])
+    if quarentena.empty:
+        return
+    st.warning(f"{len(quarentena)} linhas do arquivo estão em quarentena e ficaram fora dos indicadores.")
+    if aba_ativa(6):
+        with st.expander("Linhas em quarentena"):
+            st.dataframe(regras[regras['Linhas'] > 0], hide_index=True)
+            if len(quarentena) > LINHAS_QUARENTENA_EXIBIDAS:
+                st.caption(f"Primeiras {LINHAS_QUARENTENA_EXIBIDAS} linhas; o CSV tem todas.")
+            st.dataframe(quarentena.head(LINHAS_QUARENTENA_EXIBIDAS), hide_index=True)
+            st.download_button("Baixar quarentena (CSV)", csv_quarentena, file_name="quarentena.csv", mime="text/csv")
+
+# Índice de efetivo (busca binária sobre contratações/desligamentos), montado uma vez por base
+@instrumentacao.instrumentar()
+def obter_indice_efetivo(df):
+    return _derivado("indice_efetivo", lambda: IndiceEfetivoSegmentado(df))
+
+# Consulta paginada da aba Base de Dados (guarda ordenações e o último filtro), uma por base
+def obter_consulta_paginada(base):
+    return _derivado("consulta_paginada", lambda: ConsultaPaginada(base.df), base.data_referencia)
+
+# Tabela da base paginada no servidor: só as linhas da página atual são enviadas ao navegador
+@fragmento
+@instrumentacao.instrumentar()
+def grade_base_dados(base):
+    consulta = obter_consulta_paginada(base)
+    colunas = st.multiselect("Colunas exibidas", options=list(consulta.df.columns), default=list(consulta.df.columns), key="grade_colunas")
+    col_filtro, col_ordem, col_sentido, col_tamanho = st.columns([3, 2, 1, 1])
+    filtro = col_filtro.text_input("Filtrar", key="grade_filtro", placeholder="Texto nas colunas de texto exibidas (ex.: Sexo, Função, Cidade)")
+    ordenar_por = col_ordem.selectbox("Ordenar por", options=[None] + colunas, format_func=lambda c: "Ordem original" if c is None else c, key="grade_ordem")
+    decrescente = col_sentido.toggle("Decrescente", key="grade_decrescente")
+    tamanho = col_tamanho.selectbox("Linhas por página", options=TAMANHOS_PAGINA, index=1, key="grade_tamanho")
+
+    colunas_filtro = [coluna for coluna in colunas_texto(consulta.df) if coluna in colunas]
+    total = consulta.total(filtro, colunas_filtro)
+    paginas = max(1, math.ceil(total / tamanho))
+    # Filtro mais restrito ou páginas maiores podem deixar a página atual fora do intervalo
+    if st.session_state.get("grade_pagina", 1) > paginas:
+        st.session_state["grade_pagina"] = paginas
+    numero = st.number_input("Página", min_value=1, max_value=paginas, step=1, key="grade_pagina")
+
+    janela, _ = consulta.pagina(numero - 1, tamanho, colunas, ordenar_por, not decrescente, filtro, colunas_filtro)
+    st.dataframe(janela, use_container_width=True)
+    inicio = (numero - 1) * tamanho
+    st.caption(f"Linhas {min(inicio + 1, total)}–{inicio + len(janela)} de {total} · página {numero} de {paginas}")
+
+# Cache de figuras compartilhado entre sessões (specs serializadas, LRU com limite de memória)
+@st.cache_resource
+def obter_cache_figuras():
+    return CacheFiguras()
+
+# Figuras e valores de uma aba, reaproveitados enquanto a base e os filtros forem os mesmos:
+# `construir` (agregação + plotly) só roda na primeira vez para cada combinação
+def _chave_figuras(nome, filtros):
+    chave_base = st.session_state.get('hash_base')
+    return None if chave_base is None else (chave_base, nome, tuple(str(filtro) for filtro in filtros))
+
+def figuras_em_cache(nome, filtros, construir):
+    with instrumentacao.medir(f"figuras.{nome}"):
+        return obter_cache_figuras().obter(_chave_figuras(nome, filtros), construir)
+
+# Executor dos cálculos em segundo plano, um por processo (rh.tarefas)
+@st.cache_resource
+def obter_tarefas():
+    return TarefasSegundoPlano()
+
+# Espera inicial antes de recorrer ao resultado anterior (recortes rápidos aparecem direto, sem piscar) e
+# intervalo entre as atualizações do aviso durante a espera
+ESPERA_TAREFA = 0.3
+INTERVALO_TAREFA = 0.2
+
+# Espera a tarefa atualizando o aviso: cada atualização envia uma mensagem ao navegador, ponto em que o
+# Streamlit interrompe a execução se um filtro mudou. A execução nova desiste do recorte antigo e a
+# tarefa que ficou sem interessados é cancelada.
+def _esperar_tarefa(tarefa, aviso, mensagem):
+    while True:
+        try:
+            resultado = tarefa.resultado(timeout=INTERVALO_TAREFA)
+            break
+        except TimeoutError:
+            aviso.caption(f"{mensagem} ({tarefa.segundos():.0f} s)")
+        except (CancelledError, TarefaCancelada):
+            # Só acontece quando uma execução mais nova desta sessão já assumiu a seção
+            st.stop()
+    aviso.empty()
+    return resultado
+
+# Como figuras_em_cache, mas o cálculo roda em segundo plano. Enquanto o recorte novo não fica pronto, devolve
+# o último resultado exibido na seção para a mesma base e a tarefa pendente, que a seção passa para
+# aguardar_tarefa depois de desenhar o resultado anterior. Sem resultado anterior, espera aqui mesmo.
+def figuras_em_segundo_plano(nome, filtros, construir):
+    chave = _chave_figuras(nome, filtros)
+    if chave is None:
+        return figuras_em_cache(nome, filtros, construir), None
+
+    interessado = (_sessao_atual(), nome)
+    cache = obter_cache_figuras()
+    exibidos = st.session_state.setdefault('resultados_exibidos', {})
+    prontos = st.session_state.setdefault('resultados_prontos', {})
+    pronto = prontos.pop(nome, None)
+    resultado = pronto[1] if pronto is not None and pronto[0] == chave else cache.consultar(chave)
+    if resultado is not None:
+        obter_tarefas().liberar(interessado)
+        exibidos[nome] = chave
+        return resultado, None
+
+    def calcular():
+        with instrumentacao.medir(f"figuras.{nome}"):
+            return cache.obter(chave, construir)
+
+    tarefa = obter_tarefas().submeter(interessado, chave, calcular)
+    aviso = st.empty()
+    anterior = exibidos.get(nome)
+    anterior = cache.consultar(anterior) if anterior is not None and anterior[0] == chave[0] else None
+    try:
+        resultado = tarefa.resultado(timeout=ESPERA_TAREFA)
+    except TimeoutError:
+        resultado = None
+    except (CancelledError, TarefaCancelada):
+        st.stop()
+    if resultado is None and anterior is None:
+        resultado = _esperar_tarefa(tarefa, aviso, "⏳ Calculando...")
+    if resultado is not None:
+        exibidos[nome] = chave
+        return resultado, None
+
+    aviso.caption("⏳ Recalculando para os filtros atuais; exibindo o resultado anterior.")
+    return anterior, (nome, tarefa, aviso)
+
+# Depois de desenhar o resultado anterior: espera a tarefa e redesenha a seção com o resultado novo
+def aguardar_tarefa(pendente):
+    if pendente is None:
+        return
+    nome, tarefa, aviso = pendente
+    resultado = _esperar_tarefa(tarefa, aviso, "⏳ Recalculando para os filtros atuais; exibindo o resultado anterior")
+    # Guardado para a próxima execução, mesmo que o cache de figuras não o mantenha
+    st.session_state['resultados_prontos'][nome] = (tarefa.chave, resultado)
+    if hasattr(st, "fragment") and get_script_run_ctx().fragment_ids_this_run:
+        st.rerun(scope="fragment")
+    st.rerun()
 
-def calcular_indicadores_turnover(df):
+# Função para calcular as métricas principais
+@instrumentacao.instrumentar()
+def calcular_metricas_principais(df, indice=None):
+    if indice is None:
+        indice = obter_indice_efetivo(df)
+    with instrumentacao.medir("motor.metricas_principais"):
+        metricas = motor.metricas_principais(indice.total)
+    return metricas['colaboradores_ativos'], metricas['turnover_anual'], metricas['taxa_retencao']
+
+
+# Armazém incremental do histórico (um por processo) e o que é lido dele, por versão
+@st.cache_resource
+def obter_armazem():
+    return ArmazemIncremental()
+
+# Linhas do histórico no registro de bases, como as de um arquivo (os derivados ficam na mesma entrada)
+def _dados_armazem(versao):
+    def ler():
+        with st.spinner("Carregando histórico..."):
+            return obter_armazem().dados()
+
+    return obter_registro_bases().obter_ou_carregar(versao, ler, _sessao_atual())
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _cubo_armazem_cacheado(versao):
+    return obter_armazem().cubo()
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _contagens_armazem_cacheadas(versao):
+    return obter_armazem().contagens()
+
+# Fonte SQL (uma por URL e tabela, com o pool de conexões) e os agregados calculados no banco, por versão
+@st.cache_resource
+def obter_fonte_sql(url, tabela):
+    return FonteSQL.de_url(url, tabela)
+
+# A versão é conferida de tempos em tempos; enquanto não muda, os agregados vêm do cache
+@st.cache_data(ttl=VALIDADE_VERSAO, show_spinner=False)
+def _versao_sql(url, tabela):
+    return obter_fonte_sql(url, tabela).versao()
+
+@st.cache_resource(show_spinner="Consultando o banco de dados...", max_entries=2, ttl=VALIDADE_AGREGADOS)
+def _agregados_sql_cacheados(url, tabela, versao):
+    agregados = obter_fonte_sql(url, tabela).agregados()
+    agregados['cubo'] = CuboTurnover(agregados['indice'])
+    return agregados
+
+def obter_agregados_sql():
+    url, tabela = st.session_state['fonte_sql']
+    return _agregados_sql_cacheados(url, tabela, st.session_state['hash_base'])
+
+# Linhas do banco no registro de bases, pela versão da tabela
+def _linhas_sql(url, tabela, versao):
+    def ler():
+        barra = st.progress(0.0, text="Lendo linhas do banco de dados...")
+
+        def progresso(linhas, fracao):
+            barra.progress(fracao or 0.0, text=f"Lendo linhas do banco de dados... {linhas} linhas")
+
+        try:
+            return obter_fonte_sql(url, tabela).ler_linhas(progresso=progresso, validar=True)
+        finally:
+            barra.empty()
+
+    return obter_registro_bases().obter_ou_carregar(versao, ler, _sessao_atual())
+
+# Linhas do banco preparadas, para o que não tem agregado no banco (idade, coortes, previsão e tabela)
+def obter_base_sql():
+    url, tabela = st.session_state['fonte_sql']
+    try:
+        return obter_base_preparada(_linhas_sql(url, tabela, st.session_state['hash_base']), data_referencia)
+    except (LimiteMemoriaExcedido, ValueError, KeyError) as erro:
+        st.error(f"Não foi possível ler as linhas do banco: {erro}")
+        return None
+
+# Cubo de turnover por ano/mês x Sexo x Função, montado a partir do índice de efetivo
+@instrumentacao.instrumentar()
+def obter_cubo_turnover(df):
+    # Com o histórico acumulado, o cubo vem dos agregados mantidos pelo armazém
+    if st.session_state.get('fonte_base') == 'armazem':
+        return _cubo_armazem_cacheado(st.session_state['hash_base'])
+    # Com a fonte SQL, a partir das contagens por dia calculadas no banco
+    if st.session_state.get('fonte_base') == 'sql':
+        return obter_agregados_sql()['cubo']
+    indice = obter_indice_efetivo(df)
+    return _derivado("cubo_turnover", lambda: CuboTurnover(indice))
+
+
+@fragmento
+@instrumentacao.instrumentar()
+def calcular_indicadores_turnover(df, cubo=None):
     st.header("🔄 Indicadores de Rotatividade e Turnover")
 
     # Supondo que a base tenha colunas 'Contratado', 'Desligado', 'Sexo' e 'Função'
-    df['Contratado'] = pd.to_datetime(df['Contratado'], errors='coerce')
-    df['Desligado'] = pd.to_datetime(df['Desligado'], errors='coerce')
+    if cubo is None:
+        cubo = obter_cubo_turnover(df)
 
     # Filtro por gênero (incluir opção 'Todos')
-    generos_disponiveis = ["Todos"] + df['Sexo'].unique().tolist()
-    genero_selecionado = st.selectbox("Selecione o gênero:", options=generos_disponiveis)
-
-    # Aplicar o filtro de gênero
-    if genero_selecionado != "Todos":
-        df_filtrado = df[df['Sexo'] == genero_selecionado]
-    else:
-        df_filtrado = df  # Se 'Todos' for selecionado, usa a base completa
+    generos_disponiveis = ["Todos"] + cubo.valores('Sexo')
+    genero_selecionado = st.selectbox("Selecione o gênero:", options=generos_disponiveis, key="filtro_genero")
 
     # Filtro por função (cargo)
-    funcoes_disponiveis = ["Todos"] + df['Função'].unique().tolist()
-    funcao_selecionada = st.selectbox("Selecione a função:", options=funcoes_disponiveis)
+    funcoes_disponiveis = ["Todos"] + cubo.valores('Função')
+    funcao_selecionada = st.selectbox("Selecione a função:", options=funcoes_disponiveis, key="filtro_funcao")
 
-    # Aplicar o filtro de função
-    if funcao_selecionada != "Todos":
-        df_filtrado = df_filtrado[df_filtrado['Função'] == funcao_selecionada]
+    filtros = {'Sexo': genero_selecionado, 'Função': funcao_selecionada}
 
     # Filtro por ano
-    anos_disponiveis = sorted(list(set(df_filtrado['Contratado'].dt.year.dropna().astype(int)) |
-                                   set(df_filtrado['Desligado'].dt.year.dropna().astype(int))))
+    anos_disponiveis = cubo.anos(filtros)
     ano_selecionado = st.selectbox("Selecione o ano para análise:", options=anos_disponiveis, index=len(anos_disponiveis) - 1)
 
-    # Filtrar contratações e desligamentos no ano selecionado
-    entradas_ano = df_filtrado[df_filtrado['Contratado'].dt.year == ano_selecionado]
-    saidas_ano = df_filtrado[df_filtrado['Desligado'].dt.year == ano_selecionado]
-
-    total_entradas = len(entradas_ano)
-    total_saidas = len(saidas_ano)
-
-    # Calcular colaboradores ativos no início e fim do ano selecionado
-    colaboradores_ativos_inicio = df_filtrado[(df_filtrado['Contratado'] <= f'{ano_selecionado}-01-01') &
-                                              ((df_filtrado['Desligado'].isna()) | (df_filtrado['Desligado'] >= f'{ano_selecionado}-01-01'))]
-    colaboradores_ativos_fim = df_filtrado[(df_filtrado['Contratado'] <= f'{ano_selecionado}-12-31') &
-                                           ((df_filtrado['Desligado'].isna()) | (df_filtrado['Desligado'] >= f'{ano_selecionado}-12-31'))]
-
-    # Média de colaboradores no ano
-    total_colaboradores_medio = (len(colaboradores_ativos_inicio) + len(colaboradores_ativos_fim)) / 2
-
-    # Cálculo do turnover correto
-    turnover_anual = ((total_entradas + total_saidas) / (2 * total_colaboradores_medio)) * 100 if total_colaboradores_medio > 0 else 0
+    # Valores e figuras do recorte selecionado
+    def construir():
+        # Contratações, desligamentos e ativos no início/fim do ano selecionado (fatia do cubo)
+        with instrumentacao.medir("motor.indicadores_turnover"):
+            turnover = motor.indicadores_turnover(cubo, ano_selecionado, filtros)
+        verificar_cancelamento()
+        return {
+            'valores': {
+                'entradas': turnover['entradas'],
+                'saidas': turnover['saidas'],
+                'media_colaboradores': turnover['media_colaboradores'],
+                'turnover_anual': turnover['turnover_anual'],
+            },
+            'figuras': figuras_rotatividade(turnover),
+        }
 
+    resultado, pendente = figuras_em_segundo_plano("rotatividade", (genero_selecionado, funcao_selecionada, ano_selecionado), construir)
+    valores = resultado['valores']
+    figuras = resultado['figuras']
 
     # Estatísticas gerais formatadas como cards
     st.divider()
     st.write("#### Estatísticas Gerais de Rotatividade")
     col1, col2, col3, col4, col5 = st.columns(5)
     col1.metric("Ano Selecionado", f"{ano_selecionado}")
-    col2.metric("Entradas de Colaboradores", f"{total_entradas}")
-    col3.metric("Saídas de Colaboradores", f"{total_saidas}")
-    col4.metric("Média de Colaboradores", f"{total_colaboradores_medio:.2f}")
-    col5.metric("Turnover Anual", f"{turnover_anual:.2f}%")
+    col2.metric("Entradas de Colaboradores", f"{valores['entradas']}")
+    col3.metric("Saídas de Colaboradores", f"{valores['saidas']}")
+    col4.metric("Média de Colaboradores", f"{valores['media_colaboradores']:.2f}")
+    col5.metric("Turnover Anual", f"{valores['turnover_anual']:.2f}%")
     st.divider()
 
-    # Gráfico de barras: Entradas e saídas gerais
-    df_entradas_saidas = pd.DataFrame({
-        'Tipo': ['Entradas', 'Saídas'],
-        'Quantidade': [total_entradas, total_saidas]
-    })
-
-    fig_entradas_saidas = px.bar(
-        df_entradas_saidas,
-        x='Tipo',
-        y='Quantidade',
-        text='Quantidade',
-        labels={'Quantidade': 'Quantidade de Colaboradores', 'Tipo': 'Tipo'},
-        title=f"Entradas e Saídas de Colaboradores ({ano_selecionado})",
-        color='Tipo',
-        color_discrete_map={'Entradas': '#2E8B57', 'Saídas': '#FF6347'}
-    )
-    fig_entradas_saidas.update_traces(texttemplate='%{text}', textposition='outside')
-    fig_entradas_saidas.update_layout(showlegend=False)
-    st.plotly_chart(fig_entradas_saidas, use_container_width=True)
-
-    # Gráfico de linha para entradas e saídas mensais no ano selecionado
-    entradas_mensais = entradas_ano.groupby(entradas_ano['Contratado'].dt.to_period('M')).size().reset_index(name='Contratações')
-    saidas_mensais = saidas_ano.groupby(saidas_ano['Desligado'].dt.to_period('M')).size().reset_index(name='Desligamentos')
-
-    # Convertendo os períodos para strings no formato MM/YY
-    entradas_mensais['Mês'] = entradas_mensais['Contratado'].dt.strftime("%m/%y")
-    saidas_mensais['Mês'] = saidas_mensais['Desligado'].dt.strftime("%m/%y")
-
-    # Gerar um DataFrame com todos os meses do ano e preencher dados ausentes com 0
-    meses_ano = pd.date_range(start=f'{ano_selecionado}-01-01', end=f'{ano_selecionado}-12-31', freq='M').strftime("%m/%y")
-    timeline_df = pd.DataFrame({'Mês': meses_ano}).merge(
-        entradas_mensais[['Mês', 'Contratações']], on='Mês', how='left'
-    ).merge(
-        saidas_mensais[['Mês', 'Desligamentos']], on='Mês', how='left'
-    ).fillna(0)
-
-    # Converter para int (evitar números decimais no gráfico)
-    timeline_df['Contratações'] = timeline_df['Contratações'].astype(int)
-    timeline_df['Desligamentos'] = timeline_df['Desligamentos'].astype(int)
-
-    # Gráfico de linha para os meses do ano selecionado
-    fig_timeline = px.line(
-        timeline_df,
-        x='Mês',
-        y=['Contratações', 'Desligamentos'],
-        labels={'value': 'Quantidade', 'Mês': 'Mês'},
-        title="Entradas e Saídas de Colaboradores ao Longo do Ano",
-        markers=True
-    )
-    fig_timeline.update_layout(
-        yaxis_title='Quantidade',
-        xaxis_title='Mês',
-        legend_title_text='Indicador',
-        hovermode='x unified'
-    )
-    st.plotly_chart(fig_timeline, use_container_width=True)
-
-    # Se "Todos" for selecionado no filtro de gênero, mostrar comparação por gênero
-    if genero_selecionado == "Todos":
-        turnover_quantidades = {"Masculino": {"Entradas": 0, "Saídas": 0}, "Feminino": {"Entradas": 0, "Saídas": 0}}
-
-        for genero in ["Masculino", "Feminino"]:
-            df_genero = df[df['Sexo'] == genero]
-
-            # Aplicar o filtro de função
-            if funcao_selecionada != "Todos":
-                df_genero = df_genero[df_genero['Função'] == funcao_selecionada]
-
-            # Filtrar entradas e saídas no ano selecionado
-            entradas_genero = len(df_genero[df_genero['Contratado'].dt.year == ano_selecionado])
-            saidas_genero = len(df_genero[df_genero['Desligado'].dt.year == ano_selecionado])
-
-            turnover_quantidades[genero]["Entradas"] = entradas_genero
-            turnover_quantidades[genero]["Saídas"] = saidas_genero
-
-        # Preparar os dados para o gráfico
-        df_grafico_genero = pd.DataFrame({
-            "Gênero": ["Masculino", "Masculino", "Feminino", "Feminino"],
-            "Tipo": ["Entradas", "Saídas", "Entradas", "Saídas"],
-            "Quantidade": [
-                turnover_quantidades["Masculino"]["Entradas"],
-                turnover_quantidades["Masculino"]["Saídas"],
-                turnover_quantidades["Feminino"]["Entradas"],
-                turnover_quantidades["Feminino"]["Saídas"]
-            ]
-        })
-
-        # Exibir o gráfico de comparação por gênero
+    st.plotly_chart(figuras['entradas_saidas'], use_container_width=True)
+    st.plotly_chart(figuras['timeline'], use_container_width=True)
+
+    # Exibir o gráfico de comparação por gênero
+    if 'genero' in figuras:
         st.subheader("📊 Comparação de Entradas e Saídas por Gênero")
-        fig_genero = px.bar(
-            df_grafico_genero,
-            x="Tipo",
-            y="Quantidade",
-            color="Gênero",
-            barmode="group",
-            title=f'Comparação de Entradas e Saídas de Colaboradores por Gênero ({ano_selecionado})',
-            labels={"Quantidade": "Quantidade de Colaboradores", "Tipo": "Tipo"},
-            color_discrete_map={"Masculino": "#1f77b4", "Feminino": "#FF69B4"}
+        st.plotly_chart(figuras['genero'], use_container_width=True)
+
+    aguardar_tarefa(pendente)
+
+
+
+
+
+
+# Turnover, retenção e variação líquida em janelas móveis de 12 meses, para todo o histórico
+@fragmento
+@instrumentacao.instrumentar()
+def tendencia_rotatividade(df, cubo=None):
+    if cubo is None:
+        cubo = obter_cubo_turnover(df)
+
+    col1, col2, col3 = st.columns(3)
+    quebra = col1.radio("Detalhar por:", options=["Nenhum", "Sexo", "Função"], horizontal=True, key="tendencia_quebra")
+    # O filtro da própria coluna detalhada fica desabilitado
+    genero = col2.selectbox("Gênero:", options=["Todos"] + cubo.valores('Sexo'), key="tendencia_genero",
+                            disabled=quebra == "Sexo")
+    funcao = col3.selectbox("Função:", options=["Todos"] + cubo.valores('Função'), key="tendencia_funcao",
+                            disabled=quebra == "Função")
+    filtros = {'Sexo': genero, 'Função': funcao}
+    if quebra != "Nenhum":
+        filtros[quebra] = "Todos"
+
+    def construir():
+        # Plotly só é importado quando uma aba desenha a primeira figura (não pesa na abertura da página)
+        import plotly.express as px
+
+        with instrumentacao.medir("motor.tendencia_movel"):
+            tendencia = motor.tendencia_movel(cubo, None if quebra == "Nenhum" else quebra, filtros)
+        verificar_cancelamento()
+
+        figuras = []
+        for indicador, titulo, eixo in [
+            ('Turnover 12m', "Turnover nos Últimos 12 Meses", "Turnover (%)"),
+            ('Retenção 12m', "Retenção nos Últimos 12 Meses", "Retenção (%)"),
+            ('Variação líquida 12m', "Variação Líquida do Quadro nos Últimos 12 Meses", "Colaboradores"),
+        ]:
+            fig = px.line(
+                tendencia,
+                x='Mês',
+                y=indicador,
+                color='Segmento' if quebra != "Nenhum" else None,
+                labels={indicador: eixo, 'Mês': 'Mês'},
+                title=titulo,
+                hover_data=['Contratações 12m', 'Desligamentos 12m', 'Média de colaboradores'],
+            )
+            fig.update_layout(hovermode='x unified')
+            figuras.append(fig)
+        return {'vazio': tendencia.empty, 'figuras': figuras}
+
+    resultado, pendente = figuras_em_segundo_plano("tendencia", (quebra, genero, funcao), construir)
+    if resultado['vazio']:
+        st.info("A base precisa de pelo menos 12 meses de histórico para a tendência.")
+    for figura in resultado['figuras']:
+        st.plotly_chart(figura, use_container_width=True)
+    aguardar_tarefa(pendente)
+
+
+# Ajustes dos modelos de previsão por hash da série (memória + disco), compartilhados entre sessões
+@st.cache_resource
+def obter_cache_modelos():
+    return previsao.CacheModelos()
+
+# Histórico e previsão de todas as séries de uma dimensão; só as séries novas ou alteradas são ajustadas
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _previsoes_cacheadas(chave, dimensao, data_referencia, horizonte, _df):
+    barra = st.progress(0.0, text="Ajustando modelos de previsão...")
+    try:
+        return previsao.prever_dimensao(
+            _df, dimensao, data_referencia, horizonte, cache=obter_cache_modelos(),
+            progresso=lambda feitas, total: barra.progress(feitas / total, text=f"Ajustando modelos de previsão ({feitas}/{total})..."),
         )
-        fig_genero.update_traces(texttemplate='%{y}', textposition='outside')
-        st.plotly_chart(fig_genero, use_container_width=True)
+    finally:
+        barra.empty()
+
+def obter_previsoes(df, dimensao, horizonte):
+    chave = st.session_state.get('hash_base')
+    if chave is None:
+        return previsao.prever_dimensao(df, dimensao, data_referencia, horizonte, cache=obter_cache_modelos())
+    return _previsoes_cacheadas(chave, dimensao, data_referencia, horizonte, df)
+
+
+# Previsão de contratações, desligamentos e headcount por Função ou Estado
+@fragmento
+@instrumentacao.instrumentar()
+def previsao_quadro(df):
+    col1, col2 = st.columns(2)
+    dimensao = col1.radio("Prever por:", options=previsao.DIMENSOES, horizontal=True, key="previsao_dimensao")
+    # Valor inicial pelo session_state, já que o horizonte é mantido ao trocar de aba
+    st.session_state.setdefault("previsao_horizonte", previsao.HORIZONTE_MESES)
+    horizonte = col2.slider("Horizonte (meses):", min_value=3, max_value=24, key="previsao_horizonte")
+
+    with instrumentacao.medir("previsao.prever_dimensao", len(df)):
+        tabela, estatisticas = obter_previsoes(df, dimensao, horizonte)
+    if tabela.empty:
+        st.info("Não há histórico suficiente até a data de referência para as previsões.")
+        return
+    st.caption(
+        f"{estatisticas['series']} séries ({estatisticas['ajustadas']} ajustadas no cálculo, as demais reaproveitadas do cache de modelos) · "
+        f"modelo: {', '.join(estatisticas['modelos'])}"
+    )
 
+    valores = list(tabela['Valor'].unique())
+    valor = st.selectbox(f"{dimensao}:", options=valores, key=f"previsao_valor_{dimensao}")
+
+    def construir():
+        import plotly.express as px
+
+        recorte = tabela[tabela['Valor'] == valor]
+        # Últimos 3 anos de histórico e o horizonte previsto
+        inicio = recorte['Mês'].max() - pd.DateOffset(months=36 + horizonte)
+        recorte = recorte[recorte['Mês'] >= inicio]
+        futuro = recorte[recorte['Tipo'] == "Previsão"]
+
+        figuras = []
+        for serie in previsao.SERIES:
+            dados = recorte[recorte['Série'] == serie]
+            fig = px.line(
+                dados,
+                x='Mês',
+                y='Quantidade',
+                color='Tipo',
+                labels={'Quantidade': serie, 'Mês': 'Mês'},
+                title=f"{serie} — {valor}",
+                color_discrete_map={'Histórico': '#1f77b4', 'Previsão': '#FF7F0E'},
+            )
+            # Faixa do intervalo de 95% da previsão
+            intervalo = dados[dados['Tipo'] == "Previsão"]
+            fig.add_scatter(x=intervalo['Mês'], y=intervalo['Superior'], mode='lines', line_width=0,
+                            showlegend=False, hoverinfo='skip')
+            fig.add_scatter(x=intervalo['Mês'], y=intervalo['Inferior'], mode='lines', line_width=0, fill='tonexty',
+                            fillcolor='rgba(255, 127, 14, 0.2)', name='Intervalo de 95%', hoverinfo='skip')
+            fig.update_layout(hovermode='x unified', legend_title_text='')
+            figuras.append(fig)
+
+        return {
+            'valores': {
+                'contratacoes': float(futuro.loc[futuro['Série'] == "Contratações", 'Quantidade'].sum()),
+                'desligamentos': float(futuro.loc[futuro['Série'] == "Desligamentos", 'Quantidade'].sum()),
+                'headcount': float(futuro.loc[futuro['Série'] == "Headcount", 'Quantidade'].iloc[-1]),
+            },
+            'figuras': figuras,
+        }
 
+    chave_previsao = (dimensao, valor, horizonte, data_referencia, estatisticas['modelos'])
+    resultado = figuras_em_cache("previsao", chave_previsao, construir)
+    valores_previstos = resultado['valores']
 
+    st.divider()
+    col1, col2, col3 = st.columns(3)
+    col1.metric(f"Contratações previstas ({horizonte} meses)", f"{valores_previstos['contratacoes']:.0f}")
+    col2.metric(f"Desligamentos previstos ({horizonte} meses)", f"{valores_previstos['desligamentos']:.0f}")
+    col3.metric("Headcount ao fim do horizonte", f"{valores_previstos['headcount']:.0f}")
+    st.divider()
 
+    for figura in resultado['figuras']:
+        st.plotly_chart(figura, use_container_width=True)
 
+    st.subheader(f"Resumo por {dimensao}")
+    st.dataframe(previsao.resumo_previsoes(tabela), use_container_width=True)
 
-def indicadores_demograficos(df):
-    if df is not None:
-        # Calcular indicadores demográficos
-        dist_genero = df['Sexo'].value_counts(normalize=True) * 100
-        dist_estado_civil = df['Casado'].value_counts(normalize=True) * 100
-        tem_filhos = df['Tem filhos'].value_counts(normalize=True) * 100
-
-        # Gráfico 1: Distribuição de Gênero
-        genero_data = {
-            "Gênero": ['Masculino', 'Feminino'],
-            "Percentual": [dist_genero.get('Masculino', 0), dist_genero.get('Feminino', 0)]
-        }
-        fig_genero = px.bar(
-            genero_data, 
-            x="Percentual", 
-            y="Gênero", 
-            orientation='h', 
-            title="Distribuição de Gênero dos Colaboradores", 
-            labels={"Percentual": "Percentual (%)", "Gênero": "Gênero"},
-            color="Gênero",
-            color_discrete_sequence=["skyblue", "pink"]
-        )
-        st.plotly_chart(fig_genero)
 
-        # Gráfico 2: Estado Civil
-        estado_civil_data = {
-            "Estado Civil": ['Casado', 'Solteiro'],
-            "Percentual": [dist_estado_civil.get('Sim', 0), dist_estado_civil.get('Não', 0)]
-        }
-        fig_estado_civil = px.bar(
-            estado_civil_data, 
-            x="Percentual", 
-            y="Estado Civil", 
-            orientation='h', 
-            title="Distribuição por Estado Civil", 
-            labels={"Percentual": "Percentual (%)", "Estado Civil": "Estado Civil"},
-            color="Estado Civil",
-            color_discrete_sequence=["lightcoral", "lightgreen"]
-        )
-        st.plotly_chart(fig_estado_civil)
+@instrumentacao.instrumentar()
+def indicadores_demograficos(df, contagens=None):
+    if df is not None or contagens is not None:
+        def construir():
+            # Calcular indicadores demográficos
+            with instrumentacao.medir("motor.distribuicoes_demograficas", None if df is None else len(df)):
+                distribuicoes = motor.distribuicoes_demograficas(df, contagens)
+            return {'figuras': figuras_demografia(distribuicoes)}
 
-        # Gráfico 3: Dependentes (Com ou Sem Filhos)
-        filhos_data = {
-            "Categoria": ['Com Filhos', 'Sem Filhos'],
-            "Percentual": [tem_filhos.get('Sim', 0), tem_filhos.get('Não', 0)]
-        }
-        fig_filhos = px.bar(
-            filhos_data, 
-            x="Percentual", 
-            y="Categoria", 
-            orientation='h', 
-            title="Distribuição de Dependentes (Com ou Sem Filhos)", 
-            labels={"Percentual": "Percentual (%)", "Categoria": "Categoria"},
-            color="Categoria",
-            color_discrete_sequence=["orange", "lightblue"]
-        )
-        st.plotly_chart(fig_filhos)
+        for figura in figuras_em_cache("demografia", (), construir)['figuras']:
+            st.plotly_chart(figura)
     else:
         st.error("Por favor, carregue a base de dados na aba 'Base de Dados' para visualizar os indicadores.")
 
+@instrumentacao.instrumentar()
 def indicadores_idade_tempo_casa(df):
     if df is not None:
-        # Convertendo datas
-        df['Data de Nascimento'] = pd.to_datetime(df['Data de Nascimento'], errors='coerce')
-        df['Contratado'] = pd.to_datetime(df['Contratado'], errors='coerce')
+        # Indicadores e figuras de idade e tempo de casa (dependem da data de referência)
+        def construir():
+            with instrumentacao.medir("motor.indicadores_idade_tempo_casa", len(df)):
+                indicadores = motor.indicadores_idade_tempo_casa(df)
 
-        # Calculando a idade atual e o tempo de casa
-        hoje = dt.datetime.now()
-        df['Idade Atual'] = df['Data de Nascimento'].apply(lambda x: hoje.year - x.year if pd.notnull(x) else None)
-        df['Tempo de Casa (anos)'] = df['Contratado'].apply(lambda x: (hoje - x).days / 365 if pd.notnull(x) else None)
+            return {
+                'valores': {chave: indicadores[chave] for chave in ('idade_media', 'idade_max', 'idade_min', 'tempo_casa_medio')},
+                'figuras': figuras_idade_tempo_casa(indicadores),
+            }
 
-        # Indicadores de idade e tempo de casa
-        idade_media = df['Idade Atual'].mean()
-        idade_max = df['Idade Atual'].max()
-        idade_min = df['Idade Atual'].min()
-        tempo_casa_medio = df['Tempo de Casa (anos)'].mean()
+        resultado = figuras_em_cache("idade_tempo_casa", (data_referencia,), construir)
+        valores = resultado['valores']
 
         # Exibindo indicadores de forma simplificada
         st.divider()
         st.write(""" ##### Indicadores Gerais de Idade e Tempo de Casa""")
         col1, col2, col3, col4 = st.columns(4)
         
-        col1.metric("Idade Média", f"{idade_media:.2f} anos")
-        col2.metric("Idade Máxima", f"{idade_max:.0f} anos")
-        col3.metric("Idade Mínima", f"{idade_min:.0f} anos")
-        col4.metric("Tempo Médio de Casa", f"{tempo_casa_medio:.2f} anos")
+        col1.metric("Idade Média", f"{valores['idade_media']:.2f} anos")
+        col2.metric("Idade Máxima", f"{valores['idade_max']:.0f} anos")
+        col3.metric("Idade Mínima", f"{valores['idade_min']:.0f} anos")
+        col4.metric("Tempo Médio de Casa", f"{valores['tempo_casa_medio']:.2f} anos")
         st.divider()
 
-        # Preparar distribuições
-        faixas_etarias = pd.cut(df['Idade Atual'], bins=[0, 30, 40, 50, 100], labels=['Até 30', '31-40', '41-50', 'Acima de 50'])
-        dist_faixas_etarias = faixas_etarias.value_counts(normalize=True).reset_index()
-        dist_faixas_etarias.columns = ['Faixa Etária', 'Percentual']
-        dist_faixas_etarias['Percentual'] *= 100  # Corrigir percentual
-
-        faixas_tempo_casa = pd.cut(df['Tempo de Casa (anos)'], bins=[0, 1, 3, 5, 100], labels=['Até 1 ano', '1-3 anos', '3-5 anos', 'Acima de 5 anos'])
-        dist_faixas_tempo_casa = faixas_tempo_casa.value_counts(normalize=True).reset_index()
-        dist_faixas_tempo_casa.columns = ['Faixa de Tempo de Casa', 'Percentual']
-        dist_faixas_tempo_casa['Percentual'] *= 100  # Corrigir percentual
-
-        # Gráficos com plotly
-        fig_faixas_etarias = px.bar(
-            dist_faixas_etarias,
-            x='Faixa Etária',
-            y='Percentual',
-            text='Percentual',
-            labels={'Percentual': 'Percentual (%)'},
-            title="Distribuição por Faixas Etárias",
+        for figura in resultado['figuras']:
+            st.plotly_chart(figura, use_container_width=True)
+
+    else:
+        st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
+
+
+# Retenção por coorte de contratação e curvas de sobrevivência do tempo de casa
+@fragmento
+@instrumentacao.instrumentar()
+def retencao_coortes(df):
+    st.divider()
+    st.subheader("📅 Retenção por Coorte de Contratação")
+    col1, col2 = st.columns(2)
+    frequencia = col1.radio("Coortes:", options=["Anuais", "Mensais"], horizontal=True, key="coorte_frequencia")
+    grupo = col2.radio("Curvas de sobrevivência por:", options=["Nenhum", "Sexo", "Função"], horizontal=True,
+                       key="sobrevivencia_grupo")
+
+    def construir():
+        import plotly.express as px
+
+        freq = "Y" if frequencia == "Anuais" else "M"
+        with instrumentacao.medir("coortes.matriz_retencao", len(df)):
+            matriz = coortes.matriz_retencao(df, data_referencia, freq)
+        verificar_cancelamento()
+        with instrumentacao.medir("coortes.sobrevivencia_tempo_casa", len(df)):
+            curvas = coortes.sobrevivencia_tempo_casa(df, data_referencia, None if grupo == "Nenhum" else grupo)
+        verificar_cancelamento()
+
+        unidade = "Anos" if freq == "Y" else "Meses"
+        percentuais = matriz.drop(columns="Contratados")
+        fig_coortes = px.imshow(
+            percentuais,
+            labels={'x': f'{unidade} desde a contratação', 'y': 'Coorte', 'color': 'Retidos (%)'},
+            x=[str(coluna) for coluna in percentuais.columns],
+            y=list(percentuais.index),
+            color_continuous_scale="Blues",
+            zmin=0,
+            zmax=100,
+            aspect="auto",
+            text_auto='.0f' if freq == "Y" else False,
+            title="Percentual de Cada Coorte Ainda Ativo",
         )
-        fig_faixas_etarias.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-        fig_faixas_etarias.update_layout(yaxis_title='Percentual (%)', showlegend=False)
-
-        fig_faixas_tempo_casa = px.bar(
-            dist_faixas_tempo_casa,
-            x='Faixa de Tempo de Casa',
-            y='Percentual',
-            text='Percentual',
-            labels={'Percentual': 'Percentual (%)'},
-            title="Distribuição por Faixas de Tempo de Casa",
+
+        fig_sobrevivencia = px.line(
+            curvas,
+            x='Meses',
+            y='Sobrevivência',
+            color='Grupo' if grupo != "Nenhum" else None,
+            labels={'Sobrevivência': 'Ainda ativos (%)', 'Meses': 'Meses de casa'},
+            title="Curva de Sobrevivência do Tempo de Casa (Kaplan-Meier)",
+            hover_data=['Em risco', 'Desligamentos'],
         )
-        fig_faixas_tempo_casa.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-        fig_faixas_tempo_casa.update_layout(yaxis_title='Percentual (%)', showlegend=False)
+        fig_sobrevivencia.update_layout(hovermode='x unified', yaxis_range=[0, 100])
 
-        st.plotly_chart(fig_faixas_etarias, use_container_width=True)
-        st.plotly_chart(fig_faixas_tempo_casa, use_container_width=True)
+        medianas = coortes.mediana_tempo_casa(curvas)
+        return {
+            'medianas': {str(chave): (None if pd.isna(valor) else int(valor)) for chave, valor in medianas.items()},
+            'figuras': [fig_coortes, fig_sobrevivencia],
+        }
+
+    resultado, pendente = figuras_em_segundo_plano("coortes", (frequencia, grupo, data_referencia), construir)
+    st.plotly_chart(resultado['figuras'][0], use_container_width=True)
+    st.plotly_chart(resultado['figuras'][1], use_container_width=True)
+
+    # Mediana do tempo de casa: meses até metade dos contratados ter saído
+    medianas = list(resultado['medianas'].items())[:6]
+    for coluna, (nome, meses) in zip(st.columns(len(medianas)), medianas):
+        coluna.metric(f"Mediana de permanência ({nome})", "—" if meses is None else f"{meses} meses")
+    aguardar_tarefa(pendente)
 
-    else:
-        st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
 
 
+# Data de referência para idade e tempo de casa
+data_referencia = st.sidebar.date_input("Data de referência (idade e tempo de casa)", value=dt.date.today())
+
+# Menu de tabs. No modo preguiçoso (padrão) só o conteúdo da aba selecionada é calculado: trocar de
+# aba provoca um rerun, e as demais ficam vazias. Versões do Streamlit sem seleção rastreada renderizam todas.
+NOMES_ABAS = ['Demografia', 'Idade/tempo de casa','Localização geográfica','Rotatividade', 'Tendência', 'Previsão', 'Base de Dados']
+abas_preguicosas = "on_change" in inspect.signature(st.tabs).parameters and st.sidebar.toggle(
+    "Renderizar apenas a aba ativa", value=True, key="abas_preguicosas",
+    help="Calcula só a aba selecionada; desligado, todas as abas são calculadas a cada interação."
+)
+if abas_preguicosas:
+    tabs = st.tabs(NOMES_ABAS, key="aba_selecionada", on_change="rerun")
+else:
+    tabs = st.tabs(NOMES_ABAS)
 
-# Menu de tabs
-tabs = st.tabs(['Demografia', 'Idade/tempo de casa','Localização geográfica','Rotatividade',  'Base de Dados'])
+def aba_ativa(indice):
+    return not abas_preguicosas or bool(tabs[indice].open)
 
 # Inicialização do DataFrame
 df = None
 
 # Aba "Base de Dados"
-with tabs[4]: 
+with tabs[6], instrumentacao.medir("Aba Base de Dados"): 
     st.header("📁 Base de Dados")
     st.write("Acesse a base de dados completa para uma análise detalhada.")
-    uploaded_file = st.file_uploader("Upload da base de dados", type=["xlsx"])
-    
-    if uploaded_file:
-        df = carregar_base_dados(uploaded_file)
-        st.write(df)
-        # Calcular métricas principais
-        colaboradores_ativos, turnover_anual, taxa_retencao = calcular_metricas_principais(df)
+    origem_dados = st.radio("Origem dos dados", options=["Arquivo", "Banco de dados SQL"], horizontal=True, key="origem_dados")
+    banco = origem_dados == "Banco de dados SQL"
+    if banco:
+        col_url, col_tabela = st.columns([3, 1])
+        url_sql = col_url.text_input("URL do banco", value=URL_PADRAO, key="sql_url",
+                                     placeholder="sqlite:///caminho.db ou duckdb:///caminho.duckdb")
+        tabela_sql = col_tabela.text_input("Tabela", value=TABELA_PADRAO, key="sql_tabela")
+        uploaded_file, acumular = None, False
+    else:
+        uploaded_file = st.file_uploader("Upload da base de dados", type=FORMATOS_ACEITOS)
+        acumular = st.toggle("Acumular no histórico", help="Acrescenta o arquivo ao histórico local, deduplicando por colaborador; os indicadores passam a usar o histórico completo.")
+
+    base = None
+    contagens = None
+    df_arquivo = None
+    agregados = None
+    try:
+        if banco:
+            if url_sql:
+                # Os indicadores agregados são calculados no banco; a versão da tabela é a chave dos caches
+                versao_sql = _versao_sql(url_sql, tabela_sql)
+                st.session_state['fonte_sql'] = (url_sql, tabela_sql)
+                st.session_state['fonte_base'] = 'sql'
+                st.session_state['hash_base'] = versao_sql
+                agregados = obter_agregados_sql()
+                contagens = agregados['contagens']
+        elif acumular:
+            armazem = obter_armazem()
+            periodo = st.text_input("Período do arquivo", value=dt.date.today().strftime("%Y-%m"))
+            if uploaded_file:
+                df_arquivo = carregar_base_dados(uploaded_file)
+                # Só as linhas sem inconsistências entram no histórico
+                resumo = armazem.acrescentar(sem_quarentena(df_arquivo), periodo, st.session_state['hash_arquivo'])
+                if not resumo.get('ignorado'):
+                    st.success(
+                        f"Período {periodo}: {resumo['novos']} novos, {resumo['atualizados']} atualizados, "
+                        f"{resumo['inalterados']} sem alteração ({resumo['meses_recalculados']} meses recalculados)."
+                    )
+            if armazem.periodos():
+                # A versão do armazém substitui o hash do arquivo como chave dos caches abaixo
+                st.session_state['fonte_base'] = 'armazem'
+                st.session_state['hash_base'] = armazem.versao()
+                with st.expander(f"Histórico: {len(armazem.periodos())} períodos"):
+                    st.dataframe(pd.DataFrame(armazem.periodos()), hide_index=True)
+                base = obter_base_preparada(_dados_armazem(armazem.versao()), data_referencia)
+                contagens = _contagens_armazem_cacheadas(armazem.versao())
+        elif uploaded_file:
+            st.session_state['fonte_base'] = 'arquivo'
+            # Base preparada uma única vez (sem as linhas em quarentena); as abas recebem uma cópia rasa
+            df_arquivo = carregar_base_dados(uploaded_file)
+            base = obter_base_preparada(df_arquivo, data_referencia)
+    except (LimiteMemoriaExcedido, ValueError, KeyError) as erro:
+        st.error(f"Não foi possível carregar a base: {erro}")
+    if df_arquivo is not None:
+        quadro_quarentena(df_arquivo)
+    if base is None and not uploaded_file:
+        # Sem arquivo nem histórico, a sessão deixa de segurar a base que usava no registro (as linhas do banco
+        # voltam a ser seguradas pelas abas que as leem)
+        obter_registro_bases().liberar(_sessao_atual())
+
+    if base is not None:
+        df = base.df
+        memoria = base.memoria()
+        # O upload e os cartões são atualizados sempre; a tabela completa só com a aba visível
+        if aba_ativa(6):
+            st.caption(
+                f"{len(base)} linhas · memória {memoria['preparada'] / 1024 ** 2:.1f} MB "
+                f"(original {memoria['original'] / 1024 ** 2:.1f} MB, economia de {memoria['economia_percentual']:.0f}%)"
+            )
+            grade_base_dados(base)
+    elif agregados is not None and aba_ativa(6):
+        total_linhas, linhas_validas = agregados['linhas']
+        st.caption(
+            f"{total_linhas} linhas na tabela {tabela_sql} · indicadores calculados no banco"
+            + (f" · {total_linhas - linhas_validas} linhas fora dos indicadores pelas regras de validação"
+               if linhas_validas < total_linhas else "")
+        )
+        # A tabela precisa das linhas no servidor: só são lidas quando pedidas
+        if st.toggle("Exibir as linhas da tabela", key="sql_exibir_linhas",
+                     help="Lê as linhas do banco para o servidor (com o mesmo limite de memória dos arquivos)."):
+            base_sql = obter_base_sql()
+            if base_sql is not None:
+                grade_base_dados(base_sql)
+
+    if base is not None or agregados is not None:
+        # Calcular métricas principais (com a fonte SQL, pelo índice de efetivo vindo do banco)
+        colaboradores_ativos, turnover_anual, taxa_retencao = calcular_metricas_principais(
+            df, None if agregados is None else agregados['indice']
+        )
 
         # Atualizar as métricas no layout
         # Atualizar dinamicamente os valores dos cartões
@@ -439,109 +873,214 @@ with tabs[4]:
         </div>
         """, unsafe_allow_html=True)
 
-    else:
+    elif banco and not url_sql:
+        st.info("Informe a URL do banco de dados (ex.: sqlite:///caminho.db) para visualização.")
+    elif not uploaded_file and not acumular and not banco:
         st.info("Por favor, faça o upload da base de dados para visualização.")
 
-def indicadores_geograficos(df):
+# Base disponível para as abas: linhas em memória (arquivo ou histórico) ou agregados do banco
+base_carregada = df is not None or agregados is not None
+
+# Linhas para as abas sem agregado no banco; com a fonte SQL, lidas só quando uma delas é aberta
+def linhas_da_base():
     if df is not None:
-        # Distribuição por Estado
-        dist_estado = df['Estado'].value_counts().reset_index()
-        dist_estado.columns = ['Estado', 'Quantidade']
-
-        # Distribuição por Cidade
-        dist_cidade = df['Cidade'].value_counts().reset_index()
-        dist_cidade.columns = ['Cidade', 'Quantidade']
-
-        # Mapeamento para siglas do IBGE (ajustar conforme necessário)
-        siglas_estados = {
-            'Acre': 'AC', 'Alagoas': 'AL', 'Amapá': 'AP', 'Amazonas': 'AM', 'Bahia': 'BA',
-            'Ceará': 'CE', 'Distrito Federal': 'DF', 'Espírito Santo': 'ES', 'Goiás': 'GO',
-            'Maranhão': 'MA', 'Mato Grosso': 'MT', 'Mato Grosso do Sul': 'MS', 'Minas Gerais': 'MG',
-            'Pará': 'PA', 'Paraíba': 'PB', 'Paraná': 'PR', 'Pernambuco': 'PE', 'Piauí': 'PI',
-            'Rio de Janeiro': 'RJ', 'Rio Grande do Norte': 'RN', 'Rio Grande do Sul': 'RS',
-            'Rondônia': 'RO', 'Roraima': 'RR', 'Santa Catarina': 'SC', 'São Paulo': 'SP',
-            'Sergipe': 'SE', 'Tocantins': 'TO'
-        }
+        return df
+    base_sql = obter_base_sql()
+    return None if base_sql is None else base_sql.df
+
+@instrumentacao.instrumentar()
+def indicadores_geograficos(df, contagens=None):
+    if df is not None or contagens is not None:
+        def construir():
+            # Distribuição por Estado (com a sigla) e por Cidade
+            with instrumentacao.medir("motor.indicadores_geograficos", None if df is None else len(df)):
+                geograficos = motor.indicadores_geograficos(df, contagens)
+            verificar_cancelamento()
+            dist_estado = geograficos['por_estado']
 
-        # Adicionar a sigla correspondente ao dataframe
-        dist_estado['Sigla'] = dist_estado['Estado'].map(siglas_estados)
+            # GeoJSON local e simplificado, só com os estados que têm colaboradores
+            with instrumentacao.medir("geojson_estados"):
+                geojson_data = geojson_estados(dist_estado['Sigla'].dropna())
 
-        # Carregar o GeoJSON dos estados brasileiros
-        geojson_url = "https://raw.githubusercontent.com/codeforamerica/click_that_hood/master/public/data/brazil-states.geojson"
-        geojson_data = requests.get(geojson_url).json()
+            return {'figuras': figuras_localizacao(geograficos, geojson_data)}
+
+        resultado, pendente = figuras_em_segundo_plano("localizacao", (), construir)
+        figuras = resultado['figuras']
 
-        # Mapa interativo com Plotly
         st.subheader("Distribuição de Colaboradores por Estado (Mapa)")
-        fig = px.choropleth(
-            dist_estado,
-            geojson=geojson_data,
-            locations="Sigla",
-            featureidkey="properties.sigla",  # Mapeia com as siglas no GeoJSON
-            color="Quantidade",
-            hover_name="Estado",
-            color_continuous_scale="Blues",
-            title="Distribuição de Colaboradores por Estado"
-        )
-        fig.update_geos(fitbounds="locations", visible=False)  # Ajustar o mapa
-        st.plotly_chart(fig)
+        if figuras['mapa'] is not None:
+            st.plotly_chart(figuras['mapa'])
+        else:
+            st.info("Mapa indisponível: geometria dos estados não encontrada. Gere os arquivos com `python -m rh.geografia preparar`.")
 
-        # Top 5 cidades
         st.subheader("Principais Cidades com Colaboradores")
-        top_cidades = dist_cidade.head(5)
-
-        # Gráfico de barras com Plotly
-        fig_cidades = px.bar(
-            top_cidades,
-            x='Quantidade',
-            y='Cidade',
-            text='Quantidade',
-            orientation='h',
-            labels={'Quantidade': 'Quantidade de Colaboradores', 'Cidade': 'Cidade'},
-            title="Distribuição por Cidade - Top 5",
-        )
-        fig_cidades.update_traces(texttemplate='%{text}', textposition='outside')
-        fig_cidades.update_layout(yaxis_title='Cidade', xaxis_title='Quantidade de Colaboradores', showlegend=False)
-        
-        st.plotly_chart(fig_cidades, use_container_width=True)
+        st.plotly_chart(figuras['cidades'], use_container_width=True)
+        aguardar_tarefa(pendente)
 
     else:
         st.warning("Por favor, carregue a base de dados para visualizar os indicadores geográficos.")
 
-# Aba "Demografia"
-with tabs[0]: 
-    st.header("📊 Demografia")
-    st.write("Visualize informações sobre a distribuição de gênero, idade e diversidade na empresa.")
-    if df is not None:
-        indicadores_demograficos(df)
+# Mapa por município (ou microrregião), com a geometria só dos locais que têm colaboradores
+NIVEIS_MAPA_MUNICIPIOS = {"Automático": None, "Municípios": "municipios", "Microrregiões": "microrregioes"}
+
+@fragmento
+@instrumentacao.instrumentar()
+def mapa_municipios(df, pares=None):
+    st.subheader("Distribuição de Colaboradores por Município")
+    if not municipios_disponiveis():
+        st.info("Mapa municipal indisponível: tabela e malha dos municípios não encontradas. "
+                "Gere os arquivos com `python -m rh.geografia preparar-municipios`.")
+        return
+
+    # Com a fonte SQL, os pares Estado/Cidade já vêm contados do banco
+    origem = df if pares is None else pares
+    estados = ["Brasil"] + sorted(str(estado) for estado in origem['Estado'].dropna().unique())
+    col_estado, col_nivel = st.columns(2)
+    estado = col_estado.selectbox("Região do mapa:", options=estados, key="municipios_estado")
+    nivel = col_nivel.radio("Detalhe:", options=list(NIVEIS_MAPA_MUNICIPIOS), horizontal=True, key="municipios_nivel")
+
+    def construir():
+        with instrumentacao.medir("motor.indicadores_municipios", len(origem)):
+            municipios = motor.indicadores_municipios(df, None if estado == "Brasil" else estado, pares)
+        verificar_cancelamento()
+        por_municipio = municipios['por_municipio']
+        # Com um estado escolhido o mapa já está aproximado: municípios, mesmo que alguma cidade caia em outra UF
+        quantidade_estados = por_municipio['UF'].nunique() if estado == "Brasil" else 1
+        agregacao, detalhe = escolher_nivel(len(por_municipio), quantidade_estados, NIVEIS_MAPA_MUNICIPIOS[nivel])
+        with instrumentacao.medir("geojson_municipios"):
+            if agregacao == "microrregioes":
+                tabela = municipios['por_microrregiao']
+                geojson_data = geojson_microrregioes(tabela['Microrregião'])
+            else:
+                tabela = por_municipio
+                geojson_data = geojson_municipios(tabela['Código'], detalhe)
+        verificar_cancelamento()
+        return {
+            'figura': figura_municipios(tabela, geojson_data, agregacao) if geojson_data is not None else None,
+            'locais': len(tabela),
+            'agregacao': agregacao,
+            'detalhe': detalhe,
+            'nao_encontrados': municipios['nao_encontrados'].to_dict(orient="records"),
+        }
+
+    resultado, pendente = figuras_em_segundo_plano("municipios", (estado, nivel), construir)
+    if resultado['figura'] is None:
+        st.info("Nenhuma cidade da base foi encontrada na malha municipal.")
     else:
-        st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
+        st.plotly_chart(resultado['figura'], use_container_width=True)
+        descricao = "microrregiões" if resultado['agregacao'] == "microrregioes" else f"municípios (detalhe {resultado['detalhe']})"
+        st.caption(f"{resultado['locais']} {descricao}")
+    if resultado['nao_encontrados']:
+        with st.expander(f"{len(resultado['nao_encontrados'])} cidades não encontradas na tabela do IBGE"):
+            st.dataframe(pd.DataFrame(resultado['nao_encontrados']), hide_index=True)
+    aguardar_tarefa(pendente)
+
+# Aba "Demografia"
+if aba_ativa(0):
+    with tabs[0], instrumentacao.medir("Aba Demografia"):
+        st.header("📊 Demografia")
+        st.write("Visualize informações sobre a distribuição de gênero, idade e diversidade na empresa.")
+        if base_carregada:
+            indicadores_demograficos(df, contagens)
+        else:
+            st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
 
 # Aba "Idade/tempo de casa"
-with tabs[1]: 
-    st.header("⏳ Idade/Tempo de Casa")
-    st.write("Veja como o tempo de empresa e a idade dos colaboradores afetam o perfil geral da equipe.")
-    if df is not None:  
-        indicadores_idade_tempo_casa(df)
-    else:
-        st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
+if aba_ativa(1):
+    with tabs[1], instrumentacao.medir("Aba Idade/tempo de casa"):
+        st.header("⏳ Idade/Tempo de Casa")
+        st.write("Veja como o tempo de empresa e a idade dos colaboradores afetam o perfil geral da equipe.")
+        if base_carregada:
+            linhas = linhas_da_base()
+            if linhas is not None:
+                indicadores_idade_tempo_casa(linhas)
+                retencao_coortes(linhas)
+        else:
+            st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
 
 # Aba "geografico"
-with tabs[2]: 
-    st.header("🌍 Localização Geográfica")
-    st.write("Distribuição geográfica dos colaboradores por cidade ou estado.")
-    if df is not None:
-        indicadores_geograficos(df)
-    else:
-        st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
+if aba_ativa(2):
+    with tabs[2], instrumentacao.medir("Aba Localização geográfica"):
+        st.header("🌍 Localização Geográfica")
+        st.write("Distribuição geográfica dos colaboradores por cidade ou estado.")
+        if base_carregada:
+            indicadores_geograficos(df, contagens)
+            mapa_municipios(df, None if agregados is None else agregados['pares'])
+        else:
+            st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
 
 # Aba "Turnover"
-with tabs[3]: 
-    st.header("📉 Rotatividade")
-    st.write("Análise das taxas de turnover, entradas e saídas de colaboradores.")
-    if df is not None:
-        calcular_indicadores_turnover(df)
-    else:
-        st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
+if aba_ativa(3):
+    with tabs[3], instrumentacao.medir("Aba Rotatividade"):
+        st.header("📉 Rotatividade")
+        st.write("Análise das taxas de turnover, entradas e saídas de colaboradores.")
+        if base_carregada:
+            calcular_indicadores_turnover(df)
+        else:
+            st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
+
+# Aba "Tendência"
+if aba_ativa(4):
+    with tabs[4], instrumentacao.medir("Aba Tendência"):
+        st.header("📈 Tendência")
+        st.write("Turnover, retenção e variação do quadro nos 12 meses terminados em cada mês, em todo o histórico.")
+        if base_carregada:
+            tendencia_rotatividade(df)
+        else:
+            st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
+
+# Aba "Previsão"
+if aba_ativa(5):
+    with tabs[5], instrumentacao.medir("Aba Previsão"):
+        st.header("🔮 Previsão")
+        st.write("Projeção mensal de contratações, desligamentos e headcount por função ou estado.")
+        if base_carregada:
+            linhas = linhas_da_base()
+            if linhas is not None:
+                previsao_quadro(linhas)
+        else:
+            st.warning("Nenhuma base de dados carregada. Vá para a aba 'Base de Dados' e carregue um arquivo.")
+
+# Painel de desempenho: etapas desta execução e exportação de todas as medições da sessão
+if instrumentacao.ativa:
+    with st.sidebar.expander("⏱️ Desempenho", expanded=True):
+        medicoes = instrumentacao.tabela(instrumentacao.execucao).sort_values(['inicio', 'nivel'], kind='stable')
+        st.metric("Tempo desta execução", f"{medicoes.loc[medicoes['nivel'] == 0, 'segundos'].sum():.3f} s")
+        medicoes['etapa'] = ['· ' * nivel + etapa for nivel, etapa in zip(medicoes['nivel'], medicoes['etapa'])]
+        st.dataframe(
+            medicoes[['etapa', 'segundos', 'linhas', 'memoria_delta_mb']],
+            hide_index=True,
+            column_config={
+                'etapa': 'Etapa',
+                'segundos': st.column_config.NumberColumn('Tempo (s)', format="%.4f"),
+                'linhas': st.column_config.NumberColumn('Linhas', format="%d"),
+                'memoria_delta_mb': st.column_config.NumberColumn('Δ memória (MB)', format="%.1f"),
+            },
+        )
+        st.caption(f"{len(instrumentacao.medicoes)} medições na sessão {instrumentacao.sessao}")
+        st.caption("Bases em memória (compartilhadas entre as sessões)")
+        st.dataframe(obter_registro_bases().estatisticas(), hide_index=True)
+        cache = obter_cache_figuras().estatisticas()
+        st.caption(
+            f"Cache de figuras: {cache['entradas']} entradas, {cache['memoria_mb']:.1f} MB, "
+            f"{cache['acertos']} acertos / {cache['falhas']} falhas"
+        )
+        tarefas = obter_tarefas().estatisticas()
+        st.caption(
+            f"Cálculos em segundo plano: {tarefas['em_andamento']} em andamento, "
+            f"{tarefas['concluidas']} concluídos, {tarefas['canceladas']} cancelados"
+        )
+        if st.session_state.get('fonte_base') == 'sql':
+            pool = obter_fonte_sql(*st.session_state['fonte_sql']).pool.estatisticas()
+            st.caption(
+                f"Conexões com o banco: {pool['criadas']} abertas (máximo {pool['tamanho']}), "
+                f"{pool['livres']} livres, {pool['emprestimos']} consultas"
+            )
+        col_csv, col_json = st.columns(2)
+        col_csv.download_button("CSV", instrumentacao.para_csv(), file_name=f"desempenho_{instrumentacao.sessao}.csv", mime="text/csv")
+        col_json.download_button("JSON", instrumentacao.para_json(), file_name=f"desempenho_{instrumentacao.sessao}.json", mime="application/json")
+        if st.button("Limpar medições"):
+            instrumentacao.limpar()
 
 # Rodapé opcional
 st.markdown("---")
@@ -1,3 +1,160 @@
 import streamlit as st
+import pandas as pd
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-st.title('Remuneração (em construção)')
+from rh.cache_dados import carregar_com_cache, hash_conteudo
+from rh.ingestao import FORMATOS_ACEITOS, LimiteMemoriaExcedido
+from rh.registro_bases import registro_processo
+from rh.remuneracao import PERCENTIS, SEM_CADASTRO, FolhaPagamento, ler_folha
+
+st.set_page_config(
+    page_title="Remuneração - STOG",
+    page_icon="💰",
+    layout="wide",
+    initial_sidebar_state="expanded",
+)
+
+# Filtros mantidos entre execuções mesmo quando a folha ainda não foi enviada
+for chave in ('folha_sexo', 'folha_funcao', 'folha_mes'):
+    if chave in st.session_state:
+        st.session_state[chave] = st.session_state[chave]
+
+fragmento = getattr(st, "fragment", lambda funcao: funcao)
+
+st.title("Remuneração")
+st.caption("Evolução do custo da folha, faixas salariais por função e diferença salarial entre homens e mulheres.")
+
+
+def _sessao_ativa(sessao):
+    return not Runtime.exists() or Runtime.instance().is_active_session(sessao)
+
+def _sessao_atual():
+    contexto = get_script_run_ctx()
+    return None if contexto is None else contexto.session_id
+
+# Mesmo registro de bases da página de Indicadores: a base 'BD' já lida lá não é lida de novo
+registro = registro_processo(sessao_ativa=_sessao_ativa)
+
+base = registro.obter(st.session_state.get('hash_arquivo'), _sessao_atual()) if st.session_state.get('hash_arquivo') else None
+if base is None:
+    st.warning("Envie a base de dados na página Indicadores para ligar a folha aos colaboradores.")
+    st.stop()
+
+arquivo_folha = st.file_uploader("Upload da folha de pagamento", type=FORMATOS_ACEITOS)
+if arquivo_folha is None:
+    registro.liberar(_sessao_atual(), papel="folha")
+    st.info("A folha deve ter a matrícula (ou CPF), a Competência e o Salário; Encargos e Benefícios são opcionais.")
+    st.stop()
+
+if st.session_state.get('id_arquivo_folha') != arquivo_folha.file_id:
+    st.session_state['id_arquivo_folha'] = arquivo_folha.file_id
+    st.session_state['hash_folha'] = hash_conteudo(arquivo_folha.getvalue())
+chave_folha = st.session_state['hash_folha']
+
+def ler():
+    barra = st.progress(0.0, text="Lendo folha de pagamento...")
+
+    def progresso(linhas, fracao):
+        barra.progress(fracao or 0.0, text=f"Lendo folha de pagamento... {linhas} linhas")
+
+    folha = carregar_com_cache(
+        arquivo_folha.getvalue(),
+        lambda conteudo: ler_folha(conteudo, arquivo_folha.name, progresso=progresso),
+        chave=chave_folha
+    )
+    barra.empty()
+    return folha
+
+try:
+    folha = registro.obter_ou_carregar(chave_folha, ler, _sessao_atual(), papel="folha")
+except (LimiteMemoriaExcedido, ValueError, KeyError) as erro:
+    st.error(f"Não foi possível ler a folha: {erro}")
+    st.stop()
+
+# Índices da folha (posições na base, cubo de custos, ordenações) por par folha x base
+@st.cache_resource(show_spinner="Ligando a folha à base de colaboradores...", max_entries=4)
+def _folha_pagamento_cacheada(chave_folha, chave_base, _folha, _base):
+    return FolhaPagamento(_folha, _base)
+
+try:
+    remuneracao = _folha_pagamento_cacheada(chave_folha, st.session_state['hash_arquivo'], folha, base)
+except KeyError as erro:
+    st.error(erro.args[0])
+    st.stop()
+
+if not len(remuneracao.periodos):
+    st.error("Nenhuma competência válida na folha.")
+    st.stop()
+
+avisos = []
+if remuneracao.sem_cadastro:
+    avisos.append(f"{remuneracao.sem_cadastro} linhas da folha sem colaborador na base (agrupadas como '{SEM_CADASTRO}')")
+if remuneracao.competencias_invalidas:
+    avisos.append(f"{remuneracao.competencias_invalidas} linhas com competência inválida (ignoradas)")
+if avisos:
+    st.caption("; ".join(avisos) + ".")
+
+
+def formatar_moeda(valor):
+    if pd.isna(valor):
+        return "-"
+    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+@fragmento
+def quadro_remuneracao():
+    import plotly.express as px
+
+    meses = [str(periodo) for periodo in remuneracao.periodos]
+    col_sexo, col_funcao, col_mes = st.columns(3)
+    sexo = col_sexo.selectbox("Sexo", ["Todos"] + remuneracao.valores("Sexo"), key="folha_sexo")
+    funcao = col_funcao.selectbox("Função", ["Todos"] + remuneracao.valores("Função"), key="folha_funcao")
+    st.session_state.setdefault('folha_mes', meses[-1])
+    if st.session_state['folha_mes'] not in meses:
+        st.session_state['folha_mes'] = meses[-1]
+    mes = col_mes.select_slider("Competência", options=meses, key="folha_mes")
+
+    evolucao = remuneracao.evolucao_custos({"Sexo": sexo, "Função": funcao})
+    linha_mes = evolucao.iloc[meses.index(mes)]
+    percentis = remuneracao.percentis_salario(mes, sexo)
+    mediana = remuneracao.percentis_filtro(mes, {"Sexo": sexo, "Função": funcao}, [50])["P50"]
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Custo total no mês", formatar_moeda(linha_mes["Custo total"]))
+    col2.metric("Colaboradores na folha", f"{int(linha_mes['Colaboradores'])}")
+    col3.metric("Custo por colaborador", formatar_moeda(linha_mes["Custo por colaborador"]))
+    col4.metric("Salário mediano", formatar_moeda(mediana))
+
+    fig = px.line(evolucao, x="Mês", y=["Custo total", "Salários"], markers=True,
+                  title="Evolução do custo da folha", labels={"value": "R$", "variable": ""})
+    st.plotly_chart(fig, use_container_width=True)
+    fig = px.line(evolucao, x="Mês", y="Custo por colaborador", markers=True, title="Custo médio por colaborador")
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader(f"Faixas salariais por função em {mes}")
+    if percentis.empty:
+        st.info("Sem linhas na folha para o filtro selecionado.")
+    else:
+        colunas = [f"P{percentil}" for percentil in PERCENTIS]
+        # Barras na mediana com a faixa P10-P90 (percentis já calculados, sem reenviar a folha ao gráfico)
+        fig = px.bar(percentis, x="Função", y="P50", error_y=percentis["P90"] - percentis["P50"],
+                     error_y_minus=percentis["P50"] - percentis["P10"], title="Salário mediano (barras de P10 a P90)")
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(percentis.style.format({coluna: formatar_moeda for coluna in colunas}), hide_index=True)
+
+    st.subheader(f"Diferença salarial entre homens e mulheres em {mes}")
+    gap = remuneracao.gap_genero(mes)
+    if gap.empty:
+        st.info("A folha não tem homens e mulheres na mesma função nessa competência.")
+    else:
+        fig = px.bar(gap, x="Função", y="Gap mediana (%)", color="Gap mediana (%)", color_continuous_scale="RdBu_r",
+                     color_continuous_midpoint=0, title="Gap salarial pela mediana: (masculino - feminino) / masculino")
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(gap.style.format({
+            **{coluna: formatar_moeda for coluna in gap.columns if coluna.startswith(("Mediana", "Média"))},
+            "Gap mediana (%)": "{:.1f}%", "Gap média (%)": "{:.1f}%",
+        }), hide_index=True)
+
+
+quadro_remuneracao()
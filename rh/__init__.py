@@ -0,0 +1 @@
+# Módulos de apoio do Dashboard de Indicadores da STOG (sem dependência do Streamlit)
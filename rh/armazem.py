@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from rh.base_preparada import compactar_tipos
+from rh.cache_dados import DIRETORIO_CACHE, gravar_arrow, ler_arrow
+from rh.cubo_turnover import METRICAS, CuboTurnover, movimentacao_mensal, periodos_cubo
+from rh.efetivo import IndiceEfetivo
+from rh.ingestao import CHAVES_CANDIDATAS
+
+# Colunas das distribuições das abas Demografia e Localização
+COLUNAS_CONTAGEM = ["Sexo", "Casado", "Tem filhos", "Estado", "Cidade"]
+COLUNAS_SEGMENTO = ["Sexo", "Função"]
+
+DIRETORIO_ARMAZEM = os.path.join(DIRETORIO_CACHE, "armazem")
+
+
+def escolher_coluna_chave(colunas):
+    for coluna in CHAVES_CANDIDATAS:
+        if coluna in colunas:
+            return coluna
+    raise KeyError(f"A base não tem coluna de identificação do colaborador ({', '.join(CHAVES_CANDIDATAS)})")
+
+
+# Mês da data como ordinal de período mensal (meses desde 1970-01; NaN para datas vazias)
+def _ordinal_mes(datas):
+    datas = pd.to_datetime(datas, errors="coerce")
+    return (datas.dt.year - 1970) * 12 + datas.dt.month - 1
+
+
+# Linhas que mudaram em alguma coluna (vazio == vazio conta como igual)
+def _linhas_alteradas(antigas, novas, colunas):
+    alteradas = np.zeros(len(novas), dtype=bool)
+    for coluna in colunas:
+        a = antigas[coluna].astype(object).to_numpy()
+        b = novas[coluna].astype(object).to_numpy()
+        ambos_vazios = pd.isna(a) & pd.isna(b)
+        alteradas |= (a != b) & ~ambos_vazios
+    return alteradas
+
+
+# Primeiro mês afetado em cada segmento (Sexo, Função). Para colaboradores novos contam as duas
+# datas; para os alterados, só as datas que mudaram (ou todas, se o segmento mudou).
+def _meses_afetados(novos, antigas, atualizadas):
+    antigas = antigas.reset_index(drop=True)
+    atualizadas = atualizadas.reset_index(drop=True)
+    mudou_segmento = _linhas_alteradas(antigas, atualizadas, COLUNAS_SEGMENTO)
+    partes = [novos.assign(_mes=np.fmin(_ordinal_mes(novos["Contratado"]), _ordinal_mes(novos["Desligado"])))]
+    for lado in (antigas, atualizadas):
+        meses = []
+        for coluna in ("Contratado", "Desligado"):
+            mudou = _linhas_alteradas(antigas, atualizadas, [coluna]) | mudou_segmento
+            meses.append(_ordinal_mes(lado[coluna]).where(mudou))
+        partes.append(lado.assign(_mes=np.fmin(*meses)))
+    tocadas = pd.concat([parte[COLUNAS_SEGMENTO + ["_mes"]].astype({c: object for c in COLUNAS_SEGMENTO}) for parte in partes])
+    tocadas = tocadas.dropna(subset=["_mes"])
+    return tocadas.groupby(COLUNAS_SEGMENTO, dropna=False, sort=False)["_mes"].min().to_dict()
+
+
+# Histórico de colaboradores acumulado entre exportações mensais.
+#
+# Cada novo arquivo é acrescentado com deduplicação pela chave do colaborador (a última versão
+# vence, ex.: um Desligado preenchido depois). Os agregados usados nas abas — a movimentação mensal
+# por Sexo x Função e as contagens de Demografia/Localização — são atualizados só para os
+# segmentos e meses afetados pelas linhas novas ou alteradas.
+class ArmazemIncremental:
+    def __init__(self, diretorio=DIRETORIO_ARMAZEM, coluna_chave=None):
+        self.diretorio = diretorio
+        self.coluna_chave = coluna_chave
+        self._manifesto = self._ler_json("manifesto.json", {"periodos": [], "coluna_chave": coluna_chave})
+        self.coluna_chave = self.coluna_chave or self._manifesto.get("coluna_chave")
+
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    def _ler_json(self, nome, padrao):
+        caminho = self._caminho(nome)
+        if not os.path.exists(caminho):
+            return padrao
+        with open(caminho, encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+
+    def _gravar_json(self, nome, dados):
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self._caminho(nome)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(dados, arquivo, ensure_ascii=False, indent=2, default=str)
+        os.replace(temporario, caminho)
+
+    # Períodos já acrescentados (rótulo, hash do arquivo, linhas, data de carga)
+    def periodos(self):
+        return list(self._manifesto["periodos"])
+
+    # Identifica o estado atual do armazém (muda a cada acréscimo); usado como chave de cache
+    def versao(self):
+        return hashlib.sha256(json.dumps(self._manifesto["periodos"], sort_keys=True).encode()).hexdigest()
+
+    def dados(self):
+        df = ler_arrow(self._caminho("colaboradores.arrow"))
+        return compactar_tipos(df) if df is not None else None
+
+    def movimentacao(self):
+        longo = ler_arrow(self._caminho("movimentacao.arrow"))
+        if longo is None:
+            return pd.DataFrame(columns=["Ano", "Mês"] + COLUNAS_SEGMENTO + METRICAS)
+        return longo
+
+    def cubo(self):
+        return CuboTurnover.de_dataframe(self.movimentacao(), COLUNAS_SEGMENTO)
+
+    # Contagens por valor de cada coluna de Demografia/Localização
+    def contagens(self):
+        brutas = self._ler_json("contagens.json", {})
+        return {coluna: pd.Series(valores, dtype="int64", name="count") for coluna, valores in brutas.items()}
+
+    # Acrescenta um período. Arquivos já acrescentados (mesmo hash) são ignorados.
+    def acrescentar(self, novo, periodo, hash_arquivo=None):
+        if hash_arquivo and any(p["hash"] == hash_arquivo for p in self._manifesto["periodos"]):
+            return {"periodo": periodo, "novos": 0, "atualizados": 0, "inalterados": len(novo), "ignorado": True}
+
+        self.coluna_chave = self.coluna_chave or escolher_coluna_chave(novo.columns)
+        chave = self.coluna_chave
+        novo = novo.drop_duplicates(subset=chave, keep="last").reset_index(drop=True)
+        atual = self.dados()
+        if atual is None:
+            atual = novo.iloc[:0]
+
+        posicoes = pd.Index(atual[chave]).get_indexer(novo[chave])
+        existentes = posicoes >= 0
+        colunas_comparadas = [c for c in novo.columns if c in atual.columns and c != chave]
+        alteradas = np.zeros(len(novo), dtype=bool)
+        if existentes.any():
+            alteradas[existentes] = _linhas_alteradas(
+                atual.iloc[posicoes[existentes]].reset_index(drop=True),
+                novo[existentes].reset_index(drop=True),
+                colunas_comparadas,
+            )
+        substituidas = posicoes[existentes & alteradas]
+        entrando = novo[~existentes | alteradas]
+        saindo = atual.iloc[substituidas]
+
+        # Last-write-wins: remove as versões antigas e acrescenta as novas
+        combinado = compactar_tipos(pd.concat([atual.drop(index=atual.index[substituidas]), entrando], ignore_index=True))
+
+        meses_recalculados = self._atualizar_movimentacao(
+            combinado, _meses_afetados(novo[~existentes], saindo, novo[existentes & alteradas])
+        )
+        self._atualizar_contagens(saindo, entrando)
+        gravar_arrow(combinado, self._caminho("colaboradores.arrow"))
+
+        resumo = {
+            "periodo": periodo,
+            "hash": hash_arquivo or "",
+            "linhas": int(len(novo)),
+            "novos": int((~existentes).sum()),
+            "atualizados": int((existentes & alteradas).sum()),
+            "inalterados": int((existentes & ~alteradas).sum()),
+            "meses_recalculados": int(meses_recalculados),
+            "carregado_em": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self._manifesto["periodos"].append(resumo)
+        self._manifesto["coluna_chave"] = chave
+        self._gravar_json("manifesto.json", self._manifesto)
+        return resumo
+
+    # Recalcula só os segmentos tocados, a partir do primeiro mês afetado (o efetivo dos meses
+    # seguintes também muda); se o intervalo de anos crescer, os meses novos são calculados para todos
+    def _atualizar_movimentacao(self, combinado, primeiro_tocado):
+        longo = self.movimentacao()
+        anos_antigos = sorted(longo["Ano"].unique().tolist()) if not longo.empty else []
+        anos = IndiceEfetivo(combinado["Contratado"], combinado["Desligado"]).anos()
+        periodos = periodos_cubo(anos)
+        if not len(periodos):
+            gravar_arrow(longo.iloc[:0], self._caminho("movimentacao.arrow"))
+            return 0
+
+        periodos_antigos = periodos_cubo(anos_antigos)
+        # Intervalo deslocado no início ou encurtado no fim: recalcula tudo (raro; só com correções retroativas)
+        recalcular_tudo = (not len(periodos_antigos) or periodos[0] != periodos_antigos[0]
+                           or periodos[-1] < periodos_antigos[-1])
+        inicio_novos = periodos_antigos[-1] + 1 if len(periodos_antigos) else periodos[0]
+
+        partes, mantidas, meses = [], [], 0
+        agrupado = combinado.groupby(COLUNAS_SEGMENTO, dropna=False, sort=False, observed=True)
+        anteriores = {chave: grupo for chave, grupo in longo.groupby(COLUNAS_SEGMENTO, dropna=False, sort=False)} if not longo.empty else {}
+        for segmento, grupo in agrupado:
+            anterior = anteriores.get(segmento)
+            # Segmentos novos (sem agregados anteriores) são calculados desde o início
+            if recalcular_tudo or anterior is None:
+                a_partir = periodos[0].ordinal
+            else:
+                a_partir = max(min(primeiro_tocado.get(segmento, inicio_novos.ordinal), inicio_novos.ordinal), periodos[0].ordinal)
+                ordinal_anterior = (anterior["Ano"].to_numpy() - 1970) * 12 + anterior["Mês"].to_numpy() - 1
+                mantidas.append(anterior[ordinal_anterior < a_partir])
+            recalcular = periodos[periodos.asi8 >= a_partir]
+            if not len(recalcular):
+                continue
+            valores = movimentacao_mensal(IndiceEfetivo(grupo["Contratado"], grupo["Desligado"]), recalcular)
+            parte = pd.DataFrame(valores, columns=METRICAS)
+            parte.insert(0, "Ano", recalcular.year)
+            parte.insert(1, "Mês", recalcular.month)
+            for i, coluna in enumerate(COLUNAS_SEGMENTO):
+                parte.insert(2 + i, coluna, segmento[i])
+            partes.append(parte)
+            meses += len(recalcular)
+
+        colunas = ["Ano", "Mês"] + COLUNAS_SEGMENTO + METRICAS
+        novo_longo = pd.concat([p.astype({c: object for c in COLUNAS_SEGMENTO}) for p in mantidas + partes], ignore_index=True) \
+            if mantidas or partes else pd.DataFrame(columns=colunas)
+        gravar_arrow(novo_longo[colunas], self._caminho("movimentacao.arrow"))
+        return meses
+
+    # Subtrai as versões substituídas e soma as novas, coluna a coluna
+    def _atualizar_contagens(self, saindo, entrando):
+        contagens = self.contagens()
+        for coluna in COLUNAS_CONTAGEM:
+            if coluna not in entrando.columns:
+                continue
+            atual = contagens.get(coluna, pd.Series(dtype="int64"))
+            menos = saindo[coluna].astype(object).value_counts() if coluna in saindo.columns else pd.Series(dtype="int64")
+            mais = entrando[coluna].astype(object).value_counts()
+            atual = atual.add(mais, fill_value=0).sub(menos, fill_value=0)
+            contagens[coluna] = atual[atual > 0].astype("int64").sort_values(ascending=False)
+        self._gravar_json("contagens.json", {coluna: serie.to_dict() for coluna, serie in contagens.items()})
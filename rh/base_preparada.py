@@ -0,0 +1,117 @@
+import pandas as pd
+
+COLUNAS_DATA = ["Contratado", "Desligado", "Data de Nascimento"]
+COLUNAS_CATEGORICAS = ["Sexo", "Função", "Estado", "Cidade", "Casado", "Tem filhos"]
+
+# Faixas usadas na aba Idade/tempo de casa
+FAIXAS_ETARIAS = ([0, 30, 40, 50, 100], ["Até 30", "31-40", "41-50", "Acima de 50"])
+FAIXAS_TEMPO_CASA = ([0, 1, 3, 5, 100], ["Até 1 ano", "1-3 anos", "3-5 anos", "Acima de 5 anos"])
+
+
+# Datas no formato brasileiro (dia/mês/ano), com hora opcional
+_DATA_BRASILEIRA = r"^\s*\d{1,2}/\d{1,2}/\d{4}"
+
+
+# Converte texto em datas: ISO (AAAA-MM-DD) primeiro; o que sobrar no formato dia/mês/ano só é lido com o
+# dia primeiro quando `dayfirst` (ex.: CSV exportado no Brasil), e os demais formatos pelo parser genérico.
+# Assim uma data ISO nunca tem dia e mês trocados.
+def converter_texto_datas(valores, dayfirst=False):
+    valores = pd.Series(valores)
+    datas = pd.to_datetime(valores, errors="coerce", format="ISO8601")
+    restantes = valores.notna() & datas.isna()
+    if restantes.any():
+        texto = valores[restantes].astype(str)
+        brasileiras = texto.str.match(_DATA_BRASILEIRA) if dayfirst else pd.Series(False, index=texto.index)
+        if brasileiras.any():
+            datas[brasileiras[brasileiras].index] = pd.to_datetime(
+                texto[brasileiras], errors="coerce", format="mixed", dayfirst=True
+            )
+        outras = texto[~brasileiras]
+        if len(outras):
+            datas[outras.index] = pd.to_datetime(outras, errors="coerce", format="mixed")
+    return datas
+
+
+# Converte datas e reduz os tipos: categorias para colunas repetitivas e inteiros no menor tipo possível
+def compactar_tipos(df):
+    df = df.copy(deep=False)
+    for coluna in COLUNAS_DATA:
+        if coluna in df.columns:
+            df[coluna] = pd.to_datetime(df[coluna], errors="coerce")
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype("category")
+    for coluna in df.select_dtypes(include="integer").columns:
+        df[coluna] = pd.to_numeric(df[coluna], downcast="integer")
+    return df
+
+
+# Idade, tempo de casa e respectivas faixas, calculados de forma vetorizada
+def colunas_derivadas(df, data_referencia):
+    derivadas = pd.DataFrame(index=df.index)
+    if "Data de Nascimento" in df.columns:
+        # Mesma regra usada até aqui: diferença entre os anos
+        derivadas["Idade Atual"] = (data_referencia.year - df["Data de Nascimento"].dt.year).astype("float32")
+        bins, labels = FAIXAS_ETARIAS
+        derivadas["Faixa Etária"] = pd.cut(derivadas["Idade Atual"], bins=bins, labels=labels)
+    if "Contratado" in df.columns:
+        dias = (data_referencia - df["Contratado"]).dt.days
+        derivadas["Tempo de Casa (anos)"] = (dias / 365).astype("float32")
+        bins, labels = FAIXAS_TEMPO_CASA
+        derivadas["Faixa de Tempo de Casa"] = pd.cut(derivadas["Tempo de Casa (anos)"], bins=bins, labels=labels)
+    return derivadas
+
+
+def _memoria(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+# Base preparada uma única vez na carga: datas convertidas, tipos compactos e colunas derivadas.
+# Não deve ser alterada depois de criada; `df` devolve uma cópia rasa para uso nas abas.
+class BasePreparada:
+    __slots__ = ("_df", "data_referencia", "memoria_original", "memoria_preparada")
+
+    def __init__(self, df_original, data_referencia=None):
+        data_referencia = pd.Timestamp(data_referencia if data_referencia is not None else pd.Timestamp.now())
+        # Medida na base recebida, antes da conversão de tipos
+        object.__setattr__(self, "memoria_original", _memoria(df_original))
+        compacta = compactar_tipos(df_original)
+        derivadas = colunas_derivadas(compacta, data_referencia)
+        compacta = compacta.drop(columns=[c for c in derivadas.columns if c in compacta.columns])
+        object.__setattr__(self, "_df", pd.concat([compacta, derivadas], axis=1))
+        object.__setattr__(self, "data_referencia", data_referencia)
+        object.__setattr__(self, "memoria_preparada", _memoria(self._df))
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError("BasePreparada é imutável; crie uma nova com com_referencia()")
+
+    def __len__(self):
+        return len(self._df)
+
+    @property
+    def df(self):
+        return self._df.copy(deep=False)
+
+    # Mesma base com idade/tempo de casa recalculados para outra data (sem refazer a conversão de tipos)
+    def com_referencia(self, data_referencia):
+        nova = object.__new__(BasePreparada)
+        data_referencia = pd.Timestamp(data_referencia)
+        derivadas = colunas_derivadas(self._df, data_referencia)
+        base = self._df.drop(columns=derivadas.columns)
+        object.__setattr__(nova, "_df", pd.concat([base, derivadas], axis=1))
+        object.__setattr__(nova, "data_referencia", data_referencia)
+        object.__setattr__(nova, "memoria_original", self.memoria_original)
+        object.__setattr__(nova, "memoria_preparada", _memoria(nova._df))
+        return nova
+
+    # Uso de memória em bytes da base original e da preparada (incluindo as colunas derivadas)
+    def memoria(self):
+        return {
+            "original": self.memoria_original,
+            "preparada": self.memoria_preparada,
+            "economia_percentual": (1 - self.memoria_preparada / self.memoria_original) * 100 if self.memoria_original else 0.0,
+        }
+
+    # Uso de memória por coluna, para identificar o que ainda pesa
+    def memoria_por_coluna(self):
+        return self._df.memory_usage(deep=True, index=False).sort_values(ascending=False)
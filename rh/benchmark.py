@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+import pandas as pd
+
+from rh import cache_dados, motor
+from rh.base_preparada import BasePreparada
+from rh.cubo_turnover import CuboTurnover
+from rh.efetivo import IndiceEfetivoSegmentado
+from rh.geografia import carregar_estados
+from rh.ingestao import ler_base
+from rh.sintetico import gerar_base, gravar_base
+
+# Tempo e pico de memória de cada etapa dos indicadores e da renderização completa da página,
+# sobre bases sintéticas de vários tamanhos.
+#
+#   python -m rh.benchmark --tamanhos 1000 100000 1000000 --saida medicoes.json
+#   python -m rh.benchmark --tamanhos 1000 100000 --referencia medicoes.json   # falha se houver regressão
+#   python -m rh.benchmark --inicializacao                                     # só a abertura das páginas
+#
+# O tempo é o menor de `repeticoes` execuções; o pico de memória (tracemalloc) vem de uma
+# execução separada, para não distorcer o tempo.
+
+TAMANHOS = [1_000, 10_000, 100_000, 1_000_000]
+REPETICOES = 3
+TOLERANCIA_REGRESSAO = 0.25
+TEMPO_MINIMO_REGRESSAO = 0.05
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGINA = os.path.join(RAIZ, "pages", "Indicadores.py")
+# Páginas medidas na inicialização (tempo até a primeira renderização, sem base carregada)
+PAGINAS_INICIALIZACAO = {"main": "main.py", "indicadores": os.path.join("pages", "Indicadores.py")}
+
+# Executado em um processo novo: o Streamlit já importado (como no servidor), e a primeira execução
+# da página mede as importações dela e a renderização inicial
+_SCRIPT_INICIALIZACAO = """
+import json, sys, time, tracemalloc
+sys.path.insert(0, sys.argv[1])
+from streamlit.testing.v1 import AppTest
+rastrear = sys.argv[3] == "1"
+app = AppTest.from_file(sys.argv[2], default_timeout=600)
+if rastrear:
+    tracemalloc.start()
+inicio = time.perf_counter()
+app.run()
+segundos = time.perf_counter() - inicio
+pico = tracemalloc.get_traced_memory()[1] / 1024 ** 2 if rastrear else 0.0
+erro = app.exception[0].message if app.exception else None
+print(json.dumps({"segundos": segundos, "pico_mb": pico, "erro": erro}))
+"""
+
+
+# (resultado, menor tempo em segundos, pico de memória em MB)
+def medir(funcao, repeticoes=REPETICOES):
+    tracemalloc.start()
+    try:
+        resultado = funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return resultado, min(tempos), pico / 1024 ** 2
+
+
+# Página completa via AppTest do Streamlit, com o arquivo entregue ao uploader da aba Base de Dados.
+# A primeira execução parte de caches vazios (memória e disco); a segunda é um rerun da mesma sessão.
+def _executar_pagina(conteudo, nome, rastrear_memoria):
+    from streamlit.proto.Common_pb2 import FileURLs
+    from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+    from streamlit.testing.v1 import AppTest
+
+    import streamlit as st
+
+    arquivo = UploadedFile(UploadedFileRec("benchmark", nome, "application/octet-stream", conteudo), FileURLs())
+    uploader_original = st.file_uploader
+
+    def uploader(rotulo, *args, **kwargs):
+        return arquivo if rotulo == "Upload da base de dados" else uploader_original(rotulo, *args, **kwargs)
+
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    medicoes = {}
+    with tempfile.TemporaryDirectory() as diretorio, \
+            mock.patch.object(cache_dados, "DIRETORIO_CACHE", diretorio), \
+            mock.patch.object(st, "file_uploader", uploader):
+        app = AppTest.from_file(PAGINA, default_timeout=3600)
+        for etapa in ("pagina_primeira_execucao", "pagina_rerun"):
+            if rastrear_memoria:
+                tracemalloc.start()
+            inicio = time.perf_counter()
+            app.run()
+            segundos = time.perf_counter() - inicio
+            if rastrear_memoria:
+                medicoes[etapa] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+                tracemalloc.stop()
+            else:
+                medicoes[etapa] = segundos
+            if app.exception:
+                raise RuntimeError(f"Erro ao renderizar a página: {app.exception[0].message}")
+    return medicoes
+
+
+# {etapa: (segundos, pico em MB)}; tempo e memória vêm de execuções separadas
+def medir_pagina(conteudo, nome):
+    from streamlit.testing.v1 import AppTest
+
+    # Importações da página e geometria dos estados carregadas uma vez, fora da medição
+    AppTest.from_file(PAGINA, default_timeout=3600).run()
+    carregar_estados()
+    tempos = _executar_pagina(conteudo, nome, rastrear_memoria=False)
+    picos = _executar_pagina(conteudo, nome, rastrear_memoria=True)
+    return {etapa: (tempos[etapa], picos[etapa]) for etapa in tempos}
+
+
+def _inicializar_pagina(caminho, rastrear_memoria):
+    saida = subprocess.run(
+        [sys.executable, "-c", _SCRIPT_INICIALIZACAO, RAIZ, caminho, "1" if rastrear_memoria else "0"],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    )
+    resultado = json.loads(saida.stdout.strip().splitlines()[-1])
+    if resultado["erro"]:
+        raise RuntimeError(f"Erro ao renderizar {caminho}: {resultado['erro']}")
+    return resultado
+
+
+# Tempo até a primeira renderização de cada página em um processo novo, como em uma réplica recém-criada
+# (o menor de `repeticoes` processos); o pico de memória vem de um processo separado
+def medir_inicializacao(paginas=PAGINAS_INICIALIZACAO, repeticoes=REPETICOES):
+    medicoes = []
+    for nome, relativo in paginas.items():
+        caminho = os.path.join(RAIZ, relativo)
+        segundos = min(_inicializar_pagina(caminho, False)["segundos"] for _ in range(repeticoes))
+        pico_mb = _inicializar_pagina(caminho, True)["pico_mb"]
+        medicoes.append({"linhas": 0, "formato": "-", "etapa": f"inicializacao_{nome}", "segundos": segundos, "pico_mb": pico_mb})
+    return medicoes
+
+
+def medir_tamanho(linhas, formato="parquet", semente=0, repeticoes=REPETICOES, pagina=True):
+    nome = f"base.{formato}"
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = gravar_base(gerar_base(linhas, semente), os.path.join(diretorio, nome))
+        with open(caminho, "rb") as arquivo:
+            conteudo = arquivo.read()
+    data_referencia = pd.Timestamp("2024-12-31")
+
+    medicoes = []
+
+    def registrar(etapa, funcao):
+        resultado, segundos, pico_mb = medir(funcao, repeticoes)
+        medicoes.append({"linhas": linhas, "formato": formato, "etapa": etapa, "segundos": segundos, "pico_mb": pico_mb})
+        return resultado
+
+    df = registrar("leitura", lambda: ler_base(conteudo, nome))
+    base = registrar("base_preparada", lambda: BasePreparada(df, data_referencia)).df
+    indice = registrar("indice_efetivo", lambda: IndiceEfetivoSegmentado(base))
+    cubo = registrar("cubo_turnover", lambda: CuboTurnover(indice))
+    ultimo_ano = cubo.anos()[-1]
+    registrar("metricas_principais", lambda: motor.metricas_principais(indice.total, data_referencia))
+    registrar("indicadores_turnover", lambda: motor.indicadores_turnover(cubo, ultimo_ano, {"Sexo": "Todos", "Função": "Todos"}))
+    registrar("distribuicoes_demograficas", lambda: motor.distribuicoes_demograficas(base))
+    registrar("indicadores_idade_tempo_casa", lambda: motor.indicadores_idade_tempo_casa(base))
+    registrar("indicadores_geograficos", lambda: motor.indicadores_geograficos(base))
+
+    if pagina:
+        for etapa, (segundos, pico_mb) in medir_pagina(conteudo, nome).items():
+            medicoes.append({"linhas": linhas, "formato": formato, "etapa": etapa, "segundos": segundos, "pico_mb": pico_mb})
+    return medicoes
+
+
+# Etapas mais lentas que a referência além da tolerância (ignora diferenças abaixo do tempo mínimo)
+def comparar(medicoes, referencia, tolerancia=TOLERANCIA_REGRESSAO, minimo=TEMPO_MINIMO_REGRESSAO):
+    anteriores = {(m["linhas"], m["formato"], m["etapa"]): m["segundos"] for m in referencia}
+    regressoes = []
+    for medicao in medicoes:
+        anterior = anteriores.get((medicao["linhas"], medicao["formato"], medicao["etapa"]))
+        if anterior is None:
+            continue
+        if medicao["segundos"] - anterior > minimo and medicao["segundos"] > anterior * (1 + tolerancia):
+            regressoes.append({**medicao, "segundos_referencia": anterior})
+    return regressoes
+
+
+def gravar_medicoes(medicoes, caminho):
+    if caminho.lower().endswith(".csv"):
+        pd.DataFrame(medicoes).to_csv(caminho, index=False)
+    else:
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(medicoes, arquivo, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m rh.benchmark", description="Mede tempo e memória dos indicadores")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=None, help=f"padrão: {' '.join(map(str, TAMANHOS))}")
+    parser.add_argument("--formato", choices=["xlsx", "csv", "parquet"], default="parquet")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--sem-pagina", action="store_true", help="não mede a renderização da página")
+    parser.add_argument("--inicializacao", action="store_true",
+                        help="mede o tempo até a primeira renderização das páginas (sem --tamanhos, só isso)")
+    parser.add_argument("--saida", help="grava as medições (.json ou .csv)")
+    parser.add_argument("--referencia", help="medições anteriores (.json) para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_REGRESSAO)
+    argumentos = parser.parse_args(argv)
+
+    tamanhos = argumentos.tamanhos
+    if tamanhos is None:
+        tamanhos = [] if argumentos.inicializacao else TAMANHOS
+
+    medicoes = []
+    if argumentos.inicializacao:
+        print("Medindo a inicialização das páginas...", flush=True)
+        medicoes += medir_inicializacao(repeticoes=argumentos.repeticoes)
+    for linhas in tamanhos:
+        print(f"Medindo {linhas} linhas...", flush=True)
+        medicoes += medir_tamanho(linhas, argumentos.formato, argumentos.semente, argumentos.repeticoes,
+                                  pagina=not argumentos.sem_pagina)
+
+    tabela = pd.DataFrame(medicoes)
+    print(tabela.pivot(index="etapa", columns="linhas", values="segundos").round(4).to_string())
+    print()
+    print(tabela.pivot(index="etapa", columns="linhas", values="pico_mb").round(1).add_suffix(" (MB)").to_string())
+    if argumentos.saida:
+        gravar_medicoes(medicoes, argumentos.saida)
+
+    if argumentos.referencia:
+        with open(argumentos.referencia, encoding="utf-8") as arquivo:
+            regressoes = comparar(medicoes, json.load(arquivo), argumentos.tolerancia)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao['etapa']} ({regressao['linhas']} linhas): "
+                  f"{regressao['segundos_referencia']:.3f}s -> {regressao['segundos']:.3f}s")
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# Diretório do cache em disco (sobrevive a reinícios do servidor)
+DIRETORIO_CACHE = os.environ.get(
+    "STOG_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "stog_indicadores")
+)
+
+# Limites de evicção: tamanho total do diretório e idade máxima de cada entrada
+LIMITE_MB_CACHE = int(os.environ.get("STOG_CACHE_MAX_MB", "2048"))
+IDADE_MAXIMA_DIAS_CACHE = int(os.environ.get("STOG_CACHE_MAX_DIAS", "30"))
+
+EXTENSAO = ".arrow"
+# Entra no nome de cada entrada: aumentar ao mudar a leitura das bases (rh.ingestao, rh.remuneracao) ou os
+# tipos gravados, para que entradas antigas não sejam servidas (saem pela idade/tamanho). As versões
+# principais do pandas e do pyarrow também entram, pois mudam os tipos da releitura.
+VERSAO_FORMATO = "1"
+SUFIXO_FORMATO = f"v{VERSAO_FORMATO}-pd{pd.__version__.split('.')[0]}-pa{pa.__version__.split('.')[0]}"
+
+
+# Hash do conteúdo enviado (mesmo arquivo = mesma chave, independente do nome)
+def hash_conteudo(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+# Arquivo da entrada: a chave (hash do conteúdo) com o formato da leitura
+def caminho_cache(chave, diretorio=None):
+    return os.path.join(diretorio or DIRETORIO_CACHE, f"{chave}-{SUFIXO_FORMATO}{EXTENSAO}")
+
+
+# Colunas de texto com tipos misturados (ex.: cidades numéricas) não são aceitas pelo Arrow
+def _normalizar_para_arrow(df):
+    df = df.copy(deep=False)
+    for coluna in df.columns:
+        if df[coluna].dtype == object:
+            tipo = pd.api.types.infer_dtype(df[coluna], skipna=True)
+            if tipo not in ("string", "empty"):
+                df[coluna] = df[coluna].where(df[coluna].isna(), df[coluna].astype(str))
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+
+# Lê um arquivo Arrow IPC (sem compressão) via memory-map; None se não existir ou estiver corrompido
+def ler_arrow(caminho):
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with pa.memory_map(caminho, "r") as origem:
+            tabela = ipc.open_file(origem).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return tabela.to_pandas(split_blocks=True)
+
+
+# Grava de forma atômica (arquivo temporário + rename) para não expor arquivos parciais
+def gravar_arrow(df, caminho):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    tabela = pa.Table.from_pandas(_normalizar_para_arrow(df), preserve_index=False)
+    with pa.OSFile(temporario, "wb") as destino:
+        with ipc.new_file(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+# Se há uma entrada para a chave, sem ler o arquivo
+def existe_cache(chave, diretorio=None):
+    return os.path.exists(caminho_cache(chave, diretorio))
+
+
+# Lê uma entrada do cache
+def ler_cache(chave, diretorio=None):
+    caminho = caminho_cache(chave, diretorio)
+    df = ler_arrow(caminho)
+    if df is None:
+        # Entrada corrompida (ex.: escrita interrompida): descarta e recarrega da origem
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        return None
+    # Atualiza o horário de acesso para a evicção por idade/tamanho (LRU)
+    os.utime(caminho, None)
+    return df
+
+
+def gravar_cache(chave, df, diretorio=None):
+    diretorio = diretorio or DIRETORIO_CACHE
+    caminho = gravar_arrow(df, caminho_cache(chave, diretorio))
+    # A entrada recém-gravada nunca sai, mesmo que sozinha passe do limite
+    limpar_cache(diretorio, preservar=(caminho,))
+    return caminho
+
+
+# Remove entradas antigas e, se ainda passar do limite, as menos usadas recentemente (exceto `preservar`).
+# Só os arquivos com a `extensao` contam (outros caches podem usar a mesma regra em outro diretório)
+def limpar_cache(diretorio=None, limite_mb=None, idade_maxima_dias=None, preservar=(), extensao=EXTENSAO):
+    diretorio = diretorio or DIRETORIO_CACHE
+    limite_bytes = (LIMITE_MB_CACHE if limite_mb is None else limite_mb) * 1024 * 1024
+    idade_maxima = (IDADE_MAXIMA_DIAS_CACHE if idade_maxima_dias is None else idade_maxima_dias) * 86400
+    if not os.path.isdir(diretorio):
+        return []
+
+    agora = time.time()
+    entradas = []
+    removidas = []
+    for nome in os.listdir(diretorio):
+        if not nome.endswith(extensao):
+            continue
+        caminho = os.path.join(diretorio, nome)
+        if caminho in preservar:
+            continue
+        info = os.stat(caminho)
+        if agora - info.st_mtime > idade_maxima:
+            os.remove(caminho)
+            removidas.append(caminho)
+        else:
+            entradas.append((info.st_mtime, info.st_size, caminho))
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    total += sum(os.path.getsize(caminho) for caminho in preservar if os.path.exists(caminho))
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite_bytes:
+            break
+        os.remove(caminho)
+        removidas.append(caminho)
+        total -= tamanho
+    return removidas
+
+
+# Chave da entrada do cache de onde os processos de trabalho leem a base: a de uma entrada já gravada
+# (`chave`) ou a do conteúdo de `df`, gravado se ainda não estiver lá. Só um dos dois pode ser informado,
+# para que os processos nunca calculem sobre outra base que não a passada
+def chave_para_processos(df=None, chave=None, diretorio=None):
+    if (df is None) == (chave is None):
+        raise ValueError("Informe a base ou a chave de uma entrada do cache, não as duas")
+    if chave is None:
+        chave = hash_conteudo(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        if not existe_cache(chave, diretorio):
+            gravar_cache(chave, df, diretorio)
+    elif not existe_cache(chave, diretorio):
+        raise KeyError(f"Nenhuma base no cache com a chave {chave}")
+    return chave
+
+
+# Carrega a base usando o cache: `ler(conteudo)` só é chamado na primeira vez para cada conteúdo
+def carregar_com_cache(conteudo, ler, chave=None, diretorio=None):
+    chave = chave or hash_conteudo(conteudo)
+    df = ler_cache(chave, diretorio)
+    if df is not None:
+        return df
+
+    df = ler(conteudo)
+    try:
+        gravar_cache(chave, df, diretorio)
+    except OSError:
+        # Sem espaço/permissão no diretório do cache: segue sem persistir
+        return df
+    # Relê do cache para que a primeira carga tenha os mesmos tipos das seguintes (se a releitura
+    # falhar, segue com a base lida)
+    relida = ler_cache(chave, diretorio)
+    return df if relida is None else relida
@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from plotly.utils import PlotlyJSONEncoder
+
+# Cache das figuras Plotly (e dos valores exibidos junto com elas) por (base, função, filtros).
+#
+# As entradas são guardadas serializadas em JSON, o que permite medir o tamanho de cada uma e
+# manter o total abaixo do limite (as menos usadas recentemente saem primeiro). Na leitura a spec
+# volta como dict, que o st.plotly_chart aceita sem reconstruir a figura com o plotly.express.
+
+LIMITE_MB_FIGURAS = int(os.environ.get("STOG_CACHE_FIGURAS_MB", "64"))
+
+
+def serializar(resultado):
+    return json.dumps(resultado, cls=PlotlyJSONEncoder, ensure_ascii=False)
+
+
+class CacheFiguras:
+    def __init__(self, limite_mb=LIMITE_MB_FIGURAS):
+        self.limite_bytes = limite_mb * 1024 * 1024
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    # Resultado de `construir()` (dict com figuras e valores) para a chave; sem chave, só serializa.
+    # O retorno tem sempre a mesma forma (dicts e listas do JSON), com ou sem acerto no cache.
+    def obter(self, chave, construir):
+        if chave is not None:
+            with self._trava:
+                spec = self._entradas.get(chave)
+                if spec is not None:
+                    self._entradas.move_to_end(chave)
+                    self.acertos += 1
+                    return json.loads(spec)
+                self.falhas += 1
+
+        spec = serializar(construir())
+        if chave is not None:
+            self._guardar(chave, spec)
+        return json.loads(spec)
+
+    # Resultado já guardado para a chave (None se não houver), sem construir
+    def consultar(self, chave):
+        with self._trava:
+            spec = self._entradas.get(chave)
+            if spec is None:
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+        return json.loads(spec)
+
+    def _guardar(self, chave, spec):
+        tamanho = len(spec.encode("utf-8"))
+        if tamanho > self.limite_bytes:
+            return
+        with self._trava:
+            anterior = self._entradas.pop(chave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior.encode("utf-8"))
+            self._entradas[chave] = spec
+            self._bytes += tamanho
+            while self._bytes > self.limite_bytes:
+                _, removida = self._entradas.popitem(last=False)
+                self._bytes -= len(removida.encode("utf-8"))
+
+    def estatisticas(self):
+        return {
+            "entradas": len(self._entradas),
+            "memoria_mb": self._bytes / 1024 ** 2,
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+        }
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+            self._bytes = 0
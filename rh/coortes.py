@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+# Retenção por coorte de contratação e curvas de sobrevivência (Kaplan-Meier) do tempo de casa.
+#
+# Tudo parte de duas durações por colaborador, em meses completos desde a contratação: até o
+# desligamento (infinita para quem segue ativo) e até a data de referência (o tempo observado).
+# Com elas, cada matriz ou curva é um histograma (np.bincount) acumulado do fim para o início —
+# "quantos chegaram a N meses" —, sem laços por colaborador.
+
+HORIZONTE_MESES = 60
+FREQUENCIAS = {"M": 1, "Y": 12}
+
+
+DIA_NS = 86_400 * 10 ** 9
+DIAS_MES = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+# Mês absoluto (ano * 12 + mês - 1) e nanossegundos desde o início do mês de cada data (0 para NaT).
+# Ano, mês e dia saem dos dias desde 1970 por aritmética inteira (algoritmo civil_from_days de
+# H. Hinnant), bem mais rápida que converter para datetime64[M] ou usar os campos .dt do pandas.
+def _mes_e_resto(datas):
+    datas = np.asarray(datas, dtype="datetime64[ns]")
+    nanossegundos = np.where(np.isnat(datas), 0, datas.view(np.int64))
+    dias, resto_dia = np.divmod(nanossegundos, DIA_NS)
+    z = dias + 719_468
+    era = np.floor_divide(z, 146_097)
+    dia_era = z - era * 146_097
+    ano_era = (dia_era - dia_era // 1_460 + dia_era // 36_524 - dia_era // 146_096) // 365
+    dia_ano = dia_era - (365 * ano_era + ano_era // 4 - ano_era // 100)
+    mp = (5 * dia_ano + 2) // 153
+    dia = dia_ano - (153 * mp + 2) // 5 + 1
+    mes = np.where(mp < 10, mp + 3, mp - 9)
+    ano = ano_era + era * 400 + (mes <= 2)
+    return ano * 12 + mes - 1, (dia - 1) * DIA_NS + resto_dia
+
+
+# Meses completos entre duas séries de datas (datetime64[ns]); NaT vira -1
+def meses_completos(inicio, fim):
+    inicio = np.asarray(inicio, dtype="datetime64[ns]")
+    fim = np.asarray(fim, dtype="datetime64[ns]")
+    meses = _diferenca_meses(_mes_e_resto(inicio), _mes_e_resto(fim))
+    return np.where(np.isnat(inicio) | np.isnat(fim), -1, meses)
+
+
+# Dias do mês absoluto (ano * 12 + mês - 1)
+def _dias_no_mes(meses):
+    ano, mes = np.divmod(meses, 12)
+    bissexto = (ano % 4 == 0) & ((ano % 100 != 0) | (ano % 400 == 0))
+    return DIAS_MES[mes] + ((mes == 1) & bissexto)
+
+
+# Mês ainda não completado quando o fim é anterior ao aniversário no mês do fim: o dia (e hora) do
+# início, limitado ao último dia do mês, como em pd.DateOffset (31/01 completa um mês em 28/02)
+def _diferenca_meses(inicio, fim):
+    aniversario = np.minimum(inicio[1], (_dias_no_mes(fim[0]) - 1) * DIA_NS + inicio[1] % DIA_NS)
+    return fim[0] - inicio[0] - (fim[1] < aniversario)
+
+
+# Tempo até o desligamento (limitado ao tempo observado), tempo observado até a data de referência
+# (meses completos; -1 sem data de contratação), se o desligamento foi observado e o mês absoluto
+# da contratação. Cada coluna de datas é decomposta uma única vez.
+def _duracoes(contratado, desligado, data_referencia):
+    contratado = pd.to_datetime(pd.Series(contratado), errors="coerce").to_numpy(dtype="datetime64[ns]")
+    desligado = pd.to_datetime(pd.Series(desligado), errors="coerce").to_numpy(dtype="datetime64[ns]")
+    referencia = np.datetime64(pd.Timestamp(data_referencia), "ns")
+
+    campos_contratado = _mes_e_resto(contratado)
+    observado = _diferenca_meses(campos_contratado, _mes_e_resto(np.array([referencia])))
+    observado = np.where(np.isnat(contratado), -1, observado)
+    desligou = ~np.isnat(desligado) & (desligado <= referencia)
+    # Desligamento anterior à contratação (erro de cadastro) conta como saída no primeiro mês
+    ate_saida = np.maximum(_diferenca_meses(campos_contratado, _mes_e_resto(desligado)), 0)
+    ate_saida = np.where(desligou, ate_saida, observado)
+    return np.minimum(ate_saida, observado), observado, desligou, campos_contratado[0]
+
+
+def duracoes(contratado, desligado, data_referencia):
+    return _duracoes(contratado, desligado, data_referencia)[:3]
+
+
+# Quantidade de colaboradores de cada grupo com valor >= N, para N = 0..horizonte (grupos x N)
+def _alcancaram(grupos, valores, quantidade_grupos, horizonte):
+    limitados = np.clip(valores, -1, horizonte + 1) + 1
+    contagem = np.bincount(grupos * (horizonte + 3) + limitados, minlength=quantidade_grupos * (horizonte + 3))
+    contagem = contagem.reshape(quantidade_grupos, horizonte + 3)
+    return contagem[:, ::-1].cumsum(axis=1)[:, ::-1][:, 1:horizonte + 2]
+
+
+# Matriz de retenção: coortes mensais ('M') ou anuais ('Y') de contratação nas linhas e períodos
+# desde a contratação (meses ou anos) nas colunas, com o percentual da coorte ainda ativo.
+# Células que a coorte inteira ainda não alcançou ficam vazias. A coluna 'Contratados' traz o tamanho.
+def matriz_retencao(df, data_referencia, freq="Y", horizonte=None):
+    passo = FREQUENCIAS[freq]
+    horizonte = (HORIZONTE_MESES // passo) if horizonte is None else horizonte
+    tempo, observado, _, mes_contratacao = _duracoes(df["Contratado"], df["Desligado"], data_referencia)
+
+    # Coorte = mês ou ano da contratação, como inteiro, para fatorar rápido
+    validos = observado >= 0
+    codigos, inteiros = pd.factorize(mes_contratacao[validos] // passo, sort=True)
+    inteiros = np.asarray(inteiros) * passo
+    rotulos = pd.PeriodIndex.from_fields(year=inteiros // 12, month=inteiros % 12 + 1, freq="M").asfreq(freq)
+    if not len(rotulos):
+        return pd.DataFrame(columns=["Contratados"] + list(range(horizonte + 1)))
+
+    # Períodos completos (meses ou anos) de permanência e de observação
+    tempo, observado = tempo[validos] // passo, observado[validos] // passo
+    retidos = _alcancaram(codigos, tempo, len(rotulos), horizonte)
+    observaveis = _alcancaram(codigos, observado, len(rotulos), horizonte)
+    tamanhos = np.bincount(codigos, minlength=len(rotulos))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentual = np.where(observaveis == tamanhos[:, np.newaxis], retidos / tamanhos[:, np.newaxis] * 100, np.nan)
+    matriz = pd.DataFrame(percentual, index=rotulos.astype(str), columns=range(horizonte + 1))
+    matriz.insert(0, "Contratados", tamanhos)
+    matriz.index.name = "Coorte"
+    return matriz
+
+
+# Curvas de Kaplan-Meier do tempo de casa (probabilidade de seguir ativo após N meses completos),
+# uma por valor de `coluna` (ex.: 'Função' ou 'Sexo') ou só a da base toda, em formato longo.
+# Quem segue ativo na data de referência entra como observação censurada.
+def sobrevivencia_tempo_casa(df, data_referencia, coluna=None, horizonte=HORIZONTE_MESES * 2):
+    tempo, observado, desligou = duracoes(df["Contratado"], df["Desligado"], data_referencia)
+    if coluna is None:
+        codigos, grupos = np.zeros(len(tempo), dtype=np.int64), np.array(["Todos"], dtype=object)
+    else:
+        codigos, grupos = pd.factorize(df[coluna], sort=True)
+    # Sem data de contratação ou sem valor na coluna ficam fora das curvas
+    validos = (observado >= 0) & (codigos >= 0)
+    codigos, tempo, desligou = codigos[validos], tempo[validos], desligou[validos]
+
+    colunas = ["Grupo", "Meses", "Sobrevivência", "Em risco", "Desligamentos"]
+    if not len(grupos):
+        return pd.DataFrame(columns=colunas)
+
+    largura = horizonte + 2
+    # Em risco em N: quem ficou pelo menos N meses (desligados ou censurados)
+    em_risco = _alcancaram(codigos, tempo, len(grupos), horizonte)
+    eventos = np.bincount(
+        codigos[desligou] * largura + np.minimum(tempo[desligou], horizonte + 1),
+        minlength=len(grupos) * largura,
+    ).reshape(len(grupos), largura)[:, :horizonte + 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fatores = np.where(em_risco > 0, 1 - eventos / em_risco, 1.0)
+    sobrevivencia = fatores.cumprod(axis=1)
+
+    return pd.DataFrame({
+        "Grupo": np.repeat(np.asarray(grupos, dtype=object), horizonte + 1),
+        "Meses": np.tile(np.arange(horizonte + 1), len(grupos)),
+        "Sobrevivência": sobrevivencia.ravel() * 100,
+        "Em risco": em_risco.ravel(),
+        "Desligamentos": eventos.ravel(),
+    }, columns=colunas)
+
+
+# Mediana do tempo de casa por grupo: primeiro mês em que a sobrevivência chega a 50% (vazio se não chega)
+def mediana_tempo_casa(curvas):
+    abaixo = curvas[curvas["Sobrevivência"] <= 50]
+    medianas = abaixo.groupby("Grupo", sort=False)["Meses"].min()
+    return medianas.reindex(curvas["Grupo"].unique())
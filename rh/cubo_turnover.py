@@ -0,0 +1,155 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+METRICAS = ["Contratações", "Desligamentos", "Ativos início", "Ativos fim"]
+
+
+# Meses (períodos mensais) cobertos pelos anos com movimentação, de janeiro a dezembro
+def periodos_cubo(anos):
+    if not anos:
+        return pd.PeriodIndex([], freq="M")
+    return pd.period_range(f"{min(anos)}-01", f"{max(anos)}-12", freq="M")
+
+
+# Métricas mensais (meses x METRICAS) de um índice de efetivo para os períodos informados
+def movimentacao_mensal(indice, periodos):
+    valores = np.zeros((len(periodos), len(METRICAS)), dtype=np.int64)
+    if not len(periodos):
+        return valores
+    limites = periodos.start_time.append(pd.DatetimeIndex([(periodos[-1] + 1).start_time])).to_numpy(dtype="datetime64[ns]")
+    # Fim do mês = último dia às 00:00, como nas consultas por '{ano}-12-31'
+    fim_meses = limites[1:] - np.timedelta64(1, "D")
+    valores[:, 0] = indice.contagem_entradas(limites)
+    valores[:, 1] = indice.contagem_saidas(limites)
+    # Quem sai no próprio dia ainda conta como ativo (Desligado >= d), como na aba Rotatividade
+    valores[:, 2] = indice.ativos(limites[:-1], desligamento_inclusivo=True)
+    valores[:, 3] = indice.ativos(fim_meses, desligamento_inclusivo=True)
+    return valores
+
+
+# Cubo mensal de movimentação por segmento (Sexo x Função), montado uma vez por base.
+#
+# Para cada combinação de valores — e para cada agregação "Todos" de uma ou mais colunas —
+# guarda um array (meses x métricas). Mudar um filtro vira uma busca no dicionário de
+# posições e um fatiamento, sem voltar à base de colaboradores.
+class CuboTurnover:
+    def __init__(self, indice):
+        periodos = periodos_cubo(indice.total.anos())
+        chaves = list(indice.segmentos)
+        valores = np.zeros((len(chaves), len(periodos), len(METRICAS)), dtype=np.int64)
+        for i, segmento in enumerate(indice.segmentos.values()):
+            valores[i] = movimentacao_mensal(segmento, periodos)
+        self._montar(list(indice.colunas), chaves, periodos, valores)
+
+    # Cubo a partir do formato longo de para_dataframe() (ex.: agregados persistidos no armazém)
+    @classmethod
+    def de_dataframe(cls, longo, colunas=("Sexo", "Função")):
+        colunas = list(colunas)
+        cubo = object.__new__(cls)
+        if longo.empty:
+            cubo._montar(colunas, [], pd.PeriodIndex([], freq="M"), np.zeros((0, 0, len(METRICAS)), dtype=np.int64))
+            return cubo
+        periodos = periodos_cubo(longo["Ano"].unique().tolist())
+        posicao_mes = (longo["Ano"].to_numpy() - periodos[0].year) * 12 + longo["Mês"].to_numpy() - 1
+        codigos, chaves = pd.factorize(pd.Series(list(zip(*(longo[c] for c in colunas))), dtype=object), sort=False)
+        valores = np.zeros((len(chaves), len(periodos), len(METRICAS)), dtype=np.int64)
+        valores[codigos, posicao_mes] = longo[METRICAS].to_numpy(dtype=np.int64)
+        cubo._montar(colunas, list(chaves), periodos, valores)
+        return cubo
+
+    def _montar(self, colunas, chaves, periodos, valores):
+        self.colunas = colunas
+        self.periodos = periodos
+
+        # Pré-agrega todos os níveis: (valor, valor), (valor, Todos), (Todos, valor), (Todos, Todos)...
+        self._valores_colunas = {coluna: list(dict.fromkeys(chave[i] for chave in chaves)) for i, coluna in enumerate(self.colunas)}
+        blocos, self._posicoes = [], {}
+        for nivel in itertools.product([False, True], repeat=len(self.colunas)):
+            chaves_nivel = [tuple(None if agregado else valor for valor, agregado in zip(chave, nivel)) for chave in chaves]
+            codigos, unicos = pd.factorize(pd.Series(chaves_nivel, dtype=object), use_na_sentinel=False)
+            agregado = np.zeros((len(unicos), len(self.periodos), len(METRICAS)), dtype=np.int64)
+            np.add.at(agregado, codigos, valores)
+            deslocamento = sum(len(bloco) for bloco in blocos)
+            for posicao, chave in enumerate(unicos):
+                self._posicoes[chave] = deslocamento + posicao
+            blocos.append(agregado)
+        if not chaves:
+            blocos = [np.zeros((1, len(self.periodos), len(METRICAS)), dtype=np.int64)]
+            self._posicoes[tuple(None for _ in self.colunas)] = 0
+        self._cubo = np.concatenate(blocos)
+
+    # Valores distintos de uma coluna (ordem de aparição na base), para os filtros
+    def valores(self, coluna):
+        return list(self._valores_colunas.get(coluna, []))
+
+    def _chave(self, filtros):
+        filtros = filtros or {}
+        return tuple(None if filtros.get(coluna) in (None, "Todos") else filtros[coluna] for coluna in self.colunas)
+
+    # Série mensal (Contratações, Desligamentos, Ativos início/fim) para os filtros informados
+    def fatiar(self, filtros=None, ano=None):
+        posicao = self._posicoes.get(self._chave(filtros))
+        if posicao is None:
+            dados = np.zeros((len(self.periodos), len(METRICAS)), dtype=np.int64)
+        else:
+            dados = self._cubo[posicao]
+        periodos = self.periodos
+        if ano is not None:
+            meses = periodos.year == ano
+            dados, periodos = dados[meses], periodos[meses]
+        return pd.DataFrame(dados, index=periodos, columns=METRICAS)
+
+    # Séries mensais de todos os valores de uma coluna, empilhadas (valores x meses x métricas), mantendo
+    # os demais filtros: uma única indexação no cubo para detalhar o recorte por Sexo ou Função
+    def fatias_por(self, coluna, filtros=None):
+        posicao_coluna = self.colunas.index(coluna)
+        base = list(self._chave(filtros))
+        valores = self.valores(coluna)
+        posicoes = []
+        for valor in valores:
+            base[posicao_coluna] = valor
+            posicoes.append(self._posicoes.get(tuple(base), -1))
+        posicoes = np.array(posicoes, dtype=np.int64)
+        dados = np.zeros((len(valores), len(self.periodos), len(METRICAS)), dtype=np.int64)
+        presentes = posicoes >= 0
+        dados[presentes] = self._cubo[posicoes[presentes]]
+        return valores, dados
+
+    # Anos com alguma contratação ou desligamento no recorte
+    def anos(self, filtros=None):
+        fatia = self.fatiar(filtros)
+        movimentado = (fatia["Contratações"] + fatia["Desligamentos"]) > 0
+        return sorted(set(fatia.index[movimentado.to_numpy()].year))
+
+    # Combinações de valores presentes na base (sem os níveis agregados "Todos")
+    def combinacoes(self):
+        return [chave for chave in self._posicoes if None not in chave]
+
+    # Totais do ano: entradas, saídas e ativos em 01/01 e 31/12
+    def resumo_ano(self, ano, filtros=None):
+        fatia = self.fatiar(filtros, ano=ano)
+        if fatia.empty:
+            return {"entradas": 0, "saidas": 0, "ativos_inicio": 0, "ativos_fim": 0}
+        return {
+            "entradas": int(fatia["Contratações"].sum()),
+            "saidas": int(fatia["Desligamentos"].sum()),
+            "ativos_inicio": int(fatia["Ativos início"].iloc[0]),
+            "ativos_fim": int(fatia["Ativos fim"].iloc[-1]),
+        }
+
+    # Cubo em formato longo (Ano, Mês, colunas de segmentação, métricas), só com as combinações da base
+    def para_dataframe(self):
+        linhas = []
+        for chave in self.combinacoes():
+            posicao = self._posicoes[chave]
+            parte = pd.DataFrame(self._cubo[posicao], columns=METRICAS)
+            parte.insert(0, "Ano", self.periodos.year)
+            parte.insert(1, "Mês", self.periodos.month)
+            for i, coluna in enumerate(self.colunas):
+                parte.insert(2 + i, coluna, chave[i])
+            linhas.append(parte)
+        if not linhas:
+            return pd.DataFrame(columns=["Ano", "Mês"] + self.colunas + METRICAS)
+        return pd.concat(linhas, ignore_index=True)
@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+
+UM_NS = np.timedelta64(1, "ns")
+
+
+# Converte uma coluna de datas em array datetime64[ns] (valores inválidos viram NaT)
+def _datas_coluna(valores):
+    return pd.to_datetime(pd.Series(valores), errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+
+# Aceita uma data ou uma lista de datas (Timestamp, string, datetime...) para consulta
+def _datas_consulta(datas):
+    escalar = np.ndim(datas) == 0
+    valores = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(datas))).to_numpy(dtype="datetime64[ns]")
+    return valores, escalar
+
+
+# Limites [início de cada período, ..., início do período seguinte] entre duas datas
+def limites_periodos(inicio, fim, freq="M"):
+    periodos = pd.period_range(pd.Timestamp(inicio), pd.Timestamp(fim), freq=freq)
+    limites = periodos.start_time.append(pd.DatetimeIndex([(periodos[-1] + 1).start_time]))
+    return periodos, limites.to_numpy(dtype="datetime64[ns]")
+
+
+# Consultas comuns a um índice simples e a uma soma de segmentos
+class _ConsultasEfetivo:
+    # Colaboradores ativos em cada data de uma série diária ('D') ou de fim de mês ('M')
+    def serie(self, inicio, fim, freq="D", desligamento_inclusivo=False):
+        if freq == "D":
+            datas = pd.date_range(pd.Timestamp(inicio).normalize(), pd.Timestamp(fim).normalize(), freq="D")
+        else:
+            datas = pd.period_range(pd.Timestamp(inicio), pd.Timestamp(fim), freq=freq).to_timestamp(how="end").normalize()
+        return pd.Series(self.ativos(datas, desligamento_inclusivo), index=datas, name="Ativos")
+
+    # Entradas e saídas por período (mensal por padrão) entre duas datas
+    def movimentacao(self, inicio, fim, freq="M"):
+        periodos, limites = limites_periodos(inicio, fim, freq)
+        return pd.DataFrame(
+            {"Contratações": self.contagem_entradas(limites), "Desligamentos": self.contagem_saidas(limites)},
+            index=periodos,
+        )
+
+    def entradas_no_ano(self, ano):
+        return int(self.contagem_entradas(_limites_ano(ano))[0])
+
+    def saidas_no_ano(self, ano):
+        return int(self.contagem_saidas(_limites_ano(ano))[0])
+
+
+def _limites_ano(ano):
+    return np.array([f"{ano}-01-01", f"{ano + 1}-01-01"], dtype="datetime64[ns]")
+
+
+# Índice de efetivo: contratações e desligamentos ordenados, consultados por busca binária.
+#
+# Um colaborador está ativo em d se Contratado <= d e (Desligado vazio ou Desligado > d).
+# Como "Contratado <= d e Desligado <= d" equivale a "max(Contratado, Desligado) <= d",
+# basta contar quantas contratações e quantas saídas efetivas (o máximo das duas datas)
+# ocorreram até d: ativos(d) = #contratações <= d - #saídas efetivas <= d.
+class IndiceEfetivo(_ConsultasEfetivo):
+    def __init__(self, contratado, desligado):
+        contratado = _datas_coluna(contratado)
+        desligado = _datas_coluna(desligado)
+
+        # Contagens de entradas/saídas por período usam a data registrada, como nas métricas originais
+        self.contratacoes = np.sort(contratado[~np.isnat(contratado)])
+        self.desligamentos = np.sort(desligado[~np.isnat(desligado)])
+
+        com_saida = ~np.isnat(contratado) & ~np.isnat(desligado)
+        inicio, fim = contratado[com_saida], desligado[com_saida]
+        self._saidas_efetivas = np.sort(np.maximum(inicio, fim))
+        # Variante em que quem sai exatamente em d ainda conta como ativo (Desligado >= d)
+        self._saidas_efetivas_inclusivas = np.sort(np.maximum(inicio, fim + UM_NS))
+
+    def __len__(self):
+        return len(self.contratacoes)
+
+    # Colaboradores ativos em uma data (ou em cada data de uma lista)
+    def ativos(self, datas, desligamento_inclusivo=False):
+        datas, escalar = _datas_consulta(datas)
+        saidas = self._saidas_efetivas_inclusivas if desligamento_inclusivo else self._saidas_efetivas
+        resultado = np.searchsorted(self.contratacoes, datas, side="right") - np.searchsorted(saidas, datas, side="right")
+        return int(resultado[0]) if escalar else resultado
+
+    # Contratações em cada intervalo [limites[i], limites[i + 1])
+    def contagem_entradas(self, limites):
+        return np.diff(np.searchsorted(self.contratacoes, limites, side="left"))
+
+    def contagem_saidas(self, limites):
+        return np.diff(np.searchsorted(self.desligamentos, limites, side="left"))
+
+    # Anos com alguma contratação ou desligamento
+    def anos(self):
+        eventos = np.concatenate([self.contratacoes, self.desligamentos]).astype("datetime64[Y]")
+        return (np.unique(eventos).astype(int) + 1970).tolist()
+
+
+# Eventos contados por dia: dias em ordem e quantidade acumulada (com um zero à frente)
+def _acumulado(dias, quantidades):
+    dias = _datas_coluna(dias)
+    quantidades = np.asarray(quantidades, dtype=np.int64)
+    validos = ~np.isnat(dias)
+    ordem = np.argsort(dias[validos], kind="stable")
+    return dias[validos][ordem], np.concatenate([[0], np.cumsum(quantidades[validos][ordem])])
+
+
+# Quantidade de eventos antes de cada data (side="left") ou até ela (side="right")
+def _contar_ate(acumulado, datas, side):
+    dias, soma = acumulado
+    return soma[np.searchsorted(dias, datas, side=side)]
+
+
+# Índice de efetivo a partir de contagens por dia, em vez de uma linha por colaborador (ex.: GROUP BY no
+# banco, rh.fonte_sql). Cada evento é um par (dias, quantidades): contratações, desligamentos e as saídas
+# efetivas max(Contratado, Desligado), sem e com o dia seguinte ao desligamento (variante inclusiva). As
+# consultas são as mesmas do IndiceEfetivo, exatas para datas sem hora.
+class IndiceEfetivoAgregado(_ConsultasEfetivo):
+    def __init__(self, contratacoes, desligamentos, saidas_efetivas, saidas_efetivas_inclusivas):
+        self._contratacoes = _acumulado(*contratacoes)
+        self._desligamentos = _acumulado(*desligamentos)
+        self._saidas_efetivas = _acumulado(*saidas_efetivas)
+        self._saidas_efetivas_inclusivas = _acumulado(*saidas_efetivas_inclusivas)
+
+    def __len__(self):
+        return int(self._contratacoes[1][-1])
+
+    def ativos(self, datas, desligamento_inclusivo=False):
+        datas, escalar = _datas_consulta(datas)
+        saidas = self._saidas_efetivas_inclusivas if desligamento_inclusivo else self._saidas_efetivas
+        resultado = _contar_ate(self._contratacoes, datas, "right") - _contar_ate(saidas, datas, "right")
+        return int(resultado[0]) if escalar else resultado
+
+    def contagem_entradas(self, limites):
+        return np.diff(_contar_ate(self._contratacoes, limites, "left"))
+
+    def contagem_saidas(self, limites):
+        return np.diff(_contar_ate(self._desligamentos, limites, "left"))
+
+    def anos(self):
+        eventos = np.concatenate([self._contratacoes[0], self._desligamentos[0]]).astype("datetime64[Y]")
+        return (np.unique(eventos).astype(int) + 1970).tolist()
+
+
+# Soma de vários índices (ex.: todas as funções de um gênero)
+class _SomaIndices(_ConsultasEfetivo):
+    def __init__(self, indices):
+        self.indices = list(indices)
+
+    def __len__(self):
+        return sum(len(indice) for indice in self.indices)
+
+    def _somar(self, metodo, *args):
+        resultados = [getattr(indice, metodo)(*args) for indice in self.indices]
+        if not resultados:
+            return 0
+        return sum(resultados[1:], resultados[0])
+
+    def ativos(self, datas, desligamento_inclusivo=False):
+        if not self.indices:
+            datas, escalar = _datas_consulta(datas)
+            return 0 if escalar else np.zeros(len(datas), dtype=int)
+        return self._somar("ativos", datas, desligamento_inclusivo)
+
+    def contagem_entradas(self, limites):
+        return self._somar("contagem_entradas", limites) if self.indices else np.zeros(len(limites) - 1, dtype=int)
+
+    def contagem_saidas(self, limites):
+        return self._somar("contagem_saidas", limites) if self.indices else np.zeros(len(limites) - 1, dtype=int)
+
+    def anos(self):
+        return sorted(set().union(*(indice.anos() for indice in self.indices)))
+
+
+# Índices por combinação de colunas (Sexo x Função), montados uma vez na carga da base
+class IndiceEfetivoSegmentado:
+    def __init__(self, df, colunas=("Sexo", "Função")):
+        self.colunas = list(colunas)
+        self.total = IndiceEfetivo(df["Contratado"], df["Desligado"])
+        # sort=False mantém a ordem de aparição, usada nas opções dos filtros
+        self.segmentos = {
+            (chave if isinstance(chave, tuple) else (chave,)): IndiceEfetivo(grupo["Contratado"], grupo["Desligado"])
+            for chave, grupo in df.groupby(self.colunas, sort=False, dropna=False)
+        }
+
+    # Índice montado a partir de índices já separados por segmento ({(valor, valor): índice}), ex.:
+    # IndiceEfetivoAgregado de cada combinação de Sexo x Função vinda do banco
+    @classmethod
+    def de_segmentos(cls, segmentos, colunas=("Sexo", "Função")):
+        indice = object.__new__(cls)
+        indice.colunas = list(colunas)
+        indice.segmentos = dict(segmentos)
+        indice.total = _SomaIndices(indice.segmentos.values())
+        return indice
+
+    # Valores distintos de uma das colunas de segmentação
+    def valores(self, coluna):
+        posicao = self.colunas.index(coluna)
+        return list(dict.fromkeys(chave[posicao] for chave in self.segmentos))
+
+    # Índice restrito aos filtros informados ({coluna: valor}); "Todos" ou None não filtra
+    def filtrar(self, filtros=None):
+        filtros = {coluna: valor for coluna, valor in (filtros or {}).items() if valor not in (None, "Todos")}
+        if not filtros:
+            return self.total
+        posicoes = {self.colunas.index(coluna): valor for coluna, valor in filtros.items()}
+        return _SomaIndices(
+            indice for chave, indice in self.segmentos.items()
+            if all(chave[posicao] == valor for posicao, valor in posicoes.items())
+        )
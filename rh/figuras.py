@@ -0,0 +1,223 @@
+import pandas as pd
+
+# Figuras das abas do painel a partir dos indicadores do motor. A página e a exportação de
+# relatórios (rh.relatorios) desenham com as mesmas funções, então os gráficos são idênticos.
+# O plotly.express é importado dentro de cada função, na primeira figura desenhada, e não na
+# abertura da página.
+
+
+# Aba Demografia: gênero, estado civil e dependentes (percentuais de motor.distribuicoes_demograficas)
+def figuras_demografia(distribuicoes):
+    import plotly.express as px
+
+    # Gráfico 1: Distribuição de Gênero
+    genero_data = {
+        "Gênero": ['Masculino', 'Feminino'],
+        "Percentual": list(distribuicoes['genero'].values())
+    }
+    fig_genero = px.bar(
+        genero_data,
+        x="Percentual",
+        y="Gênero",
+        orientation='h',
+        title="Distribuição de Gênero dos Colaboradores",
+        labels={"Percentual": "Percentual (%)", "Gênero": "Gênero"},
+        color="Gênero",
+        color_discrete_sequence=["skyblue", "pink"]
+    )
+
+    # Gráfico 2: Estado Civil
+    estado_civil_data = {
+        "Estado Civil": ['Casado', 'Solteiro'],
+        "Percentual": list(distribuicoes['estado_civil'].values())
+    }
+    fig_estado_civil = px.bar(
+        estado_civil_data,
+        x="Percentual",
+        y="Estado Civil",
+        orientation='h',
+        title="Distribuição por Estado Civil",
+        labels={"Percentual": "Percentual (%)", "Estado Civil": "Estado Civil"},
+        color="Estado Civil",
+        color_discrete_sequence=["lightcoral", "lightgreen"]
+    )
+
+    # Gráfico 3: Dependentes (Com ou Sem Filhos)
+    filhos_data = {
+        "Categoria": ['Com Filhos', 'Sem Filhos'],
+        "Percentual": list(distribuicoes['filhos'].values())
+    }
+    fig_filhos = px.bar(
+        filhos_data,
+        x="Percentual",
+        y="Categoria",
+        orientation='h',
+        title="Distribuição de Dependentes (Com ou Sem Filhos)",
+        labels={"Percentual": "Percentual (%)", "Categoria": "Categoria"},
+        color="Categoria",
+        color_discrete_sequence=["orange", "lightblue"]
+    )
+    return [fig_genero, fig_estado_civil, fig_filhos]
+
+
+# Aba Idade/tempo de casa: faixas etárias e de tempo de casa (motor.indicadores_idade_tempo_casa)
+def figuras_idade_tempo_casa(indicadores):
+    import plotly.express as px
+
+    fig_faixas_etarias = px.bar(
+        indicadores['faixas_etarias'],
+        x='Faixa Etária',
+        y='Percentual',
+        text='Percentual',
+        labels={'Percentual': 'Percentual (%)'},
+        title="Distribuição por Faixas Etárias",
+    )
+    fig_faixas_etarias.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
+    fig_faixas_etarias.update_layout(yaxis_title='Percentual (%)', showlegend=False)
+
+    fig_faixas_tempo_casa = px.bar(
+        indicadores['faixas_tempo_casa'],
+        x='Faixa de Tempo de Casa',
+        y='Percentual',
+        text='Percentual',
+        labels={'Percentual': 'Percentual (%)'},
+        title="Distribuição por Faixas de Tempo de Casa",
+    )
+    fig_faixas_tempo_casa.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
+    fig_faixas_tempo_casa.update_layout(yaxis_title='Percentual (%)', showlegend=False)
+    return [fig_faixas_etarias, fig_faixas_tempo_casa]
+
+
+# Aba Localização: mapa por estado (None sem a geometria) e top cidades (motor.indicadores_geograficos)
+def figuras_localizacao(geograficos, geojson_data):
+    import plotly.express as px
+
+    dist_estado = geograficos['por_estado']
+
+    # Mapa interativo com Plotly (None sem a geometria dos estados)
+    fig = None
+    if geojson_data is not None:
+        fig = px.choropleth(
+            dist_estado,
+            geojson=geojson_data,
+            locations="Sigla",
+            featureidkey="properties.sigla",  # Mapeia com as siglas no GeoJSON
+            color="Quantidade",
+            hover_name="Estado",
+            color_continuous_scale="Blues",
+            title="Distribuição de Colaboradores por Estado"
+        )
+        fig.update_geos(fitbounds="locations", visible=False)  # Ajustar o mapa
+
+    # Gráfico de barras com Plotly
+    fig_cidades = px.bar(
+        geograficos['top_cidades'],
+        x='Quantidade',
+        y='Cidade',
+        text='Quantidade',
+        orientation='h',
+        labels={'Quantidade': 'Quantidade de Colaboradores', 'Cidade': 'Cidade'},
+        title="Distribuição por Cidade - Top 5",
+    )
+    fig_cidades.update_traces(texttemplate='%{text}', textposition='outside')
+    fig_cidades.update_layout(yaxis_title='Cidade', xaxis_title='Quantidade de Colaboradores', showlegend=False)
+    return {'mapa': fig, 'cidades': fig_cidades}
+
+
+# Aba Rotatividade: entradas e saídas do ano, meses do ano e, sem filtro de gênero, a comparação por
+# gênero (motor.indicadores_turnover)
+def figuras_rotatividade(turnover):
+    import plotly.express as px
+
+    ano = turnover['ano']
+
+    # Gráfico de barras: Entradas e saídas gerais
+    df_entradas_saidas = pd.DataFrame({
+        'Tipo': ['Entradas', 'Saídas'],
+        'Quantidade': [turnover['entradas'], turnover['saidas']]
+    })
+
+    fig_entradas_saidas = px.bar(
+        df_entradas_saidas,
+        x='Tipo',
+        y='Quantidade',
+        text='Quantidade',
+        labels={'Quantidade': 'Quantidade de Colaboradores', 'Tipo': 'Tipo'},
+        title=f"Entradas e Saídas de Colaboradores ({ano})",
+        color='Tipo',
+        color_discrete_map={'Entradas': '#2E8B57', 'Saídas': '#FF6347'}
+    )
+    fig_entradas_saidas.update_traces(texttemplate='%{text}', textposition='outside')
+    fig_entradas_saidas.update_layout(showlegend=False)
+
+    # Gráfico de linha para os meses do ano selecionado
+    fig_timeline = px.line(
+        turnover['mensal'],
+        x='Mês',
+        y=['Contratações', 'Desligamentos'],
+        labels={'value': 'Quantidade', 'Mês': 'Mês'},
+        title="Entradas e Saídas de Colaboradores ao Longo do Ano",
+        markers=True
+    )
+    fig_timeline.update_layout(
+        yaxis_title='Quantidade',
+        xaxis_title='Mês',
+        legend_title_text='Indicador',
+        hovermode='x unified'
+    )
+
+    figuras = {'entradas_saidas': fig_entradas_saidas, 'timeline': fig_timeline}
+
+    if 'por_genero' in turnover:
+        turnover_quantidades = turnover['por_genero']
+
+        # Preparar os dados para o gráfico
+        df_grafico_genero = pd.DataFrame({
+            "Gênero": ["Masculino", "Masculino", "Feminino", "Feminino"],
+            "Tipo": ["Entradas", "Saídas", "Entradas", "Saídas"],
+            "Quantidade": [
+                turnover_quantidades["Masculino"]["Entradas"],
+                turnover_quantidades["Masculino"]["Saídas"],
+                turnover_quantidades["Feminino"]["Entradas"],
+                turnover_quantidades["Feminino"]["Saídas"]
+            ]
+        })
+
+        fig_genero = px.bar(
+            df_grafico_genero,
+            x="Tipo",
+            y="Quantidade",
+            color="Gênero",
+            barmode="group",
+            title=f'Comparação de Entradas e Saídas de Colaboradores por Gênero ({ano})',
+            labels={"Quantidade": "Quantidade de Colaboradores", "Tipo": "Tipo"},
+            color_discrete_map={"Masculino": "#1f77b4", "Feminino": "#FF69B4"}
+        )
+        fig_genero.update_traces(texttemplate='%{y}', textposition='outside')
+        figuras['genero'] = fig_genero
+    return figuras
+
+
+# Mapa municipal (motor.indicadores_municipios): municípios pelo código IBGE ou microrregiões, com a
+# geometria só dos locais com colaboradores (rh.geografia)
+def figura_municipios(tabela, geojson_data, agregacao):
+    import plotly.express as px
+
+    microrregioes = agregacao == "microrregioes"
+    tabela = tabela.assign(Local=tabela["Microrregião" if microrregioes else "Código"].astype(str))
+    fig = px.choropleth(
+        tabela,
+        geojson=geojson_data,
+        locations="Local",
+        featureidkey="properties.codigo",
+        color="Quantidade",
+        hover_name="Nome da microrregião" if microrregioes else "Município",
+        hover_data={"Local": False, "UF": True, "Quantidade": True},
+        color_continuous_scale="Blues",
+        title=f"Distribuição de Colaboradores por {'Microrregião' if microrregioes else 'Município'}",
+    )
+    # Microrregiões sem contorno: as divisas entre os municípios que as compõem não aparecem
+    fig.update_traces(marker_line_width=0 if microrregioes else 0.3)
+    fig.update_geos(fitbounds="locations", visible=False)
+    fig.update_layout(margin={"l": 0, "r": 0, "t": 40, "b": 0})
+    return fig
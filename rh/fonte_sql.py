@@ -0,0 +1,347 @@
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from rh.base_preparada import COLUNAS_DATA
+from rh.efetivo import IndiceEfetivoAgregado, IndiceEfetivoSegmentado
+from rh.ingestao import COLUNAS_LEITURA, LIMITE_MEMORIA_MB, TAMANHO_BLOCO, ler_cursor_em_blocos
+from rh.validacao import VALORES_SEXO
+
+# Base de colaboradores em um banco SQL, no lugar do arquivo enviado.
+#
+# Os indicadores agregados são calculados no próprio banco, com duas consultas GROUP BY: o índice de efetivo
+# (contratações, desligamentos e saídas efetivas por dia e por Sexo x Função) e o perfil (quantidade por
+# combinação de Sexo, estado civil, filhos, Estado e Cidade), de onde saem as contagens de Demografia/Localização
+# e os pares Estado/Cidade do mapa municipal. Só esses resumos chegam ao servidor, então o painel cresce com o
+# banco e não com a memória do processo. As linhas só são lidas (em blocos, com o limite de memória de
+# rh.ingestao) para o que depende delas: idade, coortes, previsão e a tabela da base.
+#
+# As conexões vêm de um pool (DB-API 2.0): são reaproveitadas entre as execuções e as sessões e as duas
+# consultas rodam em paralelo, cada uma em uma conexão. SQLite vem com o Python; DuckDB é opcional.
+#
+# As regras de validação de uma linha só (rh.validacao) entram nas duas consultas; a de colaborador
+# duplicado depende das outras linhas e fica só na leitura das linhas.
+
+TAMANHO_POOL = int(os.environ.get("STOG_SQL_POOL", "4"))
+URL_PADRAO = os.environ.get("STOG_SQL_URL", "")
+TABELA_PADRAO = os.environ.get("STOG_SQL_TABELA", "colaboradores")
+# Segundos entre duas conferências da versão da tabela (mudanças no banco aparecem depois disso)
+VALIDADE_VERSAO = int(os.environ.get("STOG_SQL_VALIDADE", "60"))
+# Segundos que os agregados e as linhas ficam no cache mesmo sem mudança de versão (alterações que a versão
+# não percebe aparecem depois disso)
+VALIDADE_AGREGADOS = int(os.environ.get("STOG_SQL_VALIDADE_AGREGADOS", "3600"))
+
+COLUNAS_PERFIL = ["Sexo", "Casado", "Tem filhos", "Estado", "Cidade"]
+COLUNAS_SEGMENTO = ["Sexo", "Função"]
+COLUNAS_OBRIGATORIAS = ["Contratado", "Desligado"] + COLUNAS_SEGMENTO
+
+# Expressões que mudam entre os bancos: dia de uma data, dia seguinte e maior de dois valores.
+# "padrao" serve para DuckDB e PostgreSQL (colunas de data tipadas, então não há data inválida a conferir)
+DIALETOS = {
+    "sqlite": {
+        "dia": "date({})",
+        "dia_seguinte": "date({}, '+1 day')",
+        "maior": "max({}, {})",
+        "data_valida": "({0} IS NULL OR date({0}) IS NOT NULL)",
+    },
+    "padrao": {
+        "dia": "CAST({} AS DATE)",
+        "dia_seguinte": "{} + 1",
+        "maior": "greatest({}, {})",
+        "data_valida": None,
+    },
+}
+
+_NOME_TABELA = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$")
+
+
+def _identificador(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+def _literal(valor):
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+# Conexões DB-API reaproveitadas: no máximo `tamanho` em uso ao mesmo tempo, criadas sob demanda. Uma
+# conexão que deu erro é descartada; as demais voltam ao pool com a transação de leitura encerrada.
+class PoolConexoes:
+    def __init__(self, conectar, tamanho=TAMANHO_POOL, erros=Exception):
+        self._conectar = conectar
+        self._erros = erros
+        self.tamanho = tamanho
+        self._livres = queue.LifoQueue()
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._trava = threading.Lock()
+        self.criadas = 0
+        self.emprestimos = 0
+
+    @contextmanager
+    def conexao(self):
+        with self._vagas:
+            try:
+                conexao = self._livres.get_nowait()
+            except queue.Empty:
+                conexao = self._conectar()
+                with self._trava:
+                    self.criadas += 1
+            with self._trava:
+                self.emprestimos += 1
+            try:
+                yield conexao
+            except BaseException:
+                self._fechar(conexao)
+                raise
+            try:
+                conexao.rollback()
+            except self._erros:
+                # Ex.: DuckDB sem transação aberta
+                pass
+            self._livres.put(conexao)
+
+    def _fechar(self, conexao):
+        try:
+            conexao.close()
+        except self._erros:
+            pass
+
+    def estatisticas(self):
+        return {
+            "tamanho": self.tamanho,
+            "criadas": self.criadas,
+            "livres": self._livres.qsize(),
+            "emprestimos": self.emprestimos,
+        }
+
+    def fechar(self):
+        while True:
+            try:
+                self._fechar(self._livres.get_nowait())
+            except queue.Empty:
+                return
+
+
+# Abre o banco somente para leitura a partir de uma URL "sqlite:///caminho.db" ou "duckdb:///caminho.duckdb";
+# devolve também os arquivos do banco (o principal e o de log), que mudam a cada escrita
+def _conector(url):
+    esquema, separador, caminho = url.partition(":///")
+    if not separador or not caminho:
+        raise ValueError(f"URL de banco inválida: '{url}'. Use sqlite:///caminho.db ou duckdb:///caminho.duckdb")
+    if esquema == "sqlite":
+        import sqlite3
+
+        if not os.path.exists(caminho):
+            raise ValueError(f"Banco SQLite não encontrado: {caminho}")
+        uri = f"file:{caminho}?mode=ro"
+        conectar = lambda: sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return conectar, "sqlite", sqlite3.Error, [caminho, f"{caminho}-wal"]
+    if esquema == "duckdb":
+        try:
+            import duckdb
+        except ImportError as erro:
+            raise ValueError("O pacote duckdb não está instalado (pip install duckdb)") from erro
+        return lambda: duckdb.connect(caminho, read_only=True), "padrao", duckdb.Error, [caminho, f"{caminho}.wal"]
+    raise ValueError(f"Banco não suportado: '{esquema}'. Use sqlite ou duckdb")
+
+
+# Data de modificação e tamanho de um arquivo do banco (None se não existir, ex.: log já incorporado)
+def _marca_arquivo(caminho):
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    return [caminho, info.st_mtime_ns, info.st_size]
+
+
+# Contagem por valor das colunas de Demografia/Localização, no formato das contagens do armazém
+def contagens_perfil(perfil):
+    contagens = {}
+    for coluna in COLUNAS_PERFIL:
+        if coluna in perfil.columns:
+            contagem = perfil.groupby(coluna, sort=False)["quantidade"].sum().sort_values(ascending=False, kind="stable")
+            contagens[coluna] = pd.Series(contagem.to_numpy(dtype="int64"), index=contagem.index.astype(object), name="count")
+    return contagens
+
+
+# Colaboradores por par Estado/Cidade (entrada de motor.indicadores_municipios)
+def pares_municipios(perfil):
+    colunas = ["Estado", "Cidade", "Quantidade"]
+    if "Estado" not in perfil.columns or "Cidade" not in perfil.columns:
+        return pd.DataFrame(columns=colunas)
+    pares = perfil.groupby(["Estado", "Cidade"], sort=False)["quantidade"].sum().reset_index()
+    return pares.set_axis(colunas, axis=1).astype({"Estado": object, "Cidade": object})
+
+
+class FonteSQL:
+    # `conectar` devolve uma conexão DB-API nova; `erros` é a classe de erro do driver; `arquivos` são os
+    # arquivos do banco, cuja data de modificação e tamanho entram na versão
+    def __init__(self, conectar, tabela=TABELA_PADRAO, dialeto="sqlite", tamanho_pool=TAMANHO_POOL, erros=Exception,
+                 arquivos=()):
+        if not _NOME_TABELA.match(tabela or ""):
+            raise ValueError(f"Nome de tabela inválido: '{tabela}'")
+        if dialeto not in DIALETOS:
+            raise ValueError(f"Dialeto SQL desconhecido: '{dialeto}'. Use um destes: {', '.join(DIALETOS)}")
+        self.tabela = tabela
+        self._tabela_sql = ".".join(_identificador(parte) for parte in tabela.split("."))
+        self._dialeto = DIALETOS[dialeto]
+        self._erros = erros
+        self.pool = PoolConexoes(conectar, tamanho_pool, erros)
+        self.arquivos = list(arquivos)
+        self._colunas = None
+
+    @classmethod
+    def de_url(cls, url, tabela=TABELA_PADRAO, tamanho_pool=TAMANHO_POOL):
+        conectar, dialeto, erros, arquivos = _conector(url)
+        return cls(conectar, tabela, dialeto, tamanho_pool, erros, arquivos)
+
+    def _consultar(self, sql):
+        try:
+            with self.pool.conexao() as conexao:
+                cursor = conexao.cursor()
+                cursor.execute(sql)
+                return cursor.fetchall()
+        except self._erros as erro:
+            raise ValueError(f"Falha na consulta à tabela {self.tabela}: {erro}") from erro
+
+    def _expressao(self, nome, *argumentos):
+        return self._dialeto[nome].format(*argumentos)
+
+    def _ler_colunas(self):
+        try:
+            with self.pool.conexao() as conexao:
+                cursor = conexao.cursor()
+                cursor.execute(f"SELECT * FROM {self._tabela_sql} WHERE 1 = 0")
+                return [descricao[0] for descricao in cursor.description]
+        except self._erros as erro:
+            raise ValueError(f"Falha na consulta à tabela {self.tabela}: {erro}") from erro
+
+    # Colunas da tabela (lidas uma vez e de novo a cada versao())
+    def colunas(self):
+        if self._colunas is None:
+            self._colunas = self._ler_colunas()
+        return self._colunas
+
+    def _exigir(self, colunas):
+        faltando = [coluna for coluna in colunas if coluna not in self.colunas()]
+        if faltando:
+            raise KeyError(f"A tabela {self.tabela} não tem as colunas: {', '.join(faltando)}")
+
+    # Condição das linhas sem inconsistências de rh.validacao (exceto duplicados)
+    def _condicao_validas(self):
+        colunas = self.colunas()
+        condicoes = []
+        if "Contratado" in colunas and "Desligado" in colunas:
+            contratado, desligado = (self._expressao("dia", _identificador(c)) for c in ("Contratado", "Desligado"))
+            condicoes.append(f"({desligado} IS NULL OR {contratado} IS NULL OR {desligado} >= {contratado})")
+        if self._dialeto["data_valida"] is not None:
+            condicoes += [self._expressao("data_valida", _identificador(c)) for c in COLUNAS_DATA if c in colunas]
+        if "Sexo" in colunas:
+            condicoes.append(f"{_identificador('Sexo')} IN ({', '.join(_literal(v) for v in VALORES_SEXO)})")
+        return " AND ".join(condicoes) or "1 = 1"
+
+    # Identifica o conteúdo atual da tabela (chave dos caches): as colunas, um resumo de agregação e a data de
+    # modificação e o tamanho dos arquivos do banco, que mudam a cada escrita confirmada. Sem arquivos (conector
+    # próprio), só o resumo: uma alteração que mantém as contagens e as datas extremas não muda a versão, e os
+    # caches do painel só a percebem quando expiram (VALIDADE_AGREGADOS)
+    def versao(self):
+        # A estrutura da tabela pode ter mudado desde a última conferência
+        self._colunas = self._ler_colunas()
+        self._exigir(["Contratado", "Desligado"])
+        contratado, desligado = _identificador("Contratado"), _identificador("Desligado")
+        resumo = self._consultar(
+            f"SELECT COUNT(*), COUNT({desligado}), MIN({contratado}), MAX({contratado}), MAX({desligado}) "
+            f"FROM {self._tabela_sql}"
+        )[0]
+        arquivos = [_marca_arquivo(caminho) for caminho in self.arquivos]
+        conteudo = json.dumps([self.tabela, self.colunas(), [str(valor) for valor in resumo], arquivos],
+                              ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode()).hexdigest()
+
+    def contar_linhas(self):
+        return int(self._consultar(f"SELECT COUNT(*) FROM {self._tabela_sql}")[0][0])
+
+    # Índice de efetivo por Sexo x Função em uma única consulta: as linhas são agrupadas uma vez por segmento e
+    # par de dias (Contratado, Desligado); desses grupos saem, para cada tipo de evento, as quantidades por dia
+    def indice_efetivo(self):
+        self._exigir(COLUNAS_OBRIGATORIAS)
+        sexo, funcao = _identificador("Sexo"), _identificador("Função")
+        contratado = self._expressao("dia", _identificador("Contratado"))
+        desligado = self._expressao("dia", _identificador("Desligado"))
+        eventos = [
+            ("c", "c IS NOT NULL"),
+            ("d", "d IS NOT NULL"),
+            (self._expressao("maior", "c", "d"), "c IS NOT NULL AND d IS NOT NULL"),
+            (self._expressao("maior", "c", self._expressao("dia_seguinte", "d")), "c IS NOT NULL AND d IS NOT NULL"),
+        ]
+        consultas = [
+            f"SELECT {tipo} AS tipo, s, f, {dia} AS dia, SUM(n) AS quantidade FROM pares WHERE {condicao} GROUP BY 1, 2, 3, 4"
+            for tipo, (dia, condicao) in enumerate(eventos)
+        ]
+        linhas = self._consultar(
+            f"WITH pares AS (SELECT {sexo} AS s, {funcao} AS f, {contratado} AS c, {desligado} AS d, COUNT(*) AS n "
+            f"FROM {self._tabela_sql} WHERE {self._condicao_validas()} GROUP BY 1, 2, 3, 4) "
+            + " UNION ALL ".join(consultas)
+        )
+        eventos = pd.DataFrame.from_records(linhas, columns=["tipo"] + COLUNAS_SEGMENTO + ["dia", "quantidade"])
+        eventos["dia"] = pd.to_datetime(eventos["dia"], errors="coerce")
+
+        vazio = (np.array([], dtype="datetime64[ns]"), np.array([], dtype=np.int64))
+        segmentos = {}
+        for chave, grupo in eventos.groupby(COLUNAS_SEGMENTO, sort=False, dropna=False):
+            por_tipo = {tipo: (g["dia"], g["quantidade"]) for tipo, g in grupo.groupby("tipo")}
+            segmentos[tuple(chave)] = IndiceEfetivoAgregado(*(por_tipo.get(tipo, vazio) for tipo in range(4)))
+        return IndiceEfetivoSegmentado.de_segmentos(segmentos, COLUNAS_SEGMENTO)
+
+    # Quantidade de linhas por combinação das colunas de perfil, com a coluna "valida" (1 = passa nas regras
+    # de validação). Poucas combinações: o que sai daqui é pequeno mesmo com milhões de linhas
+    def perfil(self):
+        colunas = [coluna for coluna in COLUNAS_PERFIL if coluna in self.colunas()]
+        agrupamento = ", ".join(str(posicao) for posicao in range(1, len(colunas) + 2))
+        selecao = "".join(f", {_identificador(coluna)}" for coluna in colunas)
+        linhas = self._consultar(
+            f"SELECT CASE WHEN {self._condicao_validas()} THEN 1 ELSE 0 END AS valida{selecao}, COUNT(*) "
+            f"FROM {self._tabela_sql} GROUP BY {agrupamento}"
+        )
+        return pd.DataFrame.from_records(linhas, columns=["valida"] + colunas + ["quantidade"])
+
+    # Todos os agregados do painel, com as duas consultas em paralelo (uma conexão do pool para cada)
+    def agregados(self):
+        self.colunas()
+        with ThreadPoolExecutor(max_workers=min(2, self.pool.tamanho)) as executor:
+            indice = executor.submit(self.indice_efetivo)
+            perfil = executor.submit(self.perfil)
+            indice, perfil = indice.result(), perfil.result()
+        validas = perfil[perfil["valida"] == 1]
+        return {
+            "indice": indice,
+            "contagens": contagens_perfil(validas),
+            "pares": pares_municipios(validas),
+            "linhas": (int(perfil["quantidade"].sum()), int(validas["quantidade"].sum())),
+        }
+
+    # Linhas da tabela (só as colunas usadas pelos indicadores), lidas em blocos com o mesmo limite de
+    # memória e a mesma validação dos arquivos
+    def ler_linhas(self, tamanho_bloco=TAMANHO_BLOCO, limite_memoria_mb=LIMITE_MEMORIA_MB, progresso=None,
+                   validar=False):
+        presentes = [coluna for coluna in COLUNAS_LEITURA if coluna in self.colunas()]
+        if not presentes:
+            raise KeyError(f"A tabela {self.tabela} não tem nenhuma das colunas da base de colaboradores")
+        total = self.contar_linhas() if progresso is not None else None
+        try:
+            with self.pool.conexao() as conexao:
+                cursor = conexao.cursor()
+                cursor.execute(f"SELECT {', '.join(_identificador(c) for c in presentes)} FROM {self._tabela_sql}")
+                return ler_cursor_em_blocos(cursor, tamanho_bloco, limite_memoria_mb, progresso, total, validar)
+        except self._erros as erro:
+            raise ValueError(f"Falha na leitura da tabela {self.tabela}: {erro}") from erro
+
+    def fechar(self):
+        self.pool.fechar()
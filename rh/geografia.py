@@ -0,0 +1,456 @@
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+from rh.cache_dados import DIRETORIO_CACHE
+
+# Arquivos de geometria distribuídos junto com o código (gerados com `python -m rh.geografia preparar`
+# a partir da malha municipal do IBGE de 2005, escala 1:2.500.000)
+DIRETORIO_DADOS = os.path.join(os.path.dirname(__file__), "dados")
+ARQUIVO_ESTADOS = "brasil_estados.geojson"
+ARQUIVO_ESTADOS_SIMPLIFICADO = "brasil_estados_simplificado.geojson"
+
+# Origem usada apenas quando os arquivos locais não existem e o download foi habilitado
+# (STOG_GEOGRAFIA_DOWNLOAD=1); por padrão o painel não faz nenhuma requisição à internet
+URL_ESTADOS = "https://raw.githubusercontent.com/codeforamerica/click_that_hood/master/public/data/brazil-states.geojson"
+DOWNLOAD_GEOGRAFIA = os.environ.get("STOG_GEOGRAFIA_DOWNLOAD", "0") == "1"
+TIMEOUT_DOWNLOAD = 10
+# Segundos até uma nova tentativa de download depois de uma falha (sem travar cada renderização no timeout)
+INTERVALO_NOVO_DOWNLOAD = 300
+
+# Tolerância da simplificação em graus (~1 km) e casas decimais mantidas nas coordenadas
+TOLERANCIA_SIMPLIFICACAO = 0.01
+CASAS_DECIMAIS = 4
+
+# Municípios: tabela do IBGE (código, nome, UF e microrregião) com o índice nome -> código já
+# calculado, malha municipal em níveis de detalhe (um arquivo por UF e nível, lido só quando o estado
+# aparece no mapa) e microrregiões. Gerados com `python -m rh.geografia preparar-municipios`.
+ARQUIVO_MUNICIPIOS = "brasil_municipios.json"
+ARQUIVO_MICRORREGIOES = "brasil_microrregioes.geojson"
+DIRETORIO_MALHA_MUNICIPIOS = "municipios"
+URL_MUNICIPIOS = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios"
+URL_MALHA_MUNICIPIOS = (
+    "https://servicodados.ibge.gov.br/api/v3/malhas/paises/BR"
+    "?formato=application/vnd.geo+json&qualidade=intermediaria&intrarregiao=municipio"
+)
+# Tolerância (graus) de cada nível de detalhe da malha municipal e da malha das microrregiões
+NIVEIS_DETALHE = {"detalhado": 0.001, "medio": 0.005}
+TOLERANCIA_MICRORREGIOES = 0.02
+# Acima deste número de municípios no mapa, a malha municipal usa o nível médio
+LIMITE_MUNICIPIOS_DETALHADOS = 150
+
+# Código IBGE da UF (dois primeiros dígitos do código do município) -> sigla
+CODIGOS_UF = {
+    11: 'RO', 12: 'AC', 13: 'AM', 14: 'RR', 15: 'PA', 16: 'AP', 17: 'TO', 21: 'MA', 22: 'PI',
+    23: 'CE', 24: 'RN', 25: 'PB', 26: 'PE', 27: 'AL', 28: 'SE', 29: 'BA', 31: 'MG', 32: 'ES',
+    33: 'RJ', 35: 'SP', 41: 'PR', 42: 'SC', 43: 'RS', 50: 'MS', 51: 'MT', 52: 'GO', 53: 'DF'
+}
+
+# Grafias antigas ou populares ainda encontradas nas bases -> nome oficial atual
+NOMES_ALTERNATIVOS_MUNICIPIOS = {
+    ("SP", "Embu"): "Embu das Artes",
+    ("SP", "Moji Mirim"): "Mogi Mirim",
+    ("SP", "Moji das Cruzes"): "Mogi das Cruzes",
+    ("SP", "Moji Guaçu"): "Mogi Guaçu",
+    ("RJ", "Parati"): "Paraty",
+    ("RJ", "Trajano de Morais"): "Trajano de Moraes",
+    ("RN", "Assu"): "Açu",
+    ("RN", "Boa Saúde"): "Januário Cicco",
+    ("RN", "Presidente Juscelino"): "Serra Caiada",
+    ("PB", "Santarém"): "Joca Claudino",
+    ("PE", "Iguaraci"): "Iguaracy",
+    ("MT", "Poxoréo"): "Poxoréu",
+    ("TO", "São Valério da Natividade"): "São Valério",
+    ("MG", "Brasópolis"): "Brazópolis",
+    ("MG", "Dona Eusébia"): "Dona Euzébia",
+    ("CE", "Itapagé"): "Itapajé",
+    ("RN", "Augusto Severo"): "Campo Grande",
+    ("BA", "Muquém de São Francisco"): "Muquém do São Francisco",
+    ("PE", "Belém de São Francisco"): "Belém do São Francisco",
+    ("PE", "Lagoa do Itaenga"): "Lagoa de Itaenga",
+    ("SE", "Amparo de São Francisco"): "Amparo do São Francisco",
+    ("SP", "Florínia"): "Florínea",
+    ("PA", "Eldorado dos Carajás"): "Eldorado do Carajás",
+    ("PA", "Santa Isabel do Pará"): "Santa Izabel do Pará",
+    ("TO", "Fortaleza do Tabocão"): "Tabocão",
+}
+
+# Mapeamento para siglas do IBGE
+SIGLAS_ESTADOS = {
+    'Acre': 'AC', 'Alagoas': 'AL', 'Amapá': 'AP', 'Amazonas': 'AM', 'Bahia': 'BA',
+    'Ceará': 'CE', 'Distrito Federal': 'DF', 'Espírito Santo': 'ES', 'Goiás': 'GO',
+    'Maranhão': 'MA', 'Mato Grosso': 'MT', 'Mato Grosso do Sul': 'MS', 'Minas Gerais': 'MG',
+    'Pará': 'PA', 'Paraíba': 'PB', 'Paraná': 'PR', 'Pernambuco': 'PE', 'Piauí': 'PI',
+    'Rio de Janeiro': 'RJ', 'Rio Grande do Norte': 'RN', 'Rio Grande do Sul': 'RS',
+    'Rondônia': 'RO', 'Roraima': 'RR', 'Santa Catarina': 'SC', 'São Paulo': 'SP',
+    'Sergipe': 'SE', 'Tocantins': 'TO'
+}
+
+
+# Douglas-Peucker iterativo: mantém só os vértices que se afastam mais que `tolerancia` da reta
+def _douglas_peucker(pontos, tolerancia):
+    n = len(pontos)
+    if n <= 4:
+        return pontos
+    manter = np.zeros(n, dtype=bool)
+    manter[0] = manter[-1] = True
+    pilha = [(0, n - 1)]
+    while pilha:
+        i, j = pilha.pop()
+        if j <= i + 1:
+            continue
+        inicio, fim = pontos[i], pontos[j]
+        trecho = pontos[i + 1:j]
+        direcao = fim - inicio
+        comprimento = np.hypot(*direcao)
+        if comprimento == 0:
+            distancias = np.hypot(*(trecho - inicio).T)
+        else:
+            distancias = np.abs(direcao[0] * (trecho[:, 1] - inicio[1]) - direcao[1] * (trecho[:, 0] - inicio[0])) / comprimento
+        k = int(np.argmax(distancias))
+        if distancias[k] > tolerancia:
+            manter[i + 1 + k] = True
+            pilha.append((i, i + 1 + k))
+            pilha.append((i + 1 + k, j))
+    return pontos[manter]
+
+
+def _simplificar_anel(anel, tolerancia, casas):
+    pontos = np.asarray(anel, dtype=float)
+    simplificado = _douglas_peucker(pontos, tolerancia)
+    # Anéis que colapsam (ilhas muito pequenas) ficam com a geometria original
+    if len(simplificado) < 4:
+        simplificado = pontos
+    return np.round(simplificado, casas).tolist()
+
+
+def _simplificar_geometria(geometria, tolerancia, casas):
+    if geometria["type"] == "Polygon":
+        coordenadas = [_simplificar_anel(anel, tolerancia, casas) for anel in geometria["coordinates"]]
+    elif geometria["type"] == "MultiPolygon":
+        coordenadas = [[_simplificar_anel(anel, tolerancia, casas) for anel in poligono] for poligono in geometria["coordinates"]]
+    else:
+        return geometria
+    return {"type": geometria["type"], "coordinates": coordenadas}
+
+
+# Versão com menos vértices de um FeatureCollection (para renderização rápida do choropleth)
+def simplificar_geojson(geojson, tolerancia=TOLERANCIA_SIMPLIFICACAO, casas=CASAS_DECIMAIS):
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": feature.get("properties", {}),
+                "geometry": _simplificar_geometria(feature["geometry"], tolerancia, casas),
+            }
+            for feature in geojson["features"]
+        ],
+    }
+
+
+def contar_vertices(geojson):
+    total = 0
+    for feature in geojson["features"]:
+        geometria = feature["geometry"]
+        poligonos = [geometria["coordinates"]] if geometria["type"] == "Polygon" else geometria["coordinates"]
+        total += sum(len(anel) for poligono in poligonos for anel in poligono)
+    return total
+
+
+def _ler_json(caminho):
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def _gravar_json(dados, caminho):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temporario, caminho)
+
+
+def _baixar(url, timeout=TIMEOUT_DOWNLOAD):
+    import requests
+
+    resposta = requests.get(url, timeout=timeout)
+    resposta.raise_for_status()
+    return resposta.json()
+
+
+def _ler_origem(origem):
+    return _baixar(origem) if origem.startswith(("http://", "https://")) else _ler_json(origem)
+
+
+# Gera os arquivos completo e simplificado a partir de um GeoJSON local ou de uma URL
+def preparar_geometria(origem=URL_ESTADOS, destino=DIRETORIO_DADOS, tolerancia=TOLERANCIA_SIMPLIFICACAO):
+    geojson = _ler_origem(origem)
+    simplificado = simplificar_geojson(geojson, tolerancia)
+    _gravar_json(geojson, os.path.join(destino, ARQUIVO_ESTADOS))
+    _gravar_json(simplificado, os.path.join(destino, ARQUIVO_ESTADOS_SIMPLIFICADO))
+    return contar_vertices(geojson), contar_vertices(simplificado)
+
+
+# Procura o arquivo nos dados distribuídos e, em seguida, no cache local
+def _localizar(nome):
+    for diretorio in (DIRETORIO_DADOS, os.path.join(DIRETORIO_CACHE, "geografia")):
+        caminho = os.path.join(diretorio, nome)
+        if os.path.exists(caminho):
+            return caminho
+    return None
+
+
+@functools.lru_cache(maxsize=2)
+def _ler_estados(caminho):
+    geojson = _ler_json(caminho)
+    por_sigla = {feature["properties"].get("sigla"): feature for feature in geojson["features"]}
+    return geojson, por_sigla
+
+
+_download_estados = {"falha": None, "trava": threading.Lock()}
+
+
+# Geometria dos estados (uma vez por processo) e o índice sigla -> feature.
+# Sem os arquivos locais devolve (None, {}). Só com o download habilitado tenta baixar e guarda no
+# cache; a falha não fica guardada e a próxima tentativa acontece depois de INTERVALO_NOVO_DOWNLOAD segundos
+def carregar_estados(simplificado=True):
+    nome = ARQUIVO_ESTADOS_SIMPLIFICADO if simplificado else ARQUIVO_ESTADOS
+    caminho = _localizar(nome)
+    if caminho is None and DOWNLOAD_GEOGRAFIA:
+        with _download_estados["trava"]:
+            caminho = _localizar(nome)
+            falha = _download_estados["falha"]
+            if caminho is None and (falha is None or time.monotonic() - falha > INTERVALO_NOVO_DOWNLOAD):
+                try:
+                    preparar_geometria(URL_ESTADOS, os.path.join(DIRETORIO_CACHE, "geografia"))
+                except Exception:
+                    _download_estados["falha"] = time.monotonic()
+                else:
+                    _download_estados["falha"] = None
+                caminho = _localizar(nome)
+    if caminho is None:
+        return None, {}
+    return _ler_estados(caminho)
+
+
+# FeatureCollection só com os estados informados (reduz o payload enviado ao navegador)
+def geojson_estados(siglas, simplificado=True):
+    _, por_sigla = carregar_estados(simplificado)
+    features = [por_sigla[sigla] for sigla in dict.fromkeys(siglas) if sigla in por_sigla]
+    if not features:
+        return None
+    return {"type": "FeatureCollection", "features": features}
+
+
+
+# Chave de comparação de nomes: sem acentos, minúscula, só letras e números ("Sant'Ana" = "santana")
+def normalizar_nome(nome):
+    texto = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode("ascii").lower()
+    texto = re.sub(r"['`´]", "", texto)
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", texto).split())
+
+
+# Microrregião do município na resposta da API de localidades do IBGE (municípios criados depois
+# de 2017 podem vir só com a região imediata)
+def _microrregiao(municipio):
+    microrregiao = municipio.get("microrregiao")
+    if microrregiao:
+        return microrregiao["id"], microrregiao["nome"], microrregiao["mesorregiao"]["UF"]["sigla"]
+    imediata = municipio["regiao-imediata"]
+    return imediata["id"], imediata["nome"], imediata["regiao-intermediaria"]["UF"]["sigla"]
+
+
+# Código IBGE de uma feature da malha (API de malhas: 'codarea'; shapefiles convertidos: 'CD_MUN')
+def _codigo_feature(feature):
+    propriedades = feature.get("properties") or {}
+    for campo in ("codarea", "CD_MUN", "codigo", "id"):
+        if propriedades.get(campo) is not None:
+            return int(propriedades[campo])
+    return int(feature["id"])
+
+
+def _poligonos(geometria):
+    return [geometria["coordinates"]] if geometria["type"] == "Polygon" else geometria["coordinates"]
+
+
+# Gera a tabela de municípios (com o índice nome -> código), a malha municipal por UF em cada nível
+# de detalhe e a malha das microrregiões, a partir da API de localidades e da malha do IBGE
+def preparar_municipios(origem_malha=URL_MALHA_MUNICIPIOS, origem_tabela=URL_MUNICIPIOS, destino=DIRETORIO_DADOS):
+    municipios, microrregioes, indice, por_nome = {}, {}, {}, {}
+    for municipio in _ler_origem(origem_tabela):
+        codigo = int(municipio["id"])
+        id_microrregiao, nome_microrregiao, uf = _microrregiao(municipio)
+        municipios[str(codigo)] = {"nome": municipio["nome"], "uf": uf, "microrregiao": id_microrregiao}
+        microrregioes[str(id_microrregiao)] = {"nome": nome_microrregiao, "uf": uf}
+        nome = normalizar_nome(municipio["nome"])
+        indice[f"{uf}|{nome}"] = codigo
+        por_nome.setdefault(nome, []).append(codigo)
+    for (uf, alternativo), oficial in NOMES_ALTERNATIVOS_MUNICIPIOS.items():
+        codigo = indice.get(f"{uf}|{normalizar_nome(oficial)}")
+        if codigo is not None:
+            indice.setdefault(f"{uf}|{normalizar_nome(alternativo)}", codigo)
+    # Sem o estado, só os nomes que existem em uma única UF
+    for nome, codigos in por_nome.items():
+        if len(codigos) == 1:
+            indice[f"|{nome}"] = codigos[0]
+    _gravar_json({"municipios": municipios, "microrregioes": microrregioes, "indice": indice},
+                 os.path.join(destino, ARQUIVO_MUNICIPIOS))
+
+    por_uf = {}
+    for feature in _ler_origem(origem_malha)["features"]:
+        codigo = _codigo_feature(feature)
+        por_uf.setdefault(CODIGOS_UF.get(codigo // 100_000), {})[codigo] = feature["geometry"]
+    por_uf.pop(None, None)
+    vertices = {}
+    for nivel, tolerancia in NIVEIS_DETALHE.items():
+        vertices[nivel] = 0
+        for uf, geometrias in por_uf.items():
+            simplificadas = {str(codigo): _simplificar_geometria(geometria, tolerancia, CASAS_DECIMAIS)
+                             for codigo, geometria in geometrias.items()}
+            vertices[nivel] += sum(len(anel) for geometria in simplificadas.values()
+                                   for poligono in _poligonos(geometria) for anel in poligono)
+            _gravar_json(simplificadas, os.path.join(destino, DIRETORIO_MALHA_MUNICIPIOS, nivel, f"{uf}.json"))
+
+    # Microrregião = os polígonos dos seus municípios, bem simplificados, em um único MultiPolygon. As
+    # divisas internas não são dissolvidas (sem dependência de bibliotecas de geometria); o mapa as
+    # desenha sem contorno.
+    membros = {}
+    for geometrias in por_uf.values():
+        for codigo, geometria in geometrias.items():
+            municipio = municipios.get(str(codigo))
+            if municipio is not None:
+                simplificada = _simplificar_geometria(geometria, TOLERANCIA_MICRORREGIOES, CASAS_DECIMAIS)
+                membros.setdefault(str(municipio["microrregiao"]), []).extend(_poligonos(simplificada))
+    features = [
+        {"type": "Feature", "id": codigo,
+         "properties": {"codigo": codigo, "nome": microrregioes[codigo]["nome"], "uf": microrregioes[codigo]["uf"]},
+         "geometry": {"type": "MultiPolygon", "coordinates": poligonos}}
+        for codigo, poligonos in membros.items()
+    ]
+    _gravar_json({"type": "FeatureCollection", "features": features}, os.path.join(destino, ARQUIVO_MICRORREGIOES))
+    return {"municipios": len(municipios), "microrregioes": len(features), "vertices": vertices}
+
+
+# Tabela e índice dos municípios (uma vez por processo); None sem os arquivos. Não há download: a
+# tabela, as microrregiões e o nível médio da malha são distribuídos em rh/dados.
+@functools.lru_cache(maxsize=1)
+def carregar_municipios():
+    caminho = _localizar(ARQUIVO_MUNICIPIOS)
+    return None if caminho is None else _ler_json(caminho)
+
+
+# Código IBGE de cada par (cidade, estado), -1 se não encontrado. O estado pode ser o nome ou a
+# sigla; sem estado, vale a sigla no fim do nome ("Campinas - SP", "Campinas/SP") ou um nome que só
+# exista em uma UF. Feito sobre os pares distintos (centenas), não sobre as linhas da base.
+def codigos_municipios(cidades, estados):
+    dados = carregar_municipios()
+    indice = {} if dados is None else dados["indice"]
+    siglas = set(CODIGOS_UF.values())
+    codigos = []
+    for cidade, estado in zip(cidades, estados):
+        if cidade is None or (isinstance(cidade, float) and np.isnan(cidade)):
+            codigos.append(-1)
+            continue
+        cidade = str(cidade)
+        sigla = SIGLAS_ESTADOS.get(estado, estado if estado in siglas else "")
+        sufixo = re.match(r"^(.*?)\s*[-/(]\s*([A-Za-z]{2})\)?$", cidade)
+        if sufixo and sufixo.group(2).upper() in siglas:
+            cidade, sigla = sufixo.group(1), sigla or sufixo.group(2).upper()
+        nome = normalizar_nome(cidade)
+        codigos.append(indice.get(f"{sigla}|{nome}", indice.get(f"|{nome}", -1)))
+    return np.array(codigos, dtype=np.int64)
+
+
+# Nome oficial, UF, código e nome da microrregião de cada código
+def dados_municipios(codigos):
+    dados = carregar_municipios() or {"municipios": {}, "microrregioes": {}}
+    linhas = []
+    for codigo in codigos:
+        municipio = dados["municipios"].get(str(codigo), {})
+        microrregiao = municipio.get("microrregiao")
+        linhas.append((municipio.get("nome"), municipio.get("uf"), microrregiao,
+                       dados["microrregioes"].get(str(microrregiao), {}).get("nome")))
+    return linhas
+
+
+@functools.lru_cache(maxsize=64)
+def _malha_uf(uf, nivel):
+    caminho = _localizar(os.path.join(DIRETORIO_MALHA_MUNICIPIOS, nivel, f"{uf}.json"))
+    return {} if caminho is None else _ler_json(caminho)
+
+
+# FeatureCollection só com os municípios informados, no nível de detalhe pedido
+def geojson_municipios(codigos, nivel="medio"):
+    features = []
+    for codigo in dict.fromkeys(int(codigo) for codigo in codigos):
+        geometria = _malha_uf(CODIGOS_UF.get(codigo // 100_000), nivel).get(str(codigo))
+        if geometria is not None:
+            features.append({"type": "Feature", "id": str(codigo), "properties": {"codigo": str(codigo)}, "geometry": geometria})
+    if not features:
+        return None
+    return {"type": "FeatureCollection", "features": features}
+
+
+@functools.lru_cache(maxsize=1)
+def _microrregioes():
+    caminho = _localizar(ARQUIVO_MICRORREGIOES)
+    return {} if caminho is None else {feature["properties"]["codigo"]: feature for feature in _ler_json(caminho)["features"]}
+
+
+# FeatureCollection só com as microrregiões informadas
+def geojson_microrregioes(codigos):
+    por_codigo = _microrregioes()
+    features = [por_codigo[str(codigo)] for codigo in dict.fromkeys(codigos) if str(codigo) in por_codigo]
+    if not features:
+        return None
+    return {"type": "FeatureCollection", "features": features}
+
+
+# Níveis de detalhe da malha municipal presentes (o repositório distribui só o "medio")
+def niveis_disponiveis():
+    return [nivel for nivel in NIVEIS_DETALHE if _localizar(os.path.join(DIRETORIO_MALHA_MUNICIPIOS, nivel)) is not None]
+
+
+# Tabela, malha municipal (algum nível) e microrregiões presentes; sem um deles o mapa fica indisponível
+def municipios_disponiveis():
+    return carregar_municipios() is not None and _localizar(ARQUIVO_MICRORREGIOES) is not None and bool(niveis_disponiveis())
+
+
+# Nível do mapa municipal: ('microrregioes', None) ou ('municipios', nível de detalhe). No automático,
+# o mapa do Brasil com mais de um estado (visão afastada) agrega em microrregiões; com um estado,
+# mostra os municípios, no detalhe maior enquanto forem poucos e se a malha detalhada existir.
+def escolher_nivel(quantidade_municipios, quantidade_estados, agregacao=None):
+    if agregacao is None:
+        agregacao = "microrregioes" if quantidade_estados > 1 else "municipios"
+    if agregacao == "microrregioes":
+        return agregacao, None
+    niveis = niveis_disponiveis()
+    detalhado = "detalhado" in niveis and (quantidade_municipios <= LIMITE_MUNICIPIOS_DETALHADOS or "medio" not in niveis)
+    return agregacao, "detalhado" if detalhado else "medio"
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "preparar-municipios":
+        origem_malha = sys.argv[2] if len(sys.argv) > 2 else URL_MALHA_MUNICIPIOS
+        origem_tabela = sys.argv[3] if len(sys.argv) > 3 else URL_MUNICIPIOS
+        destino = sys.argv[4] if len(sys.argv) > 4 else DIRETORIO_DADOS
+        resumo = preparar_municipios(origem_malha, origem_tabela, destino)
+        print(f"{resumo['municipios']} municípios e {resumo['microrregioes']} microrregiões gravados em {destino}; "
+              f"vértices por nível: {resumo['vertices']}")
+        sys.exit(0)
+    if len(sys.argv) < 2 or sys.argv[1] != "preparar":
+        print("Uso: python -m rh.geografia preparar [arquivo-ou-url] [diretorio-destino]\n"
+              "     python -m rh.geografia preparar-municipios [malha] [tabela] [diretorio-destino]")
+        sys.exit(1)
+    origem = sys.argv[2] if len(sys.argv) > 2 else URL_ESTADOS
+    destino = sys.argv[3] if len(sys.argv) > 3 else DIRETORIO_DADOS
+    completo, reduzido = preparar_geometria(origem, destino)
+    print(f"Geometria gravada em {destino}: {completo} vértices -> {reduzido} na versão simplificada")
@@ -0,0 +1,207 @@
+import csv
+import io
+import itertools
+import os
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+from rh.base_preparada import compactar_tipos
+from rh.validacao import COLUNA_INCONSISTENCIAS, converter_datas, marcar_inconsistencias
+
+# Colunas lidas pelos indicadores; as demais são descartadas já na leitura (exceto a chave do colaborador)
+COLUNAS_INDICADORES = [
+    "Contratado", "Desligado", "Sexo", "Função", "Casado", "Tem filhos",
+    "Data de Nascimento", "Estado", "Cidade",
+]
+
+# Colunas que identificam o colaborador, na ordem de preferência (mantidas para deduplicação)
+CHAVES_CANDIDATAS = ["Matrícula", "Matricula", "ID", "CPF", "Nome"]
+COLUNAS_LEITURA = CHAVES_CANDIDATAS + COLUNAS_INDICADORES
+
+TAMANHO_BLOCO = 50_000
+LIMITE_MEMORIA_MB = int(os.environ.get("STOG_LIMITE_MEMORIA_MB", "2048"))
+FORMATOS_ACEITOS = ["xlsx", "csv", "parquet"]
+
+
+class LimiteMemoriaExcedido(MemoryError):
+    pass
+
+
+# Acumula os blocos já compactados e interrompe a leitura se passar do limite de memória. As datas são
+# convertidas aqui, bloco a bloco, guardando quais valores preenchidos não foram reconhecidos (rh.validacao)
+class _Acumulador:
+    def __init__(self, limite_memoria_mb, progresso, validar=False):
+        self.blocos = []
+        self.datas_invalidas = []
+        self.validar = validar
+        self.linhas = 0
+        self.bytes = 0
+        self.limite_bytes = None if limite_memoria_mb is None else limite_memoria_mb * 1024 * 1024
+        self.progresso = progresso
+
+    def adicionar(self, bloco, fracao=None, dayfirst=False):
+        self.datas_invalidas.append(converter_datas(bloco, dayfirst))
+        bloco = compactar_tipos(bloco)
+        self.blocos.append(bloco)
+        self.linhas += len(bloco)
+        self.bytes += int(bloco.memory_usage(deep=True).sum())
+        if self.limite_bytes is not None and self.bytes > self.limite_bytes:
+            raise LimiteMemoriaExcedido(
+                f"A base passou de {self.limite_bytes / 1024 ** 2:.0f} MB após {self.linhas} linhas"
+            )
+        if self.progresso is not None:
+            self.progresso(self.linhas, fracao)
+
+    # Com validação, a base sai com a coluna de inconsistências (todas as regras, numa passada)
+    def resultado(self, colunas):
+        df = _concatenar_blocos(self.blocos, colunas)
+        if not self.validar:
+            return df
+        datas = np.concatenate(self.datas_invalidas) if self.datas_invalidas else None
+        return marcar_inconsistencias(df, coluna_chave(df.columns), datas)
+
+
+# Junta os blocos unificando as categorias de cada coluna categórica (sem voltar a texto)
+def _concatenar_blocos(blocos, colunas):
+    if not blocos:
+        return pd.DataFrame(columns=colunas)
+    categoricas = [c for c in blocos[0].columns if isinstance(blocos[0][c].dtype, pd.CategoricalDtype)]
+    resultado = pd.concat([bloco.drop(columns=categoricas) for bloco in blocos], ignore_index=True)
+    for coluna in categoricas:
+        categorias = pd.Index(
+            list(dict.fromkeys(itertools.chain.from_iterable(b[coluna].cat.categories.tolist() for b in blocos))),
+            dtype=object,
+        )
+        codigos = np.concatenate([_recodificar(bloco[coluna], categorias) for bloco in blocos])
+        resultado[coluna] = pd.Categorical.from_codes(codigos, categories=categorias)
+    return resultado[list(blocos[0].columns)]
+
+
+# Códigos de uma coluna categórica traduzidos para as categorias unificadas (-1 = vazio)
+def _recodificar(serie, categorias):
+    codigos = serie.cat.codes.to_numpy()
+    if not len(serie.cat.categories):
+        return np.full(len(codigos), -1, dtype=codigos.dtype)
+    mapa = categorias.get_indexer(serie.cat.categories.astype(object))
+    return np.where(codigos >= 0, mapa[codigos], -1)
+
+
+def _colunas_presentes(cabecalho, colunas):
+    return [coluna for coluna in colunas if coluna in cabecalho]
+
+
+# Primeira coluna de identificação do colaborador presente na base (None se não houver)
+def coluna_chave(colunas):
+    return next((coluna for coluna in CHAVES_CANDIDATAS if coluna in colunas), None)
+
+
+# Excel em modo somente leitura do openpyxl: as linhas são lidas e convertidas em blocos
+def ler_excel_em_blocos(origem, colunas=COLUNAS_LEITURA, sheet_name="BD", tamanho_bloco=TAMANHO_BLOCO,
+                        limite_memoria_mb=LIMITE_MEMORIA_MB, progresso=None, validar=False):
+    from openpyxl import load_workbook
+
+    livro = load_workbook(origem, read_only=True, data_only=True)
+    try:
+        planilha = livro[sheet_name]
+        total = planilha.max_row
+        linhas = planilha.iter_rows(values_only=True)
+        cabecalho = [str(valor) if valor is not None else "" for valor in next(linhas, ())]
+        presentes = _colunas_presentes(cabecalho, colunas)
+        if not presentes:
+            raise ValueError(f"A aba '{sheet_name}' não tem nenhuma das colunas esperadas ({', '.join(colunas)})")
+        posicoes = [cabecalho.index(coluna) for coluna in presentes]
+        selecionar = itemgetter(*posicoes) if len(posicoes) > 1 else (lambda linha: (linha[posicoes[0]],))
+
+        acumulador = _Acumulador(limite_memoria_mb, progresso, validar)
+        while True:
+            bloco = [selecionar(linha) for linha in itertools.islice(linhas, tamanho_bloco) if any(v is not None for v in linha)]
+            if not bloco:
+                break
+            fracao = min(1.0, (acumulador.linhas + len(bloco)) / total) if total else None
+            acumulador.adicionar(pd.DataFrame.from_records(bloco, columns=presentes), fracao)
+    finally:
+        livro.close()
+    return acumulador.resultado(presentes)
+
+
+# CSV com separador detectado automaticamente; datas em ISO ou no formato brasileiro (dia primeiro)
+def ler_csv_em_blocos(origem, colunas=COLUNAS_LEITURA, tamanho_bloco=TAMANHO_BLOCO,
+                      limite_memoria_mb=LIMITE_MEMORIA_MB, progresso=None, encoding="utf-8-sig", validar=False):
+    amostra = origem.read(64 * 1024).decode(encoding, errors="ignore")
+    origem.seek(0)
+    try:
+        separador = csv.Sniffer().sniff(amostra, delimiters=";,\t|").delimiter
+    except csv.Error:
+        separador = ","
+    total_bytes = origem.getbuffer().nbytes if hasattr(origem, "getbuffer") else None
+
+    acumulador = _Acumulador(limite_memoria_mb, progresso, validar)
+    presentes = None
+    leitor = pd.read_csv(origem, sep=separador, encoding=encoding, chunksize=tamanho_bloco,
+                         usecols=lambda coluna: coluna in colunas)
+    for bloco in leitor:
+        presentes = presentes or _colunas_presentes(bloco.columns, colunas)
+        bloco = bloco[presentes].copy()
+        fracao = min(1.0, origem.tell() / total_bytes) if total_bytes else None
+        acumulador.adicionar(bloco, fracao, dayfirst=True)
+    return acumulador.resultado(presentes or [])
+
+
+# Parquet lido em lotes de linhas, só com as colunas usadas
+def ler_parquet_em_blocos(origem, colunas=COLUNAS_LEITURA, tamanho_bloco=TAMANHO_BLOCO,
+                          limite_memoria_mb=LIMITE_MEMORIA_MB, progresso=None, validar=False):
+    import pyarrow.parquet as pq
+
+    arquivo = pq.ParquetFile(origem)
+    presentes = _colunas_presentes(arquivo.schema_arrow.names, colunas)
+    total = arquivo.metadata.num_rows
+    acumulador = _Acumulador(limite_memoria_mb, progresso, validar)
+    for lote in arquivo.iter_batches(batch_size=tamanho_bloco, columns=presentes):
+        fracao = min(1.0, (acumulador.linhas + lote.num_rows) / total) if total else None
+        acumulador.adicionar(lote.to_pandas(), fracao)
+    return acumulador.resultado(presentes)
+
+
+# Resultado de uma consulta SQL (cursor DB-API já executado), lido com fetchmany; `total` é a quantidade
+# esperada de linhas, só para o progresso
+def ler_cursor_em_blocos(cursor, tamanho_bloco=TAMANHO_BLOCO, limite_memoria_mb=LIMITE_MEMORIA_MB, progresso=None,
+                         total=None, validar=False):
+    presentes = [descricao[0] for descricao in cursor.description]
+    acumulador = _Acumulador(limite_memoria_mb, progresso, validar)
+    while True:
+        bloco = cursor.fetchmany(tamanho_bloco)
+        if not bloco:
+            break
+        fracao = min(1.0, (acumulador.linhas + len(bloco)) / total) if total else None
+        acumulador.adicionar(pd.DataFrame.from_records(bloco, columns=presentes), fracao)
+    return acumulador.resultado(presentes)
+
+
+LEITORES = {
+    "xlsx": ler_excel_em_blocos,
+    "csv": ler_csv_em_blocos,
+    "parquet": ler_parquet_em_blocos,
+}
+
+
+def formato_arquivo(nome):
+    extensao = os.path.splitext(nome)[1].lower().lstrip(".")
+    if extensao not in LEITORES:
+        raise ValueError(f"Formato não suportado: '{extensao}'. Use um destes: {', '.join(FORMATOS_ACEITOS)}")
+    return extensao
+
+
+# Lê o conteúdo enviado (bytes) de acordo com a extensão do arquivo. Com `validar=True`, a base inclui a
+# coluna de inconsistências de rh.validacao
+def ler_base(conteudo, nome, **opcoes):
+    return LEITORES[formato_arquivo(nome)](io.BytesIO(conteudo), **opcoes)
+
+
+# Valida uma base lida sem validação (ex.: entrada do cache em disco anterior à validação); as datas já
+# convertidas não podem mais ser conferidas
+def validar_base(df):
+    if COLUNA_INCONSISTENCIAS in df.columns:
+        return df
+    return marcar_inconsistencias(df, coluna_chave(df.columns))
@@ -0,0 +1,120 @@
+import functools
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+# Medição opcional das etapas da página (tempo, linhas processadas e variação de memória).
+# Desligada, `medir` devolve um contexto vazio e as funções envolvidas rodam sem custo extra.
+
+MAX_MEDICOES = 5_000
+COLUNAS_MEDICOES = ["sessao", "execucao", "inicio", "etapa", "pai", "nivel", "segundos", "linhas", "memoria_delta_mb"]
+
+
+# Memória residente do processo em MB (psutil, se instalado; senão /proc no Linux; senão None)
+def memoria_processo_mb():
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    try:
+        with open("/proc/self/statm") as arquivo:
+            paginas = int(arquivo.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return paginas * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+
+# Linhas processadas: tamanho do primeiro DataFrame entre os argumentos
+def _linhas_argumentos(args, kwargs):
+    for valor in list(args) + list(kwargs.values()):
+        if isinstance(valor, pd.DataFrame):
+            return len(valor)
+    return None
+
+
+class Instrumentacao:
+    def __init__(self, ativa=False, max_medicoes=MAX_MEDICOES):
+        self.ativa = ativa
+        self.sessao = uuid.uuid4().hex[:8]
+        self.execucao = 0
+        self.max_medicoes = max_medicoes
+        self.medicoes = []
+        # Pilha de etapas por thread: os cálculos em segundo plano (rh.tarefas) medem em paralelo à página
+        self._local = threading.local()
+
+    @property
+    def _pilha(self):
+        if not hasattr(self._local, "pilha"):
+            self._local.pilha = []
+        return self._local.pilha
+
+    # Chamado no início de cada rerun da página
+    def nova_execucao(self):
+        self.execucao += 1
+        self._local.pilha = []
+
+    def medir(self, etapa, linhas=None):
+        return self._medir(etapa, linhas) if self.ativa else nullcontext()
+
+    @contextmanager
+    def _medir(self, etapa, linhas):
+        pai = self._pilha[-1] if self._pilha else None
+        self._pilha.append(etapa)
+        memoria_antes = memoria_processo_mb()
+        inicio = time.time()
+        contador = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - contador
+            memoria_depois = memoria_processo_mb()
+            self._pilha.pop()
+            self.medicoes.append({
+                "sessao": self.sessao,
+                "execucao": self.execucao,
+                "inicio": pd.Timestamp(inicio, unit="s").isoformat(),
+                "etapa": etapa,
+                "pai": pai,
+                "nivel": len(self._pilha),
+                "segundos": segundos,
+                "linhas": linhas,
+                "memoria_delta_mb": None if memoria_antes is None or memoria_depois is None else memoria_depois - memoria_antes,
+            })
+            del self.medicoes[:-self.max_medicoes]
+
+    # Versão da função que registra cada chamada (as linhas vêm do primeiro DataFrame recebido)
+    def envolver(self, funcao, etapa=None):
+        etapa = etapa or funcao.__name__
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with self.medir(etapa, _linhas_argumentos(args, kwargs)):
+                return funcao(*args, **kwargs)
+        return envolvida
+
+    # Uso como decorador: @instrumentacao.instrumentar()
+    def instrumentar(self, etapa=None):
+        return lambda funcao: self.envolver(funcao, etapa)
+
+    def tabela(self, execucao=None):
+        medicoes = self.medicoes if execucao is None else [m for m in self.medicoes if m["execucao"] == execucao]
+        return pd.DataFrame(medicoes, columns=COLUNAS_MEDICOES)
+
+    def limpar(self):
+        self.medicoes = []
+
+    def para_csv(self):
+        buffer = io.StringIO()
+        self.tabela().to_csv(buffer, index=False)
+        return buffer.getvalue().encode("utf-8")
+
+    def para_json(self):
+        return json.dumps(self.medicoes, ensure_ascii=False, indent=2).encode("utf-8")
@@ -0,0 +1,35 @@
+import os
+import sys
+
+# Logo da página inicial já no tamanho de exibição. O original (STOG.png, 1600 px) era aberto e
+# recodificado em PNG a cada execução; a versão reduzida fica versionada ao lado dele e a página
+# só entrega o arquivo. Gerar de novo depois de trocar o logo:
+#
+#   python -m rh.logo
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARQUIVO_ORIGINAL = os.path.join(RAIZ, "STOG.png")
+ARQUIVO_REDUZIDO = os.path.join(RAIZ, "STOG_logo.png")
+LARGURA_EXIBICAO = 300
+# Largura gravada: o dobro da exibida, para telas de alta densidade
+LARGURA_ARQUIVO = 2 * LARGURA_EXIBICAO
+
+
+# Caminho do logo a exibir: o reduzido sempre que existir (datas de modificação não valem depois de um
+# git clone; quem troca o original gera o reduzido de novo); sem ele, o original
+def caminho_logo(original=ARQUIVO_ORIGINAL, reduzido=ARQUIVO_REDUZIDO):
+    return reduzido if os.path.exists(reduzido) else original
+
+
+def preparar_logo(original=ARQUIVO_ORIGINAL, reduzido=ARQUIVO_REDUZIDO, largura=LARGURA_ARQUIVO):
+    from PIL import Image
+
+    with Image.open(original) as imagem:
+        altura = round(imagem.height * largura / imagem.width)
+        imagem.resize((largura, altura), Image.LANCZOS).save(reduzido, "PNG", optimize=True)
+    return reduzido
+
+
+if __name__ == "__main__":
+    caminho = preparar_logo(*sys.argv[1:3])
+    print(f"Logo gravado em {caminho} ({os.path.getsize(caminho) // 1024} KB)")
@@ -0,0 +1,225 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rh import motor
+from rh.base_preparada import BasePreparada
+from rh.cache_dados import carregar_com_cache, chave_para_processos, hash_conteudo, ler_cache
+from rh.cubo_turnover import CuboTurnover
+from rh.efetivo import IndiceEfetivoSegmentado
+from rh.ingestao import ler_base, validar_base
+from rh.validacao import sem_quarentena
+
+# Indicadores de todas as combinações de ano x Sexo x Função, sem o Streamlit, calculados em paralelo.
+#
+#   python -m rh.lote base.xlsx --saida resultados --processos 8
+#
+# A base é lida uma vez pelo processo principal e gravada no cache Arrow; cada processo de trabalho
+# abre o mesmo arquivo (memory-map), monta a base preparada e o cubo uma única vez e calcula os
+# recortes que receber. Gera indicadores.json (completo) e tabelas Parquet para consulta.
+
+COLUNAS_RECORTE = ["Sexo", "Função"]
+FORMATOS_SAIDA = ["json", "parquet"]
+
+# Estado de cada processo de trabalho (preenchido por _iniciar_processo)
+_contexto = {}
+
+
+def _iniciar_processo(chave, diretorio_cache, data_referencia):
+    # Mesma base da leitura, sem as linhas em quarentena (rh.validacao)
+    df = sem_quarentena(ler_cache(chave, diretorio_cache))
+    base = BasePreparada(df, data_referencia)
+    indice = IndiceEfetivoSegmentado(base.df, COLUNAS_RECORTE)
+    _contexto.update(
+        base=base.df,
+        data_referencia=base.data_referencia,
+        indice=indice,
+        cubo=CuboTurnover(indice),
+        # Linhas de cada valor, por coluna e pela combinação das duas (os recortes não varrem a base)
+        linhas_sexo=base.df.groupby("Sexo", sort=False, observed=True).indices,
+        linhas_funcao=base.df.groupby("Função", sort=False, observed=True).indices,
+        linhas_combinacao=base.df.groupby(COLUNAS_RECORTE, sort=False, observed=True).indices,
+    )
+
+
+def _linhas_recorte(sexo, funcao):
+    if sexo == "Todos" and funcao == "Todos":
+        return None
+    if funcao == "Todos":
+        return _contexto["linhas_sexo"].get(sexo, np.array([], dtype=np.intp))
+    if sexo == "Todos":
+        return _contexto["linhas_funcao"].get(funcao, np.array([], dtype=np.intp))
+    return _contexto["linhas_combinacao"].get((sexo, funcao), np.array([], dtype=np.intp))
+
+
+# Todos os indicadores de um recorte; a rotatividade é calculada para cada ano da base
+def calcular_recorte(sexo, funcao, anos):
+    filtros = {"Sexo": sexo, "Função": funcao}
+    linhas = _linhas_recorte(sexo, funcao)
+    df = _contexto["base"] if linhas is None else _contexto["base"].iloc[linhas]
+    cubo = _contexto["cubo"]
+    return {
+        "Sexo": sexo,
+        "Função": funcao,
+        "colaboradores": int(len(df)),
+        "metricas_principais": motor.metricas_principais(_contexto["indice"].filtrar(filtros), _contexto["data_referencia"]),
+        "demografia": motor.distribuicoes_demograficas(df),
+        "idade_tempo_casa": motor.indicadores_idade_tempo_casa(df),
+        "localizacao": motor.indicadores_geograficos(df),
+        "rotatividade": [motor.indicadores_turnover(cubo, ano, filtros) for ano in anos],
+    }
+
+
+def _calcular_recorte_tarefa(argumentos):
+    return calcular_recorte(*argumentos)
+
+
+# "Todos x Todos", cada valor com "Todos" na outra coluna e as combinações presentes na base
+def listar_recortes(cubo):
+    recortes = [("Todos", "Todos")]
+    recortes += [(sexo, "Todos") for sexo in cubo.valores("Sexo")]
+    recortes += [("Todos", funcao) for funcao in cubo.valores("Função")]
+    recortes += cubo.combinacoes()
+    return recortes
+
+
+def calcular_lote(df=None, data_referencia=None, processos=None, chave=None, diretorio_cache=None, progresso=None):
+    chave = chave_para_processos(df, chave, diretorio_cache)
+
+    # O processo principal monta o próprio contexto para listar recortes e anos (e calcular, se sequencial)
+    _iniciar_processo(chave, diretorio_cache, data_referencia)
+    cubo = _contexto["cubo"]
+    anos = cubo.anos()
+    tarefas = [(sexo, funcao, anos) for sexo, funcao in listar_recortes(cubo)]
+
+    processos = processos or os.cpu_count() or 1
+    if processos == 1:
+        resultados = []
+        for i, tarefa in enumerate(tarefas, start=1):
+            resultados.append(_calcular_recorte_tarefa(tarefa))
+            if progresso is not None:
+                progresso(i, len(tarefas))
+        return resultados
+
+    resultados = []
+    lote_tarefas = max(1, len(tarefas) // (processos * 4))
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo,
+                             initargs=(chave, diretorio_cache, data_referencia)) as executor:
+        for i, resultado in enumerate(executor.map(_calcular_recorte_tarefa, tarefas, chunksize=lote_tarefas), start=1):
+            resultados.append(resultado)
+            if progresso is not None:
+                progresso(i, len(tarefas))
+    return resultados
+
+
+# Converte DataFrames, tipos do numpy e NaN em estruturas aceitas pelo JSON
+def para_json(valor):
+    if isinstance(valor, pd.DataFrame):
+        return [para_json(registro) for registro in valor.to_dict(orient="records")]
+    if isinstance(valor, dict):
+        return {str(chave): para_json(item) for chave, item in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [para_json(item) for item in valor]
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    if valor is pd.NA or valor is pd.NaT:
+        return None
+    return valor
+
+
+# Tabelas planas para o Parquet: uma linha por recorte x ano, os meses e as distribuições em formato longo
+def tabelas_resultado(resultados):
+    indicadores, mensal, distribuicoes = [], [], []
+    for recorte in resultados:
+        chave = {"Sexo": recorte["Sexo"], "Função": recorte["Função"]}
+        idade = recorte["idade_tempo_casa"]
+        comum = {
+            **chave,
+            "colaboradores": recorte["colaboradores"],
+            "colaboradores_ativos": recorte["metricas_principais"]["colaboradores_ativos"],
+            "idade_media": idade["idade_media"],
+            "idade_max": idade["idade_max"],
+            "idade_min": idade["idade_min"],
+            "tempo_casa_medio": idade["tempo_casa_medio"],
+        }
+        for ano in recorte["rotatividade"]:
+            indicadores.append({**comum, **{c: v for c, v in ano.items() if c not in ("mensal", "por_genero")}})
+            mensal.append(ano["mensal"].assign(Ano=ano["ano"], **chave))
+
+        for indicador, valores in recorte["demografia"].items():
+            distribuicoes += [{**chave, "Indicador": indicador, "Categoria": c, "Valor": v} for c, v in valores.items()]
+        for indicador, tabela in (("faixa_etaria", idade["faixas_etarias"]), ("faixa_tempo_casa", idade["faixas_tempo_casa"])):
+            distribuicoes += [{**chave, "Indicador": indicador, "Categoria": str(c), "Valor": v} for c, v in tabela.to_numpy()]
+        for indicador, tabela in (("estado", recorte["localizacao"]["por_estado"]), ("cidade", recorte["localizacao"]["top_cidades"])):
+            distribuicoes += [{**chave, "Indicador": indicador, "Categoria": str(c), "Valor": v} for c, v in tabela.iloc[:, :2].to_numpy()]
+
+    colunas_mensal = ["Sexo", "Função", "Ano", "Mês", "Contratações", "Desligamentos"]
+    return {
+        "indicadores": pd.DataFrame(indicadores),
+        "rotatividade_mensal": pd.concat(mensal, ignore_index=True)[colunas_mensal] if mensal else pd.DataFrame(columns=colunas_mensal),
+        "distribuicoes": pd.DataFrame(distribuicoes, columns=["Sexo", "Função", "Indicador", "Categoria", "Valor"])
+            .astype({"Valor": "float64"}),
+    }
+
+
+def gravar_resultados(resultados, saida, formatos=FORMATOS_SAIDA):
+    os.makedirs(saida, exist_ok=True)
+    arquivos = []
+    if "json" in formatos:
+        caminho = os.path.join(saida, "indicadores.json")
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(para_json(resultados), arquivo, ensure_ascii=False)
+        arquivos.append(caminho)
+    if "parquet" in formatos:
+        for nome, tabela in tabelas_resultado(resultados).items():
+            caminho = os.path.join(saida, f"{nome}.parquet")
+            tabela.to_parquet(caminho, index=False)
+            arquivos.append(caminho)
+    return arquivos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m rh.lote", description="Calcula os indicadores de todos os recortes ano x Sexo x Função")
+    parser.add_argument("arquivo", help="base de colaboradores (xlsx, csv ou parquet)")
+    parser.add_argument("--saida", default="resultados", help="diretório de saída (padrão: resultados)")
+    parser.add_argument("--formatos", nargs="+", choices=FORMATOS_SAIDA, default=FORMATOS_SAIDA)
+    parser.add_argument("--processos", type=int, default=None, help="processos de trabalho (padrão: número de CPUs)")
+    parser.add_argument("--data-referencia", default=None, help="data de referência AAAA-MM-DD (padrão: hoje)")
+    argumentos = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    with open(argumentos.arquivo, "rb") as arquivo:
+        conteudo = arquivo.read()
+    chave = hash_conteudo(conteudo)
+    lida = validar_base(carregar_com_cache(conteudo, lambda c: ler_base(c, argumentos.arquivo, validar=True), chave=chave))
+    df = sem_quarentena(lida)
+    print(f"Base lida: {len(df)} linhas, {len(lida) - len(df)} em quarentena ({time.perf_counter() - inicio:.1f}s)")
+
+    def progresso(feitos, total):
+        if feitos == total or feitos % max(1, total // 20) == 0:
+            print(f"\r{feitos}/{total} recortes", end="", flush=True)
+
+    # A base já sem quarentena vai para o cache sob o hash do próprio conteúdo (a entrada da leitura pode
+    # ser de antes da validação)
+    resultados = calcular_lote(df, data_referencia=argumentos.data_referencia, processos=argumentos.processos,
+                               progresso=progresso)
+    print()
+    for caminho in gravar_resultados(resultados, argumentos.saida, argumentos.formatos):
+        print(f"Gravado: {caminho}")
+    print(f"Concluído em {time.perf_counter() - inicio:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+
+from rh.base_preparada import BasePreparada
+from rh.geografia import SIGLAS_ESTADOS, codigos_municipios, dados_municipios
+
+# Cálculo dos indicadores sem dependência do Streamlit: a página só desenha o que sai daqui,
+# e o processamento em lote (rh.lote) usa as mesmas funções.
+
+
+# Contagem por valor de uma coluna; com o histórico acumulado usa as contagens mantidas pelo armazém
+def contagem_valores(df, coluna, contagens=None, normalize=False):
+    if contagens is not None and coluna in contagens:
+        serie = contagens[coluna]
+        return serie / serie.sum() if normalize else serie
+    return df[coluna].value_counts(normalize=normalize)
+
+
+# Colaboradores ativos hoje, turnover e retenção do ano corrente. `efetivo` é um índice de efetivo
+# da base toda (IndiceEfetivoSegmentado.total) ou de um recorte (IndiceEfetivoSegmentado.filtrar)
+def metricas_principais(efetivo, hoje=None):
+    hoje = pd.Timestamp.now() if hoje is None else pd.Timestamp(hoje)
+    ano_atual = hoje.year
+
+    # Colaboradores ativos hoje, no início e no final do ano (uma única consulta)
+    colaboradores_ativos, colaboradores_inicio_ano, colaboradores_fim_ano = efetivo.ativos(
+        [hoje, pd.Timestamp(f'{ano_atual}-01-01'), pd.Timestamp(f'{ano_atual}-12-31')]
+    )
+
+    # Entradas e saídas no ano atual
+    entradas_ano = efetivo.entradas_no_ano(ano_atual)
+    saidas_ano = efetivo.saidas_no_ano(ano_atual)
+
+    # Média de colaboradores no período
+    media_colaboradores = (colaboradores_inicio_ano + colaboradores_fim_ano) / 2
+
+    # Cálculo do turnover e taxa de retenção
+    turnover_anual = (saidas_ano / media_colaboradores * 100) if media_colaboradores > 0 else 0
+    taxa_retencao = ((media_colaboradores - saidas_ano) / media_colaboradores * 100) if media_colaboradores > 0 else 100
+
+    return {
+        "colaboradores_ativos": int(colaboradores_ativos),
+        "entradas_ano": entradas_ano,
+        "saidas_ano": saidas_ano,
+        "media_colaboradores": media_colaboradores,
+        "turnover_anual": turnover_anual,
+        "taxa_retencao": taxa_retencao,
+    }
+
+
+# Indicadores da aba Rotatividade para um ano e um recorte de Sexo/Função (fatias do cubo)
+def indicadores_turnover(cubo, ano, filtros=None):
+    filtros = filtros or {}
+    resumo = cubo.resumo_ano(ano, filtros)
+    total_entradas = resumo['entradas']
+    total_saidas = resumo['saidas']
+
+    # Média de colaboradores no ano
+    total_colaboradores_medio = (resumo['ativos_inicio'] + resumo['ativos_fim']) / 2
+
+    # Cálculo do turnover correto
+    turnover_anual = ((total_entradas + total_saidas) / (2 * total_colaboradores_medio)) * 100 if total_colaboradores_medio > 0 else 0
+
+    # Entradas e saídas mensais no ano (todos os meses, inclusive os sem movimentação)
+    mensal = cubo.fatiar(filtros, ano=ano)
+    mensal = mensal.reset_index(drop=True).assign(Mês=mensal.index.strftime("%m/%y"))[['Mês', 'Contratações', 'Desligamentos']]
+
+    resultado = {
+        "ano": ano,
+        "entradas": total_entradas,
+        "saidas": total_saidas,
+        "ativos_inicio": resumo['ativos_inicio'],
+        "ativos_fim": resumo['ativos_fim'],
+        "media_colaboradores": total_colaboradores_medio,
+        "turnover_anual": turnover_anual,
+        "mensal": mensal,
+    }
+
+    # Sem filtro de gênero, inclui a comparação entre Masculino e Feminino
+    if filtros.get('Sexo') in (None, "Todos"):
+        resultado["por_genero"] = {}
+        for genero in ["Masculino", "Feminino"]:
+            resumo_genero = cubo.resumo_ano(ano, {**filtros, 'Sexo': genero})
+            resultado["por_genero"][genero] = {"Entradas": resumo_genero['entradas'], "Saídas": resumo_genero['saidas']}
+    return resultado
+
+
+# Turnover, retenção e variação líquida em janelas móveis de `janela` meses, para todo o histórico.
+#
+# Cada ponto resume os 12 meses terminados naquele mês, com as mesmas fórmulas da aba Rotatividade
+# (em dezembro coincide com o ano fechado). As somas móveis saem de somas acumuladas sobre as séries
+# mensais do cubo, para todos os segmentos de uma vez; `quebra` ("Sexo" ou "Função") detalha o recorte.
+def tendencia_movel(cubo, quebra=None, filtros=None, janela=12):
+    filtros = filtros or {}
+    if quebra is None:
+        segmentos, dados = ["Todos"], cubo.fatiar(filtros).to_numpy()[np.newaxis]
+    else:
+        segmentos, dados = cubo.fatias_por(quebra, filtros)
+
+    colunas = ['Mês', 'Segmento', 'Contratações 12m', 'Desligamentos 12m', 'Média de colaboradores',
+               'Turnover 12m', 'Retenção 12m', 'Variação líquida 12m']
+    meses = len(cubo.periodos)
+    if meses < janela or not len(segmentos):
+        return pd.DataFrame(columns=colunas)
+
+    # Somas móveis: acumulado[t] - acumulado[t - janela]
+    movimentacao = dados[:, :, :2]
+    acumulado = np.concatenate([np.zeros_like(movimentacao[:, :1]), movimentacao.cumsum(axis=1)], axis=1)
+    somas = acumulado[:, janela:] - acumulado[:, :-janela]
+    entradas, saidas = somas[..., 0], somas[..., 1]
+
+    ativos_inicio = dados[:, :meses - janela + 1, 2]
+    ativos_fim = dados[:, janela - 1:, 3]
+    media = (ativos_inicio + ativos_fim) / 2
+    com_media = media > 0
+    divisor = np.where(com_media, media, 1)
+    turnover = np.where(com_media, (entradas + saidas) / (2 * divisor) * 100, 0)
+    retencao = np.where(com_media, (media - saidas) / divisor * 100, 100)
+
+    return pd.DataFrame({
+        'Mês': np.tile(cubo.periodos[janela - 1:].to_timestamp(), len(segmentos)),
+        'Segmento': np.repeat(np.array(segmentos, dtype=object), meses - janela + 1),
+        'Contratações 12m': entradas.ravel(),
+        'Desligamentos 12m': saidas.ravel(),
+        'Média de colaboradores': media.ravel(),
+        'Turnover 12m': turnover.ravel(),
+        'Retenção 12m': retencao.ravel(),
+        'Variação líquida 12m': (ativos_fim - ativos_inicio).ravel(),
+    }, columns=colunas)
+
+
+# Percentuais de gênero, estado civil e dependentes (aba Demografia)
+def distribuicoes_demograficas(df, contagens=None):
+    dist_genero = contagem_valores(df, 'Sexo', contagens, normalize=True) * 100
+    dist_estado_civil = contagem_valores(df, 'Casado', contagens, normalize=True) * 100
+    tem_filhos = contagem_valores(df, 'Tem filhos', contagens, normalize=True) * 100
+    return {
+        "genero": {'Masculino': dist_genero.get('Masculino', 0), 'Feminino': dist_genero.get('Feminino', 0)},
+        "estado_civil": {'Casado': dist_estado_civil.get('Sim', 0), 'Solteiro': dist_estado_civil.get('Não', 0)},
+        "filhos": {'Com Filhos': tem_filhos.get('Sim', 0), 'Sem Filhos': tem_filhos.get('Não', 0)},
+    }
+
+
+# Idade e tempo de casa (aba Idade/tempo de casa)
+def indicadores_idade_tempo_casa(df):
+    # Idade atual e tempo de casa já vêm calculados na base preparada
+    if 'Idade Atual' not in df.columns:
+        df = BasePreparada(df).df
+
+    dist_faixas_etarias = df['Faixa Etária'].value_counts(normalize=True).reset_index()
+    dist_faixas_etarias.columns = ['Faixa Etária', 'Percentual']
+    dist_faixas_etarias['Percentual'] *= 100  # Corrigir percentual
+
+    dist_faixas_tempo_casa = df['Faixa de Tempo de Casa'].value_counts(normalize=True).reset_index()
+    dist_faixas_tempo_casa.columns = ['Faixa de Tempo de Casa', 'Percentual']
+    dist_faixas_tempo_casa['Percentual'] *= 100  # Corrigir percentual
+
+    return {
+        "idade_media": df['Idade Atual'].mean(),
+        "idade_max": df['Idade Atual'].max(),
+        "idade_min": df['Idade Atual'].min(),
+        "tempo_casa_medio": df['Tempo de Casa (anos)'].mean(),
+        "faixas_etarias": dist_faixas_etarias,
+        "faixas_tempo_casa": dist_faixas_tempo_casa,
+    }
+
+
+# Distribuição por estado (com a sigla do IBGE) e principais cidades (aba Localização)
+def indicadores_geograficos(df, contagens=None, top_cidades=5):
+    dist_estado = contagem_valores(df, 'Estado', contagens).reset_index()
+    dist_estado.columns = ['Estado', 'Quantidade']
+    dist_estado['Sigla'] = dist_estado['Estado'].astype(object).map(SIGLAS_ESTADOS)
+
+    dist_cidade = contagem_valores(df, 'Cidade', contagens).reset_index()
+    dist_cidade.columns = ['Cidade', 'Quantidade']
+    return {"por_estado": dist_estado, "top_cidades": dist_cidade.head(top_cidades)}
+
+
+# Colaboradores por município (código IBGE) e por microrregião, com os pares Cidade/Estado que não
+# foram encontrados na tabela do IBGE. A contagem é feita por pares distintos e só eles passam pela
+# comparação de nomes. `estado` restringe a um estado (None ou "Todos" = Brasil). `pares` são as
+# contagens por Estado/Cidade já prontas (ex.: GROUP BY no banco, rh.fonte_sql), no lugar da base.
+def indicadores_municipios(df, estado=None, pares=None):
+    if pares is None:
+        contagem = df.groupby(['Estado', 'Cidade'], observed=True, sort=False).size().reset_index(name='Quantidade')
+    else:
+        contagem = pares[['Estado', 'Cidade', 'Quantidade']]
+    if estado not in (None, "Todos"):
+        contagem = contagem[contagem['Estado'] == estado]
+    contagem = contagem[contagem['Quantidade'] > 0].astype({'Estado': object, 'Cidade': object}).reset_index(drop=True)
+
+    codigos = codigos_municipios(contagem['Cidade'], contagem['Estado'])
+    contagem['Código'] = codigos
+    encontrados = contagem[codigos >= 0]
+    # Grafias diferentes do mesmo município (ex.: "Embu" e "Embu das Artes") somam no mesmo código
+    por_municipio = encontrados.groupby('Código', sort=False).agg(
+        Quantidade=('Quantidade', 'sum'), Estado=('Estado', 'first')
+    ).reset_index()
+    dados = dados_municipios(por_municipio['Código'])
+    por_municipio['Município'] = [linha[0] for linha in dados]
+    por_municipio['UF'] = [linha[1] for linha in dados]
+    por_municipio['Microrregião'] = [linha[2] for linha in dados]
+    por_municipio['Nome da microrregião'] = [linha[3] for linha in dados]
+    por_municipio = por_municipio.sort_values('Quantidade', ascending=False, ignore_index=True)
+
+    por_microrregiao = por_municipio.groupby(['Microrregião', 'Nome da microrregião', 'UF'], sort=False).agg(
+        Quantidade=('Quantidade', 'sum'), Municípios=('Código', 'size')
+    ).reset_index().sort_values('Quantidade', ascending=False, ignore_index=True)
+
+    return {
+        "por_municipio": por_municipio,
+        "por_microrregiao": por_microrregiao,
+        "nao_encontrados": contagem.loc[codigos < 0, ['Estado', 'Cidade', 'Quantidade']].reset_index(drop=True),
+    }
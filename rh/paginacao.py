@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Consulta paginada sobre a base em memória: projeção de colunas, ordenação e filtro de texto são
+# resolvidos aqui e só a janela da página vai para o navegador.
+#
+# A ordenação de cada coluna (argsort estável) e a máscara do último filtro ficam guardadas, então
+# trocar de página ou voltar a uma ordenação já usada não reordena a base de novo.
+
+TAMANHOS_PAGINA = [50, 100, 500, 1000]
+# Ordenações guardadas por consulta (cada uma ocupa 8 bytes por linha)
+MAX_ORDENS = 4
+
+
+# Colunas em que o filtro de texto procura (texto e categóricas; datas e números ficam de fora)
+def colunas_texto(df):
+    return [
+        coluna for coluna in df.columns
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype)
+        or pd.api.types.is_object_dtype(df[coluna]) or pd.api.types.is_string_dtype(df[coluna])
+    ]
+
+
+# Linhas em que o texto aparece (sem diferenciar maiúsculas); nas categóricas a busca é feita só nas
+# categorias e traduzida para os códigos
+def _contem(serie, texto):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        categorias = pd.Series(serie.cat.categories.astype(str))
+        encontradas = np.flatnonzero(categorias.str.contains(texto, case=False, regex=False).to_numpy())
+        return np.isin(serie.cat.codes.to_numpy(), encontradas)
+    return serie.astype(str).str.contains(texto, case=False, regex=False, na=False).to_numpy()
+
+
+class ConsultaPaginada:
+    def __init__(self, df):
+        self.df = df
+        self._ordens = OrderedDict()
+        self._filtro = (None, None)
+        # A mesma consulta pode ser usada por várias sessões ao mesmo tempo
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    # Posições da base ordenadas pela coluna (vazios por último, nos dois sentidos)
+    def _ordem(self, coluna, crescente):
+        with self._trava:
+            return self._ordem_sem_trava(coluna, crescente)
+
+    def _ordem_sem_trava(self, coluna, crescente):
+        chave = (coluna, crescente)
+        if chave not in self._ordens:
+            serie = self.df[coluna]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                # Ordem alfabética das categorias (ou a própria ordem, nas faixas) aplicada aos códigos,
+                # sem converter a coluna em texto
+                postos = np.arange(len(serie.cat.categories))
+                if not serie.cat.ordered:
+                    postos[np.argsort(serie.cat.categories.astype(str), kind="stable")] = np.arange(len(postos))
+                codigos = serie.cat.codes.to_numpy()
+                valores = pd.Series(np.where(codigos >= 0, postos[np.maximum(codigos, 0)], np.nan))
+            else:
+                valores = serie.reset_index(drop=True)
+            ordem = valores.sort_values(ascending=crescente, kind="stable", na_position="last").index.to_numpy()
+            self._ordens[chave] = ordem
+            while len(self._ordens) > MAX_ORDENS:
+                self._ordens.popitem(last=False)
+        self._ordens.move_to_end(chave)
+        return self._ordens[chave]
+
+    # Máscara do filtro de texto (a última é reaproveitada entre páginas)
+    def _mascara(self, texto, colunas):
+        texto = (texto or "").strip()
+        if not texto:
+            return None
+        chave = (texto.lower(), tuple(colunas))
+        # Uma leitura só do par (chave, máscara): outra sessão pode trocá-lo no meio
+        filtro = self._filtro
+        if filtro[0] == chave:
+            return filtro[1]
+        mascara = np.zeros(len(self.df), dtype=bool)
+        for coluna in colunas:
+            mascara |= _contem(self.df[coluna], texto)
+        self._filtro = (chave, mascara)
+        return mascara
+
+    # Linhas que passam no filtro de texto
+    def total(self, filtro_texto="", colunas_filtro=None):
+        colunas_filtro = colunas_texto(self.df) if colunas_filtro is None else colunas_filtro
+        mascara = self._mascara(filtro_texto, colunas_filtro)
+        return len(self.df) if mascara is None else int(mascara.sum())
+
+    # Posições (na base) das linhas filtradas, na ordem pedida
+    def posicoes(self, ordenar_por=None, crescente=True, filtro_texto="", colunas_filtro=None):
+        colunas_filtro = colunas_texto(self.df) if colunas_filtro is None else colunas_filtro
+        mascara = self._mascara(filtro_texto, colunas_filtro)
+        if ordenar_por is None:
+            return np.arange(len(self.df)) if mascara is None else np.flatnonzero(mascara)
+        ordem = self._ordem(ordenar_por, crescente)
+        return ordem if mascara is None else ordem[mascara[ordem]]
+
+    # (janela da página com as colunas pedidas, total de linhas após o filtro)
+    def pagina(self, numero=0, tamanho=100, colunas=None, ordenar_por=None, crescente=True,
+               filtro_texto="", colunas_filtro=None):
+        colunas = list(self.df.columns) if colunas is None else list(colunas)
+        if ordenar_por is None and not (filtro_texto or "").strip():
+            # Sem ordenação nem filtro a janela é só um fatiamento
+            total = len(self.df)
+            janela = self.df.iloc[numero * tamanho:(numero + 1) * tamanho]
+            return janela[colunas], total
+        posicoes = self.posicoes(ordenar_por, crescente, filtro_texto, colunas_filtro)
+        janela = posicoes[numero * tamanho:(numero + 1) * tamanho]
+        return self.df.iloc[janela][colunas], len(posicoes)
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rh.cache_dados import DIRETORIO_CACHE, limpar_cache
+from rh.cubo_turnover import movimentacao_mensal
+from rh.efetivo import IndiceEfetivoSegmentado
+
+# Previsão mensal de contratações, desligamentos e headcount por Função e por Estado.
+#
+# Cada série (valor da dimensão x métrica) é ajustada com Holt-Winters (statsmodels); sem o
+# statsmodels instalado, usa a sazonalidade ingênua (mesmo mês do ano anterior). Os ajustes ficam
+# em cache pelo hash da série (valores, início, horizonte e versão do modelo), em memória e em
+# disco, então uma nova base só reajusta as séries que mudaram. As pendentes são ajustadas em
+# paralelo em um pool de processos.
+
+DIMENSOES = ["Função", "Estado"]
+# Métricas previstas e a coluna correspondente de movimentacao_mensal (Ativos fim = headcount)
+SERIES = {"Contratações": 0, "Desligamentos": 1, "Headcount": 3}
+HORIZONTE_MESES = 12
+MESES_SAZONALIDADE = 12
+# Histórico mínimo para o Holt-Winters; abaixo de dois ciclos completos fica sem componente sazonal
+MINIMO_MESES_MODELO = MESES_SAZONALIDADE
+MINIMO_MESES_SAZONAL = 2 * MESES_SAZONALIDADE
+# Com poucas séries pendentes, o custo de subir os processos não compensa
+MINIMO_SERIES_PARALELO = 8
+# Entra no hash: mudar o modelo invalida os ajustes guardados
+VERSAO_MODELO = "holt-winters-1"
+DIRETORIO_MODELOS = os.path.join(DIRETORIO_CACHE, "modelos")
+# Limite do diretório dos ajustes; a idade máxima é a do cache de dados (STOG_CACHE_MAX_DIAS)
+LIMITE_MB_MODELOS = int(os.environ.get("STOG_MODELOS_MAX_MB", "256"))
+# Ajustes mantidos em memória (os mais recentes); os demais são lidos de novo do disco
+MAX_MODELOS_MEMORIA = 2048
+
+
+# Último mês completo até a data de referência
+def ultimo_mes_completo(data_referencia):
+    return (pd.Timestamp(data_referencia) + pd.Timedelta(days=1)).to_period("M") - 1
+
+
+# Séries mensais (Contratações, Desligamentos, Headcount) de cada valor da dimensão, do primeiro
+# mês com movimentação até o último mês completo antes da data de referência
+def series_mensais(df, dimensao, data_referencia):
+    indice = IndiceEfetivoSegmentado(df, (dimensao,))
+    anos = indice.total.anos()
+    fim = ultimo_mes_completo(data_referencia)
+    if not anos or fim.year < min(anos):
+        return {}
+    periodos = pd.period_range(f"{min(anos)}-01", fim, freq="M")
+    series = {}
+    for (valor,), segmento in indice.segmentos.items():
+        if pd.isna(valor):
+            continue
+        valores = movimentacao_mensal(segmento, periodos)
+        series[str(valor)] = pd.DataFrame(
+            {nome: valores[:, coluna] for nome, coluna in SERIES.items()}, index=periodos
+        )
+    return series
+
+
+def hash_serie(serie, horizonte=HORIZONTE_MESES):
+    resumo = hashlib.sha256()
+    resumo.update(f"{VERSAO_MODELO}|{horizonte}|{serie.index[0]}|{len(serie)}|".encode("utf-8"))
+    resumo.update(np.ascontiguousarray(serie.to_numpy(dtype=np.float64)).tobytes())
+    return resumo.hexdigest()
+
+
+# Previsão do mesmo mês do ano anterior (ou da média recente, com menos de um ano de histórico)
+def _sazonal_ingenua(valores, horizonte):
+    if len(valores) >= MESES_SAZONALIDADE:
+        ultimo_ciclo = valores[-MESES_SAZONALIDADE:]
+        previsao = np.resize(ultimo_ciclo, horizonte)
+        erros = valores[MESES_SAZONALIDADE:] - valores[:-MESES_SAZONALIDADE]
+    else:
+        previsao = np.full(horizonte, valores.mean())
+        erros = valores - valores.mean()
+    return previsao, float(np.std(erros)) if len(erros) else 0.0, {}
+
+
+def _holt_winters(valores, horizonte):
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    sazonal = len(valores) >= MINIMO_MESES_SAZONAL
+    modelo = ExponentialSmoothing(
+        valores,
+        trend="add",
+        damped_trend=True,
+        seasonal="add" if sazonal else None,
+        seasonal_periods=MESES_SAZONALIDADE if sazonal else None,
+        initialization_method="estimated",
+    ).fit()
+    parametros = {nome: float(valor) for nome, valor in modelo.params.items() if np.ndim(valor) == 0 and np.isfinite(valor)}
+    return np.asarray(modelo.forecast(horizonte)), float(np.std(modelo.resid)), parametros
+
+
+# Ajusta uma série e devolve a previsão com intervalo aproximado de 95% (cresce com o horizonte).
+# Resultado só com listas e números, para o cache em JSON e o envio entre processos.
+def ajustar_serie(valores, horizonte=HORIZONTE_MESES):
+    valores = np.asarray(valores, dtype=np.float64)
+    try:
+        import statsmodels  # noqa: F401
+    except ImportError:
+        statsmodels = None
+
+    modelo = "sazonal ingênuo"
+    if statsmodels is not None and len(valores) >= MINIMO_MESES_MODELO and valores.any():
+        try:
+            previsao, desvio, parametros = _holt_winters(valores, horizonte)
+            modelo = "Holt-Winters"
+        except (ValueError, np.linalg.LinAlgError):
+            previsao, desvio, parametros = _sazonal_ingenua(valores, horizonte)
+    else:
+        previsao, desvio, parametros = _sazonal_ingenua(valores, horizonte)
+
+    margem = 1.96 * desvio * np.sqrt(np.arange(1, horizonte + 1))
+    # Contagens não ficam negativas
+    return {
+        "modelo": modelo,
+        "parametros": parametros,
+        "previsao": np.maximum(previsao, 0).tolist(),
+        "inferior": np.maximum(previsao - margem, 0).tolist(),
+        "superior": np.maximum(previsao + margem, 0).tolist(),
+    }
+
+
+def _ajustar_tarefa(argumentos):
+    chave, valores, horizonte = argumentos
+    return chave, ajustar_serie(valores, horizonte)
+
+
+# Ajustes por hash da série: dicionário em memória e um JSON por série em disco (compartilhado
+# entre sessões, processos e reinícios), com a mesma evicção por idade e tamanho do cache de dados
+class CacheModelos:
+    def __init__(self, diretorio=None):
+        self.diretorio = diretorio or DIRETORIO_MODELOS
+        self._memoria = OrderedDict()
+        self._trava = threading.Lock()
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f"{chave}.json")
+
+    def obter(self, chave):
+        with self._trava:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, encoding="utf-8") as arquivo:
+                ajuste = json.load(arquivo)
+            # Horário de acesso para a evicção (LRU)
+            os.utime(caminho, None)
+        except (OSError, ValueError):
+            return None
+        self._lembrar(chave, ajuste)
+        return ajuste
+
+    def _lembrar(self, chave, ajuste):
+        with self._trava:
+            self._memoria[chave] = ajuste
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > MAX_MODELOS_MEMORIA:
+                self._memoria.popitem(last=False)
+
+    def guardar(self, chave, ajuste):
+        self._lembrar(chave, ajuste)
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self._caminho(chave)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(ajuste, arquivo)
+        os.replace(temporario, caminho)
+
+    def limpar(self, limite_mb=None, idade_maxima_dias=None):
+        limite_mb = LIMITE_MB_MODELOS if limite_mb is None else limite_mb
+        removidos = limpar_cache(self.diretorio, limite_mb, idade_maxima_dias, extensao=".json")
+        # Ajustes removidos do disco também saem da memória
+        with self._trava:
+            for caminho in removidos:
+                self._memoria.pop(os.path.basename(caminho)[:-len(".json")], None)
+        return removidos
+
+
+# Previsões de várias séries ({chave: pd.Series}); só as ausentes do cache são ajustadas, em paralelo
+# quando são muitas. Devolve ({chave: ajuste}, quantidade de séries ajustadas agora)
+def prever_series(series, horizonte=HORIZONTE_MESES, processos=None, cache=None, progresso=None):
+    cache = cache if cache is not None else CacheModelos()
+    hashes = {chave: hash_serie(serie, horizonte) for chave, serie in series.items()}
+    resultados, pendentes = {}, []
+    for chave, serie in series.items():
+        ajuste = cache.obter(hashes[chave])
+        if ajuste is None:
+            pendentes.append((chave, serie.to_numpy(dtype=np.float64), horizonte))
+        else:
+            resultados[chave] = ajuste
+
+    processos = min(processos or os.cpu_count() or 1, len(pendentes))
+    if processos <= 1 or len(pendentes) < MINIMO_SERIES_PARALELO:
+        ajustados = map(_ajustar_tarefa, pendentes)
+        executor = None
+    else:
+        # Processos novos (spawn), não cópias do servidor: fork de um processo com threads pode travar
+        executor = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"))
+        ajustados = executor.map(_ajustar_tarefa, pendentes, chunksize=max(1, len(pendentes) // (processos * 4)))
+    try:
+        for i, (chave, ajuste) in enumerate(ajustados, start=1):
+            cache.guardar(hashes[chave], ajuste)
+            resultados[chave] = ajuste
+            if progresso is not None:
+                progresso(i, len(pendentes))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if pendentes:
+        cache.limpar()
+    return resultados, len(pendentes)
+
+
+# Histórico e previsão de todas as séries de uma dimensão, em formato longo:
+# Valor, Série, Mês, Tipo (Histórico/Previsão), Quantidade, Inferior, Superior
+def prever_dimensao(df, dimensao, data_referencia, horizonte=HORIZONTE_MESES, processos=None, cache=None, progresso=None):
+    colunas = ["Valor", "Série", "Mês", "Tipo", "Quantidade", "Inferior", "Superior"]
+    mensais = series_mensais(df, dimensao, data_referencia)
+    series = {(valor, nome): tabela[nome] for valor, tabela in mensais.items() for nome in SERIES}
+    ajustes, ajustadas = prever_series(series, horizonte, processos, cache, progresso)
+
+    partes = []
+    for (valor, nome), serie in series.items():
+        ajuste = ajustes[(valor, nome)]
+        futuro = pd.period_range(serie.index[-1] + 1, periods=horizonte, freq="M")
+        partes.append(pd.DataFrame({
+            "Valor": valor, "Série": nome, "Mês": serie.index.to_timestamp(), "Tipo": "Histórico",
+            "Quantidade": serie.to_numpy(dtype=np.float64), "Inferior": np.nan, "Superior": np.nan,
+        }))
+        partes.append(pd.DataFrame({
+            "Valor": valor, "Série": nome, "Mês": futuro.to_timestamp(), "Tipo": "Previsão",
+            "Quantidade": ajuste["previsao"], "Inferior": ajuste["inferior"], "Superior": ajuste["superior"],
+        }))
+    tabela = pd.concat(partes, ignore_index=True)[colunas] if partes else pd.DataFrame(columns=colunas)
+    modelos = sorted({ajuste["modelo"] for ajuste in ajustes.values()})
+    return tabela, {"series": len(series), "ajustadas": ajustadas, "modelos": modelos}
+
+
+# Totais previstos por valor da dimensão: contratações e desligamentos no horizonte e headcount final
+def resumo_previsoes(tabela):
+    previsao = tabela[tabela["Tipo"] == "Previsão"]
+    if previsao.empty:
+        return pd.DataFrame(columns=["Contratações previstas", "Desligamentos previstos", "Headcount final"])
+    fluxos = previsao[previsao["Série"] != "Headcount"].pivot_table(
+        index="Valor", columns="Série", values="Quantidade", aggfunc="sum", observed=True
+    )
+    headcount = previsao[previsao["Série"] == "Headcount"].groupby("Valor")["Quantidade"].last()
+    resumo = pd.DataFrame({
+        "Contratações previstas": fluxos.get("Contratações"),
+        "Desligamentos previstos": fluxos.get("Desligamentos"),
+        "Headcount final": headcount,
+    })
+    return resumo.round(0).sort_values("Headcount final", ascending=False)
@@ -0,0 +1,194 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Registro das bases em memória, compartilhado por todas as sessões do processo.
+#
+# Cada conteúdo (hash do arquivo) é guardado uma única vez; as sessões recebem visões somente
+# leitura (cópia rasa com os arrays marcados como não graváveis). O registro sabe quais sessões
+# usam cada base — uma por papel, ex.: 'base' e 'folha' — e, acima do limite de memória, descarta
+# as menos usadas recentemente entre as que não estão em uso. Bases em uso nunca são descartadas,
+# mesmo acima do limite. Há um registro por processo (registro_processo), comum a todas as páginas.
+#
+# Os objetos calculados a partir de uma base (base preparada, índice, cubo...) ficam na própria entrada
+# (derivado): entram na conta de memória e são descartados junto com ela.
+
+LIMITE_MB_BASES = int(os.environ.get("STOG_REGISTRO_BASES_MB", "2048"))
+# Variações (parâmetros diferentes, ex.: datas de referência escolhidas por sessões distintas) guardadas
+# por nome de derivado; acima disso sai a usada há mais tempo
+MAX_DERIVADOS_POR_NOME = 3
+
+
+def memoria_base(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+# Marca os arrays numpy das colunas como somente leitura (colunas do Arrow já são imutáveis)
+def _proteger(df):
+    for coluna in df.columns:
+        valores = df[coluna].array
+        array = getattr(valores, "_ndarray", None)
+        if array is None and isinstance(valores, np.ndarray):
+            array = valores
+        if isinstance(array, np.ndarray):
+            array.flags.writeable = False
+    return df
+
+
+class _Entrada:
+    __slots__ = ("df", "bytes", "sessoes", "derivados", "calculando")
+
+    def __init__(self, df):
+        self.df = _proteger(df)
+        self.bytes = memoria_base(df)
+        self.sessoes = set()
+        # (nome, parâmetros) -> (objeto, bytes), do menos ao mais usado recentemente
+        self.derivados = OrderedDict()
+        self.calculando = {}
+
+
+class RegistroBases:
+    # `sessao_ativa(sessao)` informa se uma sessão ainda existe (sessões encerradas deixam de contar)
+    def __init__(self, limite_mb=LIMITE_MB_BASES, sessao_ativa=None):
+        self.limite_bytes = limite_mb * 1024 * 1024
+        self.sessao_ativa = sessao_ativa
+        self._bases = OrderedDict()
+        self._sessoes = {}
+        self._trava = threading.RLock()
+        # Uma trava por chave: sessões que pedem a mesma base ao mesmo tempo a leem uma única vez
+        self._carregando = {}
+
+    def __contains__(self, chave):
+        return chave in self._bases
+
+    def __len__(self):
+        return len(self._bases)
+
+    # Visão somente leitura da base; a sessão passa a usá-la no papel (e deixa a anterior desse papel)
+    def obter(self, chave, sessao=None, papel="base"):
+        with self._trava:
+            entrada = self._bases.get(chave)
+            if entrada is None:
+                return None
+            self._bases.move_to_end(chave)
+            self._usar(chave, sessao, papel)
+            return entrada.df.copy(deep=False)
+
+    # Registra uma base lida (se o conteúdo já estiver registrado, mantém a existente)
+    def registrar(self, chave, df, sessao=None, papel="base"):
+        with self._trava:
+            if chave not in self._bases:
+                self._bases[chave] = _Entrada(df)
+            visao = self.obter(chave, sessao, papel)
+            self._descartar()
+            return visao
+
+    def obter_ou_carregar(self, chave, carregar, sessao=None, papel="base"):
+        visao = self.obter(chave, sessao, papel)
+        if visao is not None:
+            return visao
+        with self._trava:
+            trava_chave = self._carregando.setdefault(chave, threading.Lock())
+        with trava_chave:
+            visao = self.obter(chave, sessao, papel)
+            if visao is None:
+                visao = self.registrar(chave, carregar(), sessao, papel)
+        with self._trava:
+            self._carregando.pop(chave, None)
+        return visao
+
+    # Objeto derivado da base `chave`, calculado uma vez por nome e `parametros` (hasheáveis, ex.: a data de
+    # referência) e guardado na entrada, com até MAX_DERIVADOS_POR_NOME variações por nome; `memoria(objeto)`
+    # estima os bytes que ele soma aos da base. Sem a base no registro, é só calculado
+    def derivado(self, chave, nome, calcular, parametros=None, memoria=None):
+        identificacao = (nome, parametros)
+        with self._trava:
+            entrada = self._bases.get(chave)
+            if entrada is None:
+                return calcular()
+            guardado = entrada.derivados.get(identificacao)
+            if guardado is not None:
+                entrada.derivados.move_to_end(identificacao)
+                return guardado[0]
+            trava = entrada.calculando.setdefault(identificacao, threading.Lock())
+        with trava:
+            with self._trava:
+                guardado = entrada.derivados.get(identificacao)
+            if guardado is not None:
+                return guardado[0]
+            objeto = calcular()
+            tamanho = 0 if memoria is None else int(memoria(objeto))
+            with self._trava:
+                entrada.derivados[identificacao] = (objeto, tamanho)
+                entrada.bytes += tamanho
+                variacoes = [chave_derivado for chave_derivado in entrada.derivados if chave_derivado[0] == nome]
+                for antiga in variacoes[:-MAX_DERIVADOS_POR_NOME]:
+                    entrada.bytes -= entrada.derivados.pop(antiga)[1]
+                entrada.calculando.pop(identificacao, None)
+                self._descartar()
+        return objeto
+
+    # Chave da base que a sessão usa no papel (None se não usa nenhuma)
+    def chave_sessao(self, sessao, papel="base"):
+        return self._sessoes.get((sessao, papel))
+
+    # Sessão deixa de usar a base que tinha no papel (ex.: ao encerrar ou trocar de fonte)
+    def liberar(self, sessao, papel="base"):
+        with self._trava:
+            chave = self._sessoes.pop((sessao, papel), None)
+            if chave in self._bases:
+                self._bases[chave].sessoes.discard((sessao, papel))
+            self._descartar()
+
+    def _usar(self, chave, sessao, papel):
+        if sessao is None:
+            return
+        uso = (sessao, papel)
+        anterior = self._sessoes.get(uso)
+        if anterior is not None and anterior != chave and anterior in self._bases:
+            self._bases[anterior].sessoes.discard(uso)
+        self._sessoes[uso] = chave
+        self._bases[chave].sessoes.add(uso)
+
+    # Remove as sessões encerradas e descarta bases sem uso (LRU) até caber no limite
+    def _descartar(self):
+        if self.sessao_ativa is not None:
+            for uso in [u for u in self._sessoes if not self.sessao_ativa(u[0])]:
+                chave = self._sessoes.pop(uso)
+                if chave in self._bases:
+                    self._bases[chave].sessoes.discard(uso)
+        total = sum(entrada.bytes for entrada in self._bases.values())
+        for chave in list(self._bases):
+            if total <= self.limite_bytes:
+                break
+            entrada = self._bases[chave]
+            if not entrada.sessoes:
+                total -= entrada.bytes
+                del self._bases[chave]
+
+    def estatisticas(self):
+        with self._trava:
+            return pd.DataFrame(
+                [
+                    {"Base": chave[:12], "Linhas": len(entrada.df), "Memória (MB)": entrada.bytes / 1024 ** 2,
+                     "Sessões": len({sessao for sessao, _ in entrada.sessoes})}
+                    for chave, entrada in reversed(self._bases.items())
+                ],
+                columns=["Base", "Linhas", "Memória (MB)", "Sessões"],
+            )
+
+
+_registro = None
+_trava_registro = threading.Lock()
+
+
+# Registro único do processo (as opções valem só na primeira chamada)
+def registro_processo(**opcoes):
+    global _registro
+    with _trava_registro:
+        if _registro is None:
+            _registro = RegistroBases(**opcoes)
+        return _registro
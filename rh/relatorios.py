@@ -0,0 +1,292 @@
+import argparse
+import html
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rh import motor
+from rh.base_preparada import BasePreparada
+from rh.cache_dados import carregar_com_cache, chave_para_processos, hash_conteudo, ler_cache
+from rh.cubo_turnover import CuboTurnover
+from rh.efetivo import IndiceEfetivoSegmentado
+from rh.figuras import figuras_demografia, figuras_idade_tempo_casa, figuras_localizacao, figuras_rotatividade
+from rh.geografia import geojson_estados
+from rh.ingestao import ler_base, validar_base
+from rh.validacao import sem_quarentena
+
+# Relatórios HTML estáticos das abas Demografia, Idade/tempo de casa, Localização e Rotatividade,
+# um para a base toda e um para cada valor de Função e de Estado, gerados em paralelo sem o Streamlit.
+#
+#   python -m rh.relatorios base.xlsx --saida relatorios --processos 8
+#
+# Como em rh.lote, a base vai para o cache Arrow e cada processo de trabalho monta uma única vez a
+# base preparada, o cubo mensal (Sexo x Função x Estado) e as linhas de cada valor; um relatório só
+# fatia esses agregados e desenha as figuras (rh.figuras, as mesmas da página). Cada processo grava
+# os próprios arquivos, e o processo principal recebe só o resumo de cada relatório.
+
+COLUNAS_RELATORIO = ["Função", "Estado"]
+# Sexo entra no cubo para a comparação por gênero da aba Rotatividade
+COLUNAS_CUBO = ["Sexo", "Função", "Estado"]
+# embutido: plotly.js dentro de cada arquivo (autocontido, ~4,8 MB por relatório);
+# compartilhado: um plotly.min.js na pasta de saída, usado por todos; cdn: carregado da internet
+MODOS_PLOTLY = ["embutido", "compartilhado", "cdn"]
+ARQUIVO_PLOTLY = "plotly.min.js"
+CONFIG_FIGURAS = {"displaylogo": False, "responsive": True}
+
+ESTILO = """
+body { font-family: sans-serif; margin: 0 auto; max-width: 1200px; padding: 0 24px 48px; color: #222; }
+h1 { font-size: 32px; margin-bottom: 4px; }
+h2 { border-bottom: 2px solid #2a9df4; padding-bottom: 4px; margin-top: 40px; }
+.sub-text { font-size: 16px; color: #666; }
+.cards { display: flex; flex-wrap: wrap; gap: 12px; }
+.card { flex: 1; min-width: 180px; background: linear-gradient(135deg, #4CAF50, #2a9df4); padding: 16px;
+        border-radius: 10px; text-align: center; color: white; box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1); }
+.card-value { font-size: 28px; font-weight: bold; }
+.card-label { font-size: 15px; }
+.figuras { display: grid; grid-template-columns: repeat(auto-fit, minmax(520px, 1fr)); gap: 16px; }
+table { border-collapse: collapse; } td, th { padding: 4px 12px; border-bottom: 1px solid #ddd; text-align: left; }
+"""
+
+# Estado de cada processo de trabalho (preenchido por _iniciar_processo)
+_contexto = {}
+
+
+# Tag <script> do plotly.js no modo escolhido (o caminho do compartilhado é relativo ao relatório)
+def script_plotly(modo, prefixo=""):
+    import plotly.offline
+
+    if modo == "embutido":
+        return f'<script type="text/javascript">{plotly.offline.get_plotlyjs()}</script>'
+    if modo == "compartilhado":
+        return f'<script src="{prefixo}{ARQUIVO_PLOTLY}"></script>'
+    if modo == "cdn":
+        return f'<script src="https://cdn.plot.ly/plotly-{plotly.offline.get_plotlyjs_version()}.min.js"></script>'
+    raise ValueError(f"Modo do plotly.js desconhecido: {modo} (use {', '.join(MODOS_PLOTLY)})")
+
+
+def _iniciar_processo(chave, diretorio_cache, data_referencia, modo_plotly):
+    # Mesma base da leitura, sem as linhas em quarentena (rh.validacao)
+    df = sem_quarentena(ler_cache(chave, diretorio_cache))
+    base = BasePreparada(df, data_referencia)
+    indice = IndiceEfetivoSegmentado(base.df, COLUNAS_CUBO)
+    _contexto.update(
+        base=base.df,
+        data_referencia=base.data_referencia,
+        indice=indice,
+        cubo=CuboTurnover(indice),
+        # Linhas de cada valor das colunas de relatório (os relatórios não varrem a base)
+        linhas={coluna: base.df.groupby(coluna, sort=False, observed=True).indices for coluna in COLUNAS_RELATORIO},
+        # Lido uma vez por processo; no modo embutido é o trecho mais pesado de cada arquivo
+        scripts={prefixo: script_plotly(modo_plotly, prefixo) for prefixo in ("", "../")},
+    )
+
+
+# Nome de arquivo a partir do valor: sem acentos, minúsculo e com hífens ('São Paulo' -> 'sao-paulo')
+def nome_arquivo(valor):
+    texto = unicodedata.normalize("NFKD", str(valor)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", texto.lower()).strip("-") or "vazio"
+
+
+# Caminho relativo do relatório na pasta de saída: todos.html ou <coluna>/<valor>.html
+def caminho_relatorio(coluna, valor):
+    if coluna is None:
+        return "todos.html"
+    return f"{nome_arquivo(coluna)}/{nome_arquivo(valor)}.html"
+
+
+# Base toda e cada valor presente das colunas de relatório
+def listar_relatorios(cubo):
+    relatorios = [(None, None)]
+    for coluna in COLUNAS_RELATORIO:
+        relatorios += [(coluna, valor) for valor in cubo.valores(coluna) if not pd.isna(valor)]
+    return relatorios
+
+
+def _cartoes(valores):
+    return '<div class="cards">' + "".join(
+        f'<div class="card"><div class="card-value">{html.escape(valor)}</div>'
+        f'<div class="card-label">{html.escape(rotulo)}</div></div>'
+        for rotulo, valor in valores
+    ) + "</div>"
+
+
+def _figuras(figuras):
+    return '<div class="figuras">' + "".join(
+        figura.to_html(full_html=False, include_plotlyjs=False, config=CONFIG_FIGURAS)
+        for figura in figuras if figura is not None
+    ) + "</div>"
+
+
+# Página completa de um relatório a partir das seções (título, HTML)
+def montar_html(titulo, subtitulo, secoes, script):
+    corpo = "".join(f"<section><h2>{html.escape(nome)}</h2>{conteudo}</section>" for nome, conteudo in secoes)
+    return (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8">'
+        f"<title>{html.escape(titulo)}</title><style>{ESTILO}</style>{script}</head><body>"
+        f'<h1>{html.escape(titulo)}</h1><p class="sub-text">{html.escape(subtitulo)}</p>{corpo}</body></html>'
+    )
+
+
+# Relatório de um valor de Função ou Estado (coluna None = base toda), gravado em `saida`.
+# A Rotatividade mostra o ano informado ou o último ano com movimentação no recorte.
+def gerar_relatorio(coluna, valor, saida, ano=None):
+    inicio = time.perf_counter()
+    filtros = {} if coluna is None else {coluna: valor}
+    base = _contexto["base"]
+    df = base if coluna is None else base.iloc[_contexto["linhas"][coluna].get(valor, np.array([], dtype=np.intp))]
+    cubo = _contexto["cubo"]
+    data_referencia = _contexto["data_referencia"]
+
+    principais = motor.metricas_principais(_contexto["indice"].filtrar(filtros), data_referencia)
+    idade = motor.indicadores_idade_tempo_casa(df)
+    geograficos = motor.indicadores_geograficos(df)
+    por_estado = geograficos["por_estado"]
+    geojson = geojson_estados(por_estado.loc[por_estado["Quantidade"] > 0, "Sigla"].dropna())
+    localizacao = figuras_localizacao(geograficos, geojson)
+
+    secoes = [
+        ("Resumo", _cartoes([
+            ("Colaboradores na base", f"{len(df)}"),
+            ("Colaboradores ativos", f"{principais['colaboradores_ativos']}"),
+            (f"Turnover {data_referencia.year}", f"{principais['turnover_anual']:.2f}%"),
+            (f"Retenção {data_referencia.year}", f"{principais['taxa_retencao']:.2f}%"),
+        ])),
+        ("Demografia", _figuras(figuras_demografia(motor.distribuicoes_demograficas(df)))),
+        ("Idade/tempo de casa", _cartoes([
+            ("Idade média", f"{idade['idade_media']:.2f} anos"),
+            ("Idade máxima", f"{idade['idade_max']:.0f} anos"),
+            ("Idade mínima", f"{idade['idade_min']:.0f} anos"),
+            ("Tempo médio de casa", f"{idade['tempo_casa_medio']:.2f} anos"),
+        ]) + _figuras(figuras_idade_tempo_casa(idade))),
+        ("Localização geográfica", _figuras([localizacao["mapa"], localizacao["cidades"]])),
+    ]
+
+    anos = cubo.anos(filtros)
+    ano = ano if ano in anos else (anos[-1] if anos else None)
+    if ano is None:
+        secoes.append(("Rotatividade", "<p>Sem contratações ou desligamentos no recorte.</p>"))
+    else:
+        turnover = motor.indicadores_turnover(cubo, ano, filtros)
+        figuras = figuras_rotatividade(turnover)
+        secoes.append((f"Rotatividade ({ano})", _cartoes([
+            ("Entradas", f"{turnover['entradas']}"),
+            ("Saídas", f"{turnover['saidas']}"),
+            ("Média de colaboradores", f"{turnover['media_colaboradores']:.2f}"),
+            ("Turnover anual", f"{turnover['turnover_anual']:.2f}%"),
+        ]) + _figuras([figuras["entradas_saidas"], figuras["timeline"], figuras.get("genero")])))
+
+    titulo = "Painel de Gestão de Pessoal da STOG" if coluna is None else f"{coluna}: {valor}"
+    subtitulo = f"Data de referência: {data_referencia:%d/%m/%Y}"
+    relativo = caminho_relatorio(coluna, valor)
+    script = _contexto["scripts"]["" if coluna is None else "../"]
+    caminho = os.path.join(saida, relativo)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        arquivo.write(montar_html(titulo, subtitulo, secoes, script))
+    return {
+        "Coluna": coluna or "Todos",
+        "Valor": "Todos" if coluna is None else str(valor),
+        "Arquivo": relativo,
+        "Colaboradores": int(len(df)),
+        "Ano": ano,
+        "Segundos": time.perf_counter() - inicio,
+    }
+
+
+def _gerar_relatorio_tarefa(argumentos):
+    return gerar_relatorio(*argumentos)
+
+
+# Página inicial com os links para todos os relatórios
+def gravar_indice(resumo, saida):
+    linhas = "".join(
+        f'<tr><td>{html.escape(r["Coluna"])}</td><td><a href="{html.escape(r["Arquivo"])}">{html.escape(r["Valor"])}</a></td>'
+        f'<td>{r["Colaboradores"]}</td></tr>'
+        for r in resumo
+    )
+    conteudo = (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8"><title>Relatórios</title>'
+        f"<style>{ESTILO}</style></head><body><h1>Relatórios por Função e Estado</h1>"
+        f"<table><tr><th>Recorte</th><th>Valor</th><th>Colaboradores</th></tr>{linhas}</table></body></html>"
+    )
+    caminho = os.path.join(saida, "index.html")
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        arquivo.write(conteudo)
+    return caminho
+
+
+def exportar_relatorios(df=None, saida="relatorios", data_referencia=None, processos=None, modo_plotly="embutido", ano=None,
+                        chave=None, diretorio_cache=None, progresso=None):
+    chave = chave_para_processos(df, chave, diretorio_cache)
+    os.makedirs(saida, exist_ok=True)
+    if modo_plotly == "compartilhado":
+        import plotly.offline
+
+        with open(os.path.join(saida, ARQUIVO_PLOTLY), "w", encoding="utf-8") as arquivo:
+            arquivo.write(plotly.offline.get_plotlyjs())
+
+    # O processo principal monta o próprio contexto para listar os relatórios (e gerar, se sequencial)
+    argumentos_contexto = (chave, diretorio_cache, data_referencia, modo_plotly)
+    _iniciar_processo(*argumentos_contexto)
+    tarefas = [(coluna, valor, saida, ano) for coluna, valor in listar_relatorios(_contexto["cubo"])]
+
+    processos = min(processos or os.cpu_count() or 1, len(tarefas))
+    resumo = []
+    if processos <= 1:
+        for i, tarefa in enumerate(tarefas, start=1):
+            resumo.append(_gerar_relatorio_tarefa(tarefa))
+            if progresso is not None:
+                progresso(i, len(tarefas))
+    else:
+        lote_tarefas = max(1, len(tarefas) // (processos * 4))
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo,
+                                 initargs=argumentos_contexto) as executor:
+            for i, resultado in enumerate(executor.map(_gerar_relatorio_tarefa, tarefas, chunksize=lote_tarefas), start=1):
+                resumo.append(resultado)
+                if progresso is not None:
+                    progresso(i, len(tarefas))
+    gravar_indice(resumo, saida)
+    return pd.DataFrame(resumo)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m rh.relatorios", description="Gera relatórios HTML por Função e por Estado")
+    parser.add_argument("arquivo", help="base de colaboradores (xlsx, csv ou parquet)")
+    parser.add_argument("--saida", default="relatorios", help="diretório de saída (padrão: relatorios)")
+    parser.add_argument("--processos", type=int, default=None, help="processos de trabalho (padrão: número de CPUs)")
+    parser.add_argument("--plotly", choices=MODOS_PLOTLY, default="embutido", help="como incluir o plotly.js (padrão: embutido)")
+    parser.add_argument("--ano", type=int, default=None, help="ano da aba Rotatividade (padrão: último ano com movimentação)")
+    parser.add_argument("--data-referencia", default=None, help="data de referência AAAA-MM-DD (padrão: hoje)")
+    argumentos = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    with open(argumentos.arquivo, "rb") as arquivo:
+        conteudo = arquivo.read()
+    chave = hash_conteudo(conteudo)
+    lida = validar_base(carregar_com_cache(conteudo, lambda c: ler_base(c, argumentos.arquivo, validar=True), chave=chave))
+    df = sem_quarentena(lida)
+    print(f"Base lida: {len(df)} linhas, {len(lida) - len(df)} em quarentena ({time.perf_counter() - inicio:.1f}s)")
+
+    def progresso(feitos, total):
+        if feitos == total or feitos % max(1, total // 20) == 0:
+            print(f"\r{feitos}/{total} relatórios", end="", flush=True)
+
+    # A base já sem quarentena vai para o cache sob o hash do próprio conteúdo (a entrada da leitura pode
+    # ser de antes da validação)
+    resumo = exportar_relatorios(df, saida=argumentos.saida, data_referencia=argumentos.data_referencia,
+                                 processos=argumentos.processos, modo_plotly=argumentos.plotly, ano=argumentos.ano,
+                                 progresso=progresso)
+    print()
+    print(f"{len(resumo)} relatórios em {argumentos.saida} (índice: {os.path.join(argumentos.saida, 'index.html')})")
+    print(f"Concluído em {time.perf_counter() - inicio:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
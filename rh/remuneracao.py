@@ -0,0 +1,258 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from rh.armazem import escolher_coluna_chave
+from rh.base_preparada import converter_texto_datas
+from rh.ingestao import CHAVES_CANDIDATAS, formato_arquivo, ler_base
+
+# Indicadores de remuneração sobre a folha mensal (uma linha por colaborador e competência).
+#
+# A folha é ligada à base 'BD' pela chave do colaborador sem copiar a base: cada linha da folha
+# guarda só a posição do colaborador na base e os códigos de Sexo e Função (int8/int16). Na carga
+# são montados um cubo mês x Sexo x Função (somas de salário e custo, colaboradores) para as séries
+# de custo, e — sob demanda — a folha ordenada por grupo e salário, da qual os percentis saem por
+# indexação direta. Mudar um filtro não volta a varrer as linhas da folha.
+
+COLUNAS_VALOR = ["Salário", "Encargos", "Benefícios"]
+COLUNAS_FOLHA = CHAVES_CANDIDATAS + ["Competência"] + COLUNAS_VALOR
+PERCENTIS = [10, 25, 50, 75, 90]
+SEM_CADASTRO = "Sem cadastro"
+# Ordenações guardadas (cada uma ocupa ~12 bytes por linha da folha)
+MAX_ORDENS = 4
+
+
+# Lê a folha (xlsx na aba 'Folha', csv ou parquet) só com as colunas usadas
+def ler_folha(conteudo, nome, progresso=None):
+    opcoes = {"colunas": COLUNAS_FOLHA, "progresso": progresso}
+    if formato_arquivo(nome) == "xlsx":
+        opcoes["sheet_name"] = "Folha"
+    return ler_base(conteudo, nome, **opcoes)
+
+
+# Competência (data, 'AAAA-MM' ou 'MM/AAAA') como mês absoluto (ano * 12 + mês - 1); -1 se inválida
+def _mes_competencia(valores):
+    valores = pd.Series(valores)
+    if not pd.api.types.is_datetime64_any_dtype(valores):
+        texto = valores.astype(str).str.strip()
+        # MM/AAAA vira AAAA-MM; AAAA-MM[-DD] é lido como ISO e só DD/MM/AAAA com o dia primeiro
+        texto = texto.str.replace(r"^(\d{1,2})/(\d{4})$", r"\2-\1", regex=True).where(valores.notna())
+        valores = converter_texto_datas(texto, dayfirst=True)
+    meses = valores.dt.year * 12 + valores.dt.month - 1
+    return meses.fillna(-1).to_numpy(dtype=np.int64)
+
+
+# Chaves comparáveis entre folha e base: inteiros quando as duas colunas são numéricas, senão texto
+def _chaves(folha, base):
+    if pd.api.types.is_integer_dtype(folha) and pd.api.types.is_integer_dtype(base):
+        return folha.to_numpy(dtype=np.int64), base.to_numpy(dtype=np.int64)
+    return folha.astype(str).to_numpy(), base.astype(str).to_numpy()
+
+
+# Códigos de uma coluna categórica da base nas linhas da folha; sem cadastro = último código
+def _codigos_na_folha(coluna, posicoes):
+    coluna = coluna if isinstance(coluna.dtype, pd.CategoricalDtype) else coluna.astype("category")
+    categorias = [str(categoria) for categoria in coluna.cat.categories] + [SEM_CADASTRO]
+    codigos = coluna.cat.codes.to_numpy()
+    sem_cadastro = len(categorias) - 1
+    na_folha = np.where(posicoes >= 0, codigos[np.maximum(posicoes, 0)], sem_cadastro)
+    tipo = np.int8 if len(categorias) < 127 else np.int16
+    return np.where(na_folha >= 0, na_folha, sem_cadastro).astype(tipo), categorias
+
+
+class FolhaPagamento:
+    def __init__(self, folha, base, coluna_chave=None):
+        coluna_chave = coluna_chave or escolher_coluna_chave(folha.columns)
+        if coluna_chave not in base.columns:
+            raise KeyError(f"A base 'BD' não tem a coluna '{coluna_chave}' usada na folha")
+        if "Salário" not in folha.columns:
+            raise KeyError("A folha não tem a coluna 'Salário'")
+
+        # Posição de cada linha da folha na base (-1 = colaborador sem cadastro). A base não é copiada:
+        # ficam só as posições e os códigos de Sexo/Função em cada linha da folha.
+        chaves_folha, chaves_base = _chaves(folha[coluna_chave], base[coluna_chave])
+        # Chave repetida na base: vale a última linha, como na deduplicação do armazém
+        linhas_base = pd.Series(np.arange(len(base)), index=chaves_base)
+        linhas_base = linhas_base[~linhas_base.index.duplicated(keep="last")]
+        encontrados = linhas_base.index.get_indexer(chaves_folha)
+        posicoes = np.where(encontrados >= 0, linhas_base.to_numpy()[np.maximum(encontrados, 0)], -1)
+
+        self.coluna_chave = coluna_chave
+        self.sem_cadastro = int((posicoes < 0).sum())
+        self.sexo, categorias_sexo = _codigos_na_folha(base["Sexo"], posicoes)
+        self.funcao, categorias_funcao = _codigos_na_folha(base["Função"], posicoes)
+        self.categorias = {"Sexo": categorias_sexo, "Função": categorias_funcao}
+
+        meses = _mes_competencia(folha["Competência"])
+        validos = meses >= 0
+        self.competencias_invalidas = int((~validos).sum())
+        self.primeiro_mes = int(meses[validos].min()) if validos.any() else 0
+        self.mes = np.where(validos, meses - self.primeiro_mes, -1).astype(np.int32)
+        self.salario = pd.to_numeric(folha["Salário"], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        self.custo = self.salario.copy()
+        for coluna in ("Encargos", "Benefícios"):
+            if coluna in folha.columns:
+                self.custo += pd.to_numeric(folha[coluna], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        # Colaborador de cada linha, para contar pessoas (e não linhas) por mês
+        self._colaborador = pd.factorize(chaves_folha)[0]
+
+        quantidade_meses = int(self.mes.max()) + 1 if validos.any() else 0
+        self.periodos = pd.period_range(
+            pd.Period(year=self.primeiro_mes // 12, month=self.primeiro_mes % 12 + 1, freq="M"),
+            periods=quantidade_meses, freq="M",
+        ) if quantidade_meses else pd.PeriodIndex([], freq="M")
+
+        self._ordens = OrderedDict()
+        self._trava = threading.Lock()
+        self._montar_cubo(validos)
+
+    def __len__(self):
+        return len(self.salario)
+
+    # Cubo meses x Sexo x Função com salários, custo e colaboradores distintos (bincount sobre a folha)
+    def _montar_cubo(self, validos):
+        formato = (len(self.periodos), len(self.categorias["Sexo"]), len(self.categorias["Função"]))
+        tamanho = int(np.prod(formato))
+        celula = np.ravel_multi_index(
+            (self.mes[validos], self.sexo[validos].astype(np.int64), self.funcao[validos].astype(np.int64)), formato
+        ) if tamanho else np.array([], dtype=np.int64)
+        self._cubo = {
+            "Salários": np.bincount(celula, weights=self.salario[validos], minlength=tamanho).reshape(formato),
+            "Custo total": np.bincount(celula, weights=self.custo[validos], minlength=tamanho).reshape(formato),
+        }
+        # Uma pessoa conta uma vez por mês, mesmo com várias linhas (ex.: 13º, rescisão)
+        pessoa_mes = self._colaborador[validos].astype(np.int64) * max(len(self.periodos), 1) + self.mes[validos]
+        _, primeira = np.unique(pessoa_mes, return_index=True)
+        self._cubo["Colaboradores"] = np.bincount(celula[primeira], minlength=tamanho).reshape(formato)
+
+    # Valores de Sexo ou Função presentes na folha (sem cadastro por último)
+    def valores(self, coluna):
+        presentes = np.flatnonzero(np.bincount(getattr(self, "sexo" if coluna == "Sexo" else "funcao").astype(np.int64),
+                                               minlength=len(self.categorias[coluna])))
+        return [self.categorias[coluna][codigo] for codigo in presentes]
+
+    def _codigo(self, coluna, valor):
+        return None if valor in (None, "Todos") else self.categorias[coluna].index(valor)
+
+    # Custo total, salários, colaboradores e custo por colaborador mês a mês para os filtros
+    def evolucao_custos(self, filtros=None):
+        filtros = filtros or {}
+        fatia = {}
+        for metrica, cubo in self._cubo.items():
+            sexo, funcao = self._codigo("Sexo", filtros.get("Sexo")), self._codigo("Função", filtros.get("Função"))
+            cubo = cubo if sexo is None else cubo[:, sexo:sexo + 1]
+            cubo = cubo if funcao is None else cubo[:, :, funcao:funcao + 1]
+            fatia[metrica] = cubo.sum(axis=(1, 2))
+        tabela = pd.DataFrame(fatia, index=self.periodos.to_timestamp())
+        tabela["Custo por colaborador"] = tabela["Custo total"] / tabela["Colaboradores"].where(tabela["Colaboradores"] > 0)
+        tabela.index.name = "Mês"
+        return tabela.reset_index()
+
+    # Linhas da folha ordenadas por (grupo, salário) e o início de cada grupo; grupo = mês x Sexo x Função,
+    # com as colunas de `agregar` somadas ("Todos")
+    def _ordem(self, agregar):
+        chave = tuple(sorted(agregar))
+        with self._trava:
+            if chave not in self._ordens:
+                tamanhos = (len(self.categorias["Sexo"]), len(self.categorias["Função"]))
+                sexo = np.zeros_like(self.sexo) if "Sexo" in agregar else self.sexo
+                funcao = np.zeros_like(self.funcao) if "Função" in agregar else self.funcao
+                grupo = (self.mes.astype(np.int64) * tamanhos[0] + sexo) * tamanhos[1] + funcao
+                grupo = np.where(self.mes >= 0, grupo, -1)
+                ordem = np.lexsort((self.salario, grupo))
+                grupo_ordenado = grupo[ordem]
+                self._ordens[chave] = (grupo_ordenado, self.salario[ordem], tamanhos)
+                while len(self._ordens) > MAX_ORDENS:
+                    self._ordens.popitem(last=False)
+            self._ordens.move_to_end(chave)
+            return self._ordens[chave]
+
+    # Percentis de uma lista de grupos (interpolação linear, como np.percentile) por indexação na ordem
+    def _percentis_grupos(self, agregar, grupos, percentis):
+        grupo_ordenado, salarios, _ = self._ordem(agregar)
+        inicios = np.searchsorted(grupo_ordenado, grupos, side="left")
+        quantidades = np.searchsorted(grupo_ordenado, grupos, side="right") - inicios
+        resultado = np.full((len(grupos), len(percentis)), np.nan)
+        com_linhas = quantidades > 0
+        for j, percentil in enumerate(percentis):
+            posicao = (quantidades[com_linhas] - 1) * percentil / 100
+            baixo = np.floor(posicao).astype(np.int64)
+            alto = np.ceil(posicao).astype(np.int64)
+            fracao = posicao - baixo
+            base = inicios[com_linhas]
+            resultado[com_linhas, j] = salarios[base + baixo] * (1 - fracao) + salarios[base + alto] * fracao
+        return resultado, quantidades
+
+    # Faixas salariais (percentis) de cada Função em um mês, com o filtro de Sexo
+    def percentis_salario(self, mes=None, sexo=None, percentis=PERCENTIS):
+        colunas = [f"P{percentil}" for percentil in percentis]
+        if not len(self.periodos):
+            return pd.DataFrame(columns=["Função", "Linhas"] + colunas)
+        posicao_mes = self._posicao_mes(mes)
+        codigo_sexo = self._codigo("Sexo", sexo)
+        agregar = ("Sexo",) if codigo_sexo is None else ()
+        quantidade_sexo, quantidade_funcao = len(self.categorias["Sexo"]), len(self.categorias["Função"])
+        funcoes = np.arange(quantidade_funcao)
+        grupos = (posicao_mes * quantidade_sexo + (codigo_sexo or 0)) * quantidade_funcao + funcoes
+        valores, quantidades = self._percentis_grupos(agregar, grupos, percentis)
+        tabela = pd.DataFrame(valores, columns=colunas)
+        tabela.insert(0, "Função", self.categorias["Função"])
+        tabela.insert(1, "Linhas", quantidades)
+        return tabela[tabela["Linhas"] > 0].sort_values("P50", ascending=False).reset_index(drop=True)
+
+    # Percentis do salário de um mês para os filtros de Sexo e Função ("Todos" agrega a coluna)
+    def percentis_filtro(self, mes=None, filtros=None, percentis=PERCENTIS):
+        filtros = filtros or {}
+        codigos = {coluna: self._codigo(coluna, filtros.get(coluna)) for coluna in ("Sexo", "Função")}
+        agregar = tuple(coluna for coluna, codigo in codigos.items() if codigo is None)
+        quantidade_sexo, quantidade_funcao = len(self.categorias["Sexo"]), len(self.categorias["Função"])
+        grupo = (self._posicao_mes(mes) * quantidade_sexo + (codigos["Sexo"] or 0)) * quantidade_funcao
+        grupo += codigos["Função"] or 0
+        valores, _ = self._percentis_grupos(agregar, np.array([grupo]), percentis)
+        return dict(zip([f"P{percentil}" for percentil in percentis], valores[0]))
+
+    # Diferença salarial entre homens e mulheres por Função em um mês, pela mediana e pela média:
+    # (masculino - feminino) / masculino, em %
+    def gap_genero(self, mes=None, masculino="Masculino", feminino="Feminino"):
+        colunas = ["Função", "Mediana masculina", "Mediana feminina", "Gap mediana (%)",
+                   "Média masculina", "Média feminina", "Gap média (%)"]
+        if masculino not in self.categorias["Sexo"] or feminino not in self.categorias["Sexo"]:
+            return pd.DataFrame(columns=colunas)
+        posicao_mes = self._posicao_mes(mes)
+        quantidade_sexo, quantidade_funcao = len(self.categorias["Sexo"]), len(self.categorias["Função"])
+        funcoes = np.arange(quantidade_funcao)
+        medianas, medias, presentes = [], [], []
+        for valor in (masculino, feminino):
+            codigo = self.categorias["Sexo"].index(valor)
+            grupos = (posicao_mes * quantidade_sexo + codigo) * quantidade_funcao + funcoes
+            mediana, quantidades = self._percentis_grupos((), grupos, [50])
+            medianas.append(mediana[:, 0])
+            presentes.append(quantidades > 0)
+            salarios = self._cubo["Salários"][posicao_mes, codigo]
+            pessoas = self._cubo["Colaboradores"][posicao_mes, codigo]
+            medias.append(np.where(pessoas > 0, salarios / np.maximum(pessoas, 1), np.nan))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tabela = pd.DataFrame({
+                "Função": self.categorias["Função"],
+                "Mediana masculina": medianas[0],
+                "Mediana feminina": medianas[1],
+                "Gap mediana (%)": (medianas[0] - medianas[1]) / medianas[0] * 100,
+                "Média masculina": medias[0],
+                "Média feminina": medias[1],
+                "Gap média (%)": (medias[0] - medias[1]) / medias[0] * 100,
+            }, columns=colunas)
+        tabela = tabela[presentes[0] & presentes[1]]
+        return tabela.sort_values("Gap mediana (%)", ascending=False).reset_index(drop=True)
+
+    # Posição do mês (Timestamp, Period ou 'AAAA-MM') no cubo; o último mês da folha por padrão
+    def _posicao_mes(self, mes):
+        if mes is None:
+            return len(self.periodos) - 1
+        return int(self.periodos.get_loc(pd.Period(mes, freq="M")))
+
+    def memoria(self):
+        arrays = [self.mes, self.sexo, self.funcao, self.salario, self.custo, self._colaborador]
+        arrays += [array for ordem in self._ordens.values() for array in ordem[:2]]
+        return sum(array.nbytes for array in arrays) + sum(cubo.nbytes for cubo in self._cubo.values())
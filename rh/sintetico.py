@@ -0,0 +1,181 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from rh.armazem import escolher_coluna_chave
+
+# Bases sintéticas com as colunas da aba 'BD', para medir desempenho e testar o dashboard.
+# A mesma semente gera sempre a mesma base (tamanhos de 1 mil a 5 milhões de linhas).
+#
+#   python -m rh.sintetico 100000 base_100k.parquet --semente 42
+#   python -m rh.sintetico 100000 base_100k.parquet --folha folha_100k.parquet
+
+# Estados com suas cidades e a participação no quadro de colaboradores
+ESTADOS_CIDADES = {
+    "São Paulo": (["São Paulo", "Campinas", "Santos", "Ribeirão Preto", "Sorocaba", "Osasco"], 0.30),
+    "Minas Gerais": (["Belo Horizonte", "Uberlândia", "Contagem", "Juiz de Fora"], 0.12),
+    "Rio de Janeiro": (["Rio de Janeiro", "Niterói", "Duque de Caxias"], 0.10),
+    "Paraná": (["Curitiba", "Londrina", "Maringá"], 0.07),
+    "Rio Grande do Sul": (["Porto Alegre", "Caxias do Sul", "Pelotas"], 0.06),
+    "Bahia": (["Salvador", "Feira de Santana"], 0.06),
+    "Santa Catarina": (["Florianópolis", "Joinville", "Blumenau"], 0.05),
+    "Goiás": (["Goiânia", "Anápolis"], 0.04),
+    "Pernambuco": (["Recife", "Jaboatão dos Guararapes"], 0.04),
+    "Distrito Federal": (["Brasília"], 0.04),
+    "Ceará": (["Fortaleza"], 0.03),
+    "Espírito Santo": (["Vitória", "Vila Velha"], 0.03),
+    "Pará": (["Belém"], 0.02),
+    "Amazonas": (["Manaus"], 0.02),
+    "Mato Grosso": (["Cuiabá"], 0.02),
+}
+
+# Funções com a participação no quadro e o percentual de mulheres
+FUNCOES = {
+    "Operador": (0.20, 0.30),
+    "Analista": (0.18, 0.55),
+    "Assistente": (0.16, 0.65),
+    "Técnico": (0.14, 0.35),
+    "Auxiliar": (0.12, 0.50),
+    "Coordenador": (0.06, 0.45),
+    "Supervisor": (0.05, 0.40),
+    "Gerente": (0.04, 0.38),
+    "Estagiário": (0.04, 0.55),
+    "Diretor": (0.01, 0.25),
+}
+
+# Salário base mensal de cada função (R$); tempo de casa e sexo ajustam o valor gerado na folha
+SALARIOS_FUNCOES = {
+    "Operador": 2_300, "Analista": 6_500, "Assistente": 3_200, "Técnico": 4_200, "Auxiliar": 1_900,
+    "Coordenador": 9_500, "Supervisor": 7_800, "Gerente": 15_000, "Estagiário": 1_600, "Diretor": 32_000,
+}
+ENCARGOS = 0.36
+
+INICIO = "2005-01-01"
+FIM = "2024-12-31"
+TEMPO_MEDIO_CASA_ANOS = 6.0
+LIMITE_LINHAS_XLSX = 1_048_575
+
+
+# Base com as colunas lidas pelo dashboard (mais a Matrícula); colunas de texto já categóricas
+def gerar_base(linhas, semente=0, inicio=INICIO, fim=FIM):
+    gerador = np.random.default_rng(semente)
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+    dias_periodo = (fim - inicio).days
+
+    # Contratações concentradas nos anos mais recentes (empresa em crescimento)
+    contratado = inicio + pd.to_timedelta((gerador.random(linhas) ** 0.8 * dias_periodo).astype(np.int64), unit="D")
+    tempo_casa = pd.to_timedelta(gerador.exponential(TEMPO_MEDIO_CASA_ANOS * 365, linhas).astype(np.int64) + 1, unit="D")
+    desligado = (contratado + tempo_casa).where(contratado + tempo_casa <= fim)
+
+    idade_contratacao = np.clip(18 + gerador.gamma(2.5, 5.0, linhas), 18, 65)
+    nascimento = (contratado - pd.to_timedelta((idade_contratacao * 365.25).astype(np.int64), unit="D")).normalize()
+    idade_fim = (fim - nascimento).days.to_numpy() / 365.25
+
+    nomes_funcoes = list(FUNCOES)
+    funcao = gerador.choice(len(nomes_funcoes), linhas, p=[peso for peso, _ in FUNCOES.values()])
+    feminino = gerador.random(linhas) < np.array([mulheres for _, mulheres in FUNCOES.values()])[funcao]
+
+    # Casamento mais comum com a idade; filhos mais comuns entre os casados
+    casado = gerador.random(linhas) < np.clip((idade_fim - 20) / 30, 0.1, 0.75)
+    tem_filhos = gerador.random(linhas) < np.where(casado, 0.7, 0.2)
+
+    nomes_estados = list(ESTADOS_CIDADES)
+    estado = gerador.choice(len(nomes_estados), linhas, p=[peso for _, peso in ESTADOS_CIDADES.values()])
+    cidades = [cidade for cidades_estado, _ in ESTADOS_CIDADES.values() for cidade in cidades_estado]
+    primeira_cidade = np.cumsum([0] + [len(c) for c, _ in ESTADOS_CIDADES.values()])[:-1]
+    quantidade_cidades = np.array([len(c) for c, _ in ESTADOS_CIDADES.values()])
+    cidade = primeira_cidade[estado] + (gerador.random(linhas) * quantidade_cidades[estado]).astype(np.int64)
+
+    return pd.DataFrame({
+        "Matrícula": np.arange(1, linhas + 1, dtype=np.int64),
+        "Contratado": contratado,
+        "Desligado": desligado,
+        "Sexo": pd.Categorical.from_codes(feminino.astype(np.int8), categories=["Masculino", "Feminino"]),
+        "Função": pd.Categorical.from_codes(funcao, categories=nomes_funcoes),
+        "Casado": pd.Categorical.from_codes(np.where(casado, 0, 1), categories=["Sim", "Não"]),
+        "Tem filhos": pd.Categorical.from_codes(np.where(tem_filhos, 0, 1), categories=["Sim", "Não"]),
+        "Data de Nascimento": nascimento,
+        "Estado": pd.Categorical.from_codes(estado, categories=nomes_estados),
+        "Cidade": pd.Categorical.from_codes(cidade, categories=cidades),
+    })
+
+
+# Folha mensal da base: uma linha por colaborador ativo em cada competência (aba 'Folha' no xlsx),
+# com Salário (função, tempo de casa e uma diferença por sexo), Encargos e Benefícios
+def gerar_folha(base, inicio="2020-01", fim=FIM, semente=0):
+    gerador = np.random.default_rng(semente)
+    primeiro = pd.Period(inicio, freq="M").ordinal
+    ultimo = pd.Period(fim, freq="M").ordinal
+
+    # Meses como ordinais de período (meses desde 1970-01)
+    def ordinal(datas):
+        datas = pd.to_datetime(datas, errors="coerce")
+        return ((datas.dt.year - 1970) * 12 + datas.dt.month - 1).to_numpy(dtype=np.float64)
+
+    contratado = ordinal(base["Contratado"])
+    desligado = np.nan_to_num(ordinal(base["Desligado"]), nan=ultimo)
+    mes_inicial = np.maximum(contratado, primeiro).astype(np.int64)
+    mes_final = np.minimum(desligado, ultimo).astype(np.int64)
+    meses = np.maximum(mes_final - mes_inicial + 1, 0)
+
+    # Uma linha por colaborador e mês ativo
+    linha = np.repeat(np.arange(len(base)), meses)
+    mes = mes_inicial[linha] + np.arange(len(linha)) - np.repeat(np.cumsum(meses) - meses, meses)
+
+    # Aumento de ~3% por ano de casa, 6% a menos para mulheres e uma variação individual fixa
+    salario_funcao = base["Função"].astype(object).map(SALARIOS_FUNCOES).fillna(3_000).to_numpy(dtype=np.float64)
+    individual = gerador.lognormal(0, 0.15, len(base))
+    feminino = (base["Sexo"].astype(object) == "Feminino").to_numpy()
+    anos_casa = (mes - contratado[linha]) / 12
+    salario = salario_funcao[linha] * individual[linha] * 1.03 ** anos_casa * np.where(feminino[linha], 0.94, 1.0)
+    salario = np.round(salario, 2)
+
+    chave = escolher_coluna_chave(base.columns)
+    return pd.DataFrame({
+        chave: base[chave].to_numpy()[linha],
+        "Competência": pd.PeriodIndex.from_ordinals(mes, freq="M").to_timestamp(),
+        "Salário": salario,
+        "Encargos": np.round(salario * ENCARGOS, 2),
+        "Benefícios": np.round(gerador.normal(900, 150, len(linha)).clip(400), 2),
+    })
+
+
+# Grava no formato da extensão: xlsx (aba 'BD', ou a informada), csv (';' e datas dd/mm/aaaa) ou parquet
+def gravar_base(df, caminho, aba="BD"):
+    extensao = os.path.splitext(caminho)[1].lower().lstrip(".")
+    if extensao == "xlsx":
+        if len(df) > LIMITE_LINHAS_XLSX:
+            raise ValueError(f"O Excel aceita até {LIMITE_LINHAS_XLSX} linhas; use csv ou parquet para {len(df)} linhas")
+        df.to_excel(caminho, sheet_name=aba, index=False)
+    elif extensao == "csv":
+        df.to_csv(caminho, sep=";", index=False, date_format="%d/%m/%Y")
+    elif extensao == "parquet":
+        df.to_parquet(caminho, index=False)
+    else:
+        raise ValueError(f"Formato não suportado: '{extensao}'. Use xlsx, csv ou parquet")
+    return caminho
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m rh.sintetico", description="Gera uma base sintética de colaboradores")
+    parser.add_argument("linhas", type=int)
+    parser.add_argument("arquivo", help="arquivo de saída (.xlsx, .csv ou .parquet)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--folha", help="grava também a folha mensal da base neste arquivo (desde --folha-inicio)")
+    parser.add_argument("--folha-inicio", default="2020-01", help="primeira competência da folha (AAAA-MM)")
+    argumentos = parser.parse_args(argv)
+    base = gerar_base(argumentos.linhas, argumentos.semente)
+    gravar_base(base, argumentos.arquivo)
+    print(f"{argumentos.linhas} linhas gravadas em {argumentos.arquivo}")
+    if argumentos.folha:
+        folha = gerar_folha(base, argumentos.folha_inicio, semente=argumentos.semente)
+        gravar_base(folha, argumentos.folha, aba="Folha")
+        print(f"{len(folha)} linhas de folha gravadas em {argumentos.folha}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
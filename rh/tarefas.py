@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Cálculos das abas em segundo plano, compartilhados entre sessões.
+#
+# Cada seção da página (por sessão) é um "interessado" em uma chave (base + aba + filtros). Uma chave
+# tem no máximo uma tarefa em andamento, reaproveitada por todas as sessões que pedirem o mesmo
+# recorte. Quando um interessado passa para outra chave, ele desiste da anterior; a tarefa sem mais
+# nenhum interessado é cancelada: se ainda está na fila, nem começa; se já está rodando, para no
+# próximo `verificar_cancelamento()` (pontos de parada entre as etapas do cálculo, já que uma
+# operação do pandas em andamento não pode ser interrompida).
+
+MAX_TAREFAS = int(os.environ.get("STOG_TAREFAS", "2"))
+
+
+class TarefaCancelada(Exception):
+    pass
+
+
+# Evento de cancelamento da tarefa que roda na thread atual (None fora das tarefas)
+_atual = threading.local()
+
+
+def verificar_cancelamento():
+    cancelada = getattr(_atual, "cancelada", None)
+    if cancelada is not None and cancelada.is_set():
+        raise TarefaCancelada()
+
+
+class Tarefa:
+    def __init__(self, chave):
+        self.chave = chave
+        self.cancelada = threading.Event()
+        self.interessados = set()
+        self.inicio = time.monotonic()
+        self.futuro = None
+
+    def concluida(self):
+        return self.futuro.done()
+
+    def segundos(self):
+        return time.monotonic() - self.inicio
+
+    # Resultado da função (levanta a exceção dela, TarefaCancelada ou CancelledError)
+    def resultado(self, timeout=None):
+        return self.futuro.result(timeout)
+
+
+class TarefasSegundoPlano:
+    def __init__(self, max_tarefas=MAX_TAREFAS):
+        self._executor = ThreadPoolExecutor(max_workers=max_tarefas, thread_name_prefix="stog-tarefa")
+        self._tarefas = {}
+        self._interesses = {}
+        # Reentrante: o callback de conclusão pode rodar na própria thread que submete
+        self._trava = threading.RLock()
+        self.concluidas = 0
+        self.canceladas = 0
+
+    # Tarefa da chave para o interessado (reaproveita a que já estiver em andamento). Se o interessado
+    # estava esperando outra chave, desiste dela antes.
+    def submeter(self, interessado, chave, funcao):
+        with self._trava:
+            anterior = self._interesses.get(interessado)
+            if anterior is not None and anterior != chave:
+                self._desistir(interessado, anterior)
+            self._interesses[interessado] = chave
+
+            tarefa = self._tarefas.get(chave)
+            if tarefa is None or tarefa.cancelada.is_set():
+                tarefa = Tarefa(chave)
+                self._tarefas[chave] = tarefa
+                tarefa.futuro = self._executor.submit(self._executar, tarefa, funcao)
+                tarefa.futuro.add_done_callback(lambda _: self._encerrar(tarefa))
+            tarefa.interessados.add(interessado)
+            return tarefa
+
+    # O interessado não espera mais nada (ex.: o recorte atual veio do cache)
+    def liberar(self, interessado):
+        with self._trava:
+            chave = self._interesses.pop(interessado, None)
+            if chave is not None:
+                self._desistir(interessado, chave)
+
+    def _desistir(self, interessado, chave):
+        tarefa = self._tarefas.get(chave)
+        if tarefa is None:
+            return
+        tarefa.interessados.discard(interessado)
+        if not tarefa.interessados and not tarefa.cancelada.is_set():
+            tarefa.cancelada.set()
+            tarefa.futuro.cancel()
+            self._tarefas.pop(chave, None)
+            self.canceladas += 1
+
+    def _executar(self, tarefa, funcao):
+        if tarefa.cancelada.is_set():
+            raise TarefaCancelada()
+        _atual.cancelada = tarefa.cancelada
+        try:
+            return funcao()
+        finally:
+            _atual.cancelada = None
+
+    def _encerrar(self, tarefa):
+        with self._trava:
+            if self._tarefas.get(tarefa.chave) is tarefa:
+                del self._tarefas[tarefa.chave]
+            if not tarefa.cancelada.is_set():
+                self.concluidas += 1
+
+    def estatisticas(self):
+        with self._trava:
+            return {
+                "em_andamento": len(self._tarefas),
+                "concluidas": self.concluidas,
+                "canceladas": self.canceladas,
+            }
+
+    def encerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from rh.base_preparada import COLUNAS_DATA, converter_texto_datas
+
+# Validação da base na leitura: todas as regras numa única passada vetorizada, com o resultado guardado
+# em uma coluna de bits por linha (uint8). As linhas com algum bit ligado ficam em quarentena: saem dos
+# indicadores e podem ser baixadas para correção. As datas não reconhecidas só podem ser vistas antes da
+# conversão, então os bits delas vêm da leitura em blocos (rh.ingestao); os demais são marcados aqui.
+
+COLUNA_INCONSISTENCIAS = "Inconsistências"
+COLUNA_PROBLEMAS = "Problemas"
+VALORES_SEXO = ["Masculino", "Feminino"]
+
+# Regras na ordem dos bits da coluna de inconsistências
+REGRAS = (
+    ["Desligado antes de Contratado"]
+    + [f"Data não reconhecida em {coluna}" for coluna in COLUNAS_DATA]
+    + ["Colaborador duplicado", "Sexo diferente de Masculino/Feminino"]
+)
+BIT_DESLIGADO_ANTES = 1 << 0
+BITS_DATAS = {coluna: 1 << (1 + posicao) for posicao, coluna in enumerate(COLUNAS_DATA)}
+BIT_DUPLICADO = 1 << (1 + len(COLUNAS_DATA))
+BIT_SEXO = BIT_DUPLICADO << 1
+
+
+# Converte as colunas de data do bloco (no próprio bloco) e devolve os bits das datas preenchidas que não
+# foram reconhecidas. `dayfirst` só vale para texto dia/mês/ano; datas ISO são lidas como ISO
+def converter_datas(bloco, dayfirst=False):
+    bits = np.zeros(len(bloco), dtype=np.uint8)
+    for coluna, bit in BITS_DATAS.items():
+        if coluna in bloco.columns and not pd.api.types.is_datetime64_any_dtype(bloco[coluna]):
+            convertida = converter_texto_datas(bloco[coluna], dayfirst)
+            bits[(bloco[coluna].notna() & convertida.isna()).to_numpy()] |= bit
+            bloco[coluna] = convertida
+    return bits
+
+
+# Acrescenta a coluna de inconsistências: `datas` são os bits da leitura (None se não houver) e `chave` a
+# coluna que identifica o colaborador (a última ocorrência de cada um é mantida, como no armazém)
+def marcar_inconsistencias(df, chave=None, datas=None):
+    bits = np.zeros(len(df), dtype=np.uint8) if datas is None else np.asarray(datas, dtype=np.uint8).copy()
+    if "Contratado" in df.columns and "Desligado" in df.columns:
+        bits[(df["Desligado"] < df["Contratado"]).to_numpy()] |= BIT_DESLIGADO_ANTES
+    if chave is not None and chave in df.columns:
+        bits[(df[chave].duplicated(keep="last") & df[chave].notna()).to_numpy()] |= BIT_DUPLICADO
+    if "Sexo" in df.columns:
+        bits[(~df["Sexo"].isin(VALORES_SEXO)).to_numpy()] |= BIT_SEXO
+    return df.assign(**{COLUNA_INCONSISTENCIAS: bits})
+
+
+def _bits(df):
+    return df[COLUNA_INCONSISTENCIAS].to_numpy()
+
+
+# Base usada nos indicadores: só as linhas sem inconsistências (bases sem a coluna passam inteiras)
+def sem_quarentena(df):
+    if COLUNA_INCONSISTENCIAS not in df.columns:
+        return df
+    validas = _bits(df) == 0
+    if validas.all():
+        return df.drop(columns=COLUNA_INCONSISTENCIAS)
+    return df[validas].drop(columns=COLUNA_INCONSISTENCIAS).reset_index(drop=True)
+
+
+# Quantidade de linhas por regra (uma linha pode violar mais de uma)
+def contar_inconsistencias(df):
+    bits = _bits(df) if COLUNA_INCONSISTENCIAS in df.columns else np.zeros(0, dtype=np.uint8)
+    return pd.DataFrame({
+        "Regra": REGRAS,
+        "Linhas": [int(np.count_nonzero(bits & (1 << posicao))) for posicao in range(len(REGRAS))],
+    })
+
+
+# Descrição das regras violadas para cada combinação de bits
+def descrever(bits):
+    return "; ".join(regra for posicao, regra in enumerate(REGRAS) if bits & (1 << posicao))
+
+
+# Linhas em quarentena, com a descrição dos problemas na primeira coluna
+def tabela_quarentena(df):
+    if COLUNA_INCONSISTENCIAS not in df.columns:
+        quarentena = df.iloc[:0].copy()
+        quarentena.insert(0, COLUNA_PROBLEMAS, pd.Series(dtype=object))
+        return quarentena
+    quarentena = df[_bits(df) != 0]
+    codigos = quarentena[COLUNA_INCONSISTENCIAS]
+    # Poucas combinações distintas: a descrição é montada uma vez por combinação
+    problemas = codigos.map({codigo: descrever(codigo) for codigo in codigos.unique()})
+    quarentena = quarentena.drop(columns=COLUNA_INCONSISTENCIAS)
+    quarentena.insert(0, COLUNA_PROBLEMAS, problemas.to_numpy())
+    return quarentena.reset_index(drop=True)
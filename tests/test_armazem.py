@@ -0,0 +1,85 @@
+import pandas as pd
+
+from rh.armazem import COLUNAS_CONTAGEM, ArmazemIncremental
+from rh.cubo_turnover import CuboTurnover
+from rh.efetivo import IndiceEfetivoSegmentado
+
+
+def _base(linhas):
+    colunas = ["Matrícula", "Sexo", "Função", "Contratado", "Desligado", "Estado", "Cidade"]
+    df = pd.DataFrame(linhas, columns=colunas)
+    df["Contratado"] = pd.to_datetime(df["Contratado"])
+    df["Desligado"] = pd.to_datetime(df["Desligado"])
+    return df
+
+
+PERIODOS = {
+    "2023-01": _base([
+        (1, "Feminino", "Analista", "2021-03-10", None, "SP", "Campinas"),
+        (2, "Masculino", "Analista", "2022-07-01", None, "SP", "São Paulo"),
+        (3, "Masculino", "Gerente", "2020-01-15", None, "RJ", "Niterói"),
+        (4, "Feminino", "Gerente", "2022-11-30", None, "RJ", "Rio de Janeiro"),
+    ]),
+    # Desligamento preenchido depois, troca de função e contratações novas
+    "2023-06": _base([
+        (1, "Feminino", "Analista", "2021-03-10", "2023-04-28", "SP", "Campinas"),
+        (2, "Masculino", "Gerente", "2022-07-01", None, "SP", "São Paulo"),
+        (5, "Feminino", "Analista", "2023-02-01", None, "MG", "Uberlândia"),
+        (6, "Masculino", "Estagiário", "2023-05-02", "2023-05-31", "SP", "Campinas"),
+    ]),
+    # Correção retroativa de uma contratação e ano novo com movimentação
+    "2024-02": _base([
+        (3, "Masculino", "Gerente", "2019-08-01", None, "RJ", "Niterói"),
+        (4, "Feminino", "Gerente", "2022-11-30", "2024-01-31", "RJ", "Rio de Janeiro"),
+        (7, "Feminino", "Estagiário", "2024-01-08", None, "MG", "Uberlândia"),
+    ]),
+}
+
+
+def _recalculo_completo(bases):
+    completa = pd.concat(bases, ignore_index=True).drop_duplicates(subset="Matrícula", keep="last")
+    return completa, CuboTurnover(IndiceEfetivoSegmentado(completa))
+
+
+def _comparar_cubos(incremental, completo):
+    assert incremental.periodos.equals(completo.periodos)
+    filtros = [{}] + [{"Sexo": sexo} for sexo in completo.valores("Sexo")] \
+        + [{"Função": funcao} for funcao in completo.valores("Função")] \
+        + [dict(zip(completo.colunas, chave)) for chave in completo.combinacoes()]
+    for filtro in filtros:
+        pd.testing.assert_frame_equal(incremental.fatiar(filtro), completo.fatiar(filtro), obj=str(filtro))
+
+
+def test_cargas_incrementais_igualam_o_recalculo_completo(tmp_path):
+    armazem = ArmazemIncremental(str(tmp_path))
+    carregadas = []
+    for periodo, base in PERIODOS.items():
+        armazem.acrescentar(base, periodo, hash_arquivo=periodo)
+        carregadas.append(base)
+        completa, cubo = _recalculo_completo(carregadas)
+
+        _comparar_cubos(armazem.cubo(), cubo)
+        dados = armazem.dados().sort_values("Matrícula").reset_index(drop=True)
+        assert dados["Matrícula"].tolist() == sorted(completa["Matrícula"])
+        contagens = armazem.contagens()
+        for coluna in COLUNAS_CONTAGEM:
+            if coluna in completa.columns:
+                esperado = completa[coluna].value_counts().sort_index()
+                assert contagens[coluna].sort_index().to_dict() == esperado.to_dict(), coluna
+
+
+def test_colaborador_repetido_conta_so_a_versao_mais_recente(tmp_path):
+    armazem = ArmazemIncremental(str(tmp_path))
+    armazem.acrescentar(_base([(1, "Feminino", "Analista", "2022-03-01", None, "SP", "Campinas")]), "2022-12")
+    resumo = armazem.acrescentar(
+        _base([(1, "Feminino", "Gerente", "2022-03-01", "2023-05-15", "RJ", "Niterói")]), "2023-06")
+    assert (resumo["novos"], resumo["atualizados"]) == (0, 1)
+
+    dados = armazem.dados()
+    assert len(dados) == 1 and dados["Função"].iloc[0] == "Gerente"
+    cubo = armazem.cubo()
+    assert cubo.resumo_ano(2022) == {"entradas": 1, "saidas": 0, "ativos_inicio": 0, "ativos_fim": 1}
+    assert cubo.resumo_ano(2023) == {"entradas": 0, "saidas": 1, "ativos_inicio": 1, "ativos_fim": 0}
+    assert cubo.resumo_ano(2022, {"Função": "Analista"})["entradas"] == 0
+    assert cubo.resumo_ano(2022, {"Função": "Gerente"})["entradas"] == 1
+    assert armazem.contagens()["Estado"].to_dict() == {"RJ": 1}
@@ -0,0 +1,20 @@
+import pandas as pd
+
+from rh.base_preparada import BasePreparada
+
+
+def test_memoria_original_medida_antes_da_compactacao():
+    original = pd.DataFrame({
+        "Sexo": ["Feminino", "Masculino"] * 500,
+        "Função": ["Analista", "Gerente", "Diretor", "Estagiário"] * 250,
+        "Contratado": ["2020-01-15", "2021-06-30"] * 500,
+        "Matrícula": range(1000),
+    })
+    esperado = int(original.memory_usage(deep=True).sum())
+    base = BasePreparada(original, "2024-01-01")
+    memoria = base.memoria()
+    assert memoria["original"] == esperado
+    assert memoria["preparada"] < memoria["original"] and memoria["economia_percentual"] > 0
+    assert base.com_referencia("2025-01-01").memoria()["original"] == esperado
+    # A base recebida não é alterada pela compactação
+    assert not isinstance(original["Sexo"].dtype, pd.CategoricalDtype) and int(original.memory_usage(deep=True).sum()) == esperado
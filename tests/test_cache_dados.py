@@ -0,0 +1,42 @@
+import os
+
+import pandas as pd
+import pytest
+
+from rh import cache_dados
+from rh.cache_dados import carregar_com_cache, chave_para_processos, existe_cache, gravar_cache, limpar_cache
+
+
+def test_entrada_maior_que_o_limite_nao_e_removida_ao_gravar(tmp_path, monkeypatch):
+    monkeypatch.setattr("rh.cache_dados.LIMITE_MB_CACHE", 0)
+    gravar_cache("antiga", pd.DataFrame({"a": [1]}), str(tmp_path))
+    df = carregar_com_cache(b"conteudo", lambda conteudo: pd.DataFrame({"a": range(1000)}), diretorio=str(tmp_path))
+    assert len(df) == 1000
+    assert not existe_cache("antiga", str(tmp_path))
+
+
+def test_limpar_cache_respeita_limite(tmp_path):
+    gravar_cache("x", pd.DataFrame({"a": range(1000)}), str(tmp_path))
+    assert existe_cache("x", str(tmp_path))
+    limpar_cache(str(tmp_path), limite_mb=0)
+    assert not existe_cache("x", str(tmp_path))
+
+
+def test_chave_para_processos_usa_a_base_ou_a_chave(tmp_path):
+    df = pd.DataFrame({"a": [1, 2]})
+    chave = chave_para_processos(df, diretorio=str(tmp_path))
+    assert existe_cache(chave, str(tmp_path))
+    assert chave_para_processos(chave=chave, diretorio=str(tmp_path)) == chave
+    with pytest.raises(ValueError):
+        chave_para_processos(df, chave, str(tmp_path))
+    with pytest.raises(KeyError):
+        chave_para_processos(chave="inexistente", diretorio=str(tmp_path))
+
+
+def test_entradas_de_outro_formato_nao_sao_lidas(tmp_path, monkeypatch):
+    ler = lambda conteudo: pd.DataFrame({"a": [1, 2]})
+    carregar_com_cache(b"conteudo", ler, diretorio=str(tmp_path))
+    monkeypatch.setattr(cache_dados, "SUFIXO_FORMATO", "v2")
+    lidas = []
+    carregar_com_cache(b"conteudo", lambda conteudo: lidas.append(1) or ler(conteudo), diretorio=str(tmp_path))
+    assert lidas == [1] and len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rh.coortes import matriz_retencao, meses_completos, sobrevivencia_tempo_casa
+
+
+# Maior n com inicio + n meses <= fim (pd.DateOffset limita o dia ao fim do mês)
+def _meses_dateoffset(inicio, fim):
+    if pd.isna(inicio) or pd.isna(fim):
+        return -1
+    meses = (fim.year - inicio.year) * 12 + fim.month - inicio.month
+    while inicio + pd.DateOffset(months=meses) > fim:
+        meses -= 1
+    while inicio + pd.DateOffset(months=meses + 1) <= fim:
+        meses += 1
+    return meses
+
+
+def test_meses_completos_igual_ao_dateoffset():
+    datas = pd.to_datetime([
+        "2020-01-31", "2020-02-28", "2020-02-29", "2020-03-01", "2020-03-31", "2020-04-30", "2021-02-28",
+        "2021-03-01", "2023-12-31", "2024-01-15 10:00", "2024-01-15 08:00", "2024-02-29", "2025-02-28",
+        "1999-12-31", None,
+    ], format="ISO8601")
+    inicio, fim = np.meshgrid(datas.to_numpy(), datas.to_numpy())
+    inicio, fim = inicio.ravel(), fim.ravel()
+    esperado = [_meses_dateoffset(pd.Timestamp(a), pd.Timestamp(b)) for a, b in zip(inicio, fim)]
+    assert meses_completos(inicio, fim).tolist() == esperado
+
+
+# Referência 15/04/2023. Janeiro: A (ativo, 3 meses) e B (sai com 1 mês); fevereiro: C (sai no
+# primeiro mês) e D (ativo, observado só 1 mês, já que 15/04 é antes do aniversário em 28/04)
+BASE = pd.DataFrame({
+    "Contratado": pd.to_datetime(["2023-01-10", "2023-01-20", "2023-02-05", "2023-02-28", None]),
+    "Desligado": pd.to_datetime([None, "2023-02-25", "2023-02-10", None, "2023-03-01"]),
+})
+
+
+def test_matriz_retencao_calculada_a_mao():
+    matriz = matriz_retencao(BASE, "2023-04-15", freq="M", horizonte=3)
+    assert matriz.index.tolist() == ["2023-01", "2023-02"]
+    assert matriz["Contratados"].tolist() == [2, 2]
+    # Células que a coorte inteira ainda não alcançou ficam vazias
+    np.testing.assert_array_equal(matriz.loc["2023-01", [0, 1, 2, 3]].to_numpy(dtype=float), [100, 100, 50, np.nan])
+    np.testing.assert_array_equal(matriz.loc["2023-02", [0, 1, 2, 3]].to_numpy(dtype=float), [100, 50, np.nan, np.nan])
+
+
+def test_kaplan_meier_calculado_a_mao():
+    curva = sobrevivencia_tempo_casa(BASE, "2023-04-15", horizonte=3)
+    assert curva["Em risco"].tolist() == [4, 3, 1, 1]
+    assert curva["Desligamentos"].tolist() == [1, 1, 0, 0]
+    # S(0) = 3/4; S(1) = 3/4 * 2/3; sem saídas depois disso
+    assert curva["Sobrevivência"].tolist() == pytest.approx([75, 50, 50, 50])
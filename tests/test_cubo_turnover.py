@@ -0,0 +1,44 @@
+import pandas as pd
+
+from rh.cubo_turnover import CuboTurnover
+from rh.efetivo import IndiceEfetivoSegmentado
+
+BASE = pd.DataFrame({
+    "Sexo": ["Feminino", "Feminino", "Masculino", "Masculino", "Feminino", "Masculino", "Feminino", "Masculino", None],
+    "Função": ["Analista", "Gerente", "Analista", "Analista", "Analista", "Gerente", "Analista", "Analista", "Gerente"],
+    "Contratado": pd.to_datetime(["2022-01-01", "2022-06-15", "2021-03-01", "2023-03-01", "2021-12-31", "2023-01-01",
+                                  "2023-12-31", None, "2022-02-10"]),
+    "Desligado": pd.to_datetime([None, "2022-06-15", "2023-02-01", "2023-12-31", "2023-01-01", None, None,
+                                 "2022-04-01", "2023-08-20"]),
+})
+
+
+def _filtrar(df, filtros):
+    for coluna, valor in filtros.items():
+        if valor != "Todos":
+            df = df[df[coluna] == valor]
+    return df
+
+
+# Quem sai no próprio dia ainda conta como ativo, como na aba Rotatividade
+def _ativos(df, data):
+    return int(((df["Contratado"] <= data) & (df["Desligado"].isna() | (df["Desligado"] >= data))).sum())
+
+
+def test_fatias_iguais_ao_groupby_da_base():
+    cubo = CuboTurnover(IndiceEfetivoSegmentado(BASE))
+    for filtros in ({"Sexo": "Todos", "Função": "Todos"}, {"Sexo": "Feminino", "Função": "Analista"},
+                    {"Sexo": "Masculino", "Função": "Todos"}):
+        df = _filtrar(BASE, filtros)
+        fatia = cubo.fatiar(filtros)
+        for coluna, metrica in (("Contratado", "Contratações"), ("Desligado", "Desligamentos")):
+            esperado = df.groupby(df[coluna].dt.to_period("M")).size().reindex(cubo.periodos, fill_value=0)
+            assert fatia[metrica].tolist() == esperado.tolist(), (filtros, metrica)
+
+        for ano in (2021, 2022, 2023):
+            assert cubo.resumo_ano(ano, filtros) == {
+                "entradas": int((df["Contratado"].dt.year == ano).sum()),
+                "saidas": int((df["Desligado"].dt.year == ano).sum()),
+                "ativos_inicio": _ativos(df, f"{ano}-01-01"),
+                "ativos_fim": _ativos(df, f"{ano}-12-31"),
+            }, (filtros, ano)
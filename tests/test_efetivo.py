@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from rh.efetivo import IndiceEfetivoSegmentado
+
+# Datas vazias, contratação e desligamento no mesmo dia, desligamento anterior à contratação
+BASE = pd.DataFrame({
+    "Sexo": ["Feminino", "Feminino", "Masculino", "Masculino", "Feminino", "Masculino", "Feminino", "Masculino"],
+    "Função": ["Analista", "Gerente", "Analista", "Analista", "Analista", "Gerente", "Gerente", "Analista"],
+    "Contratado": pd.to_datetime(["2022-01-01", "2022-06-15", None, "2023-03-01", "2021-12-31", "2023-01-01",
+                                  "2022-06-15", "2023-05-10"]),
+    "Desligado": pd.to_datetime([None, "2022-06-15", "2023-02-01", "2023-12-31", "2023-01-01", None, None,
+                                 "2023-04-01"]),
+})
+
+DATAS = ["2021-12-31", "2022-01-01", "2022-06-14", "2022-06-15", "2022-06-16", "2022-12-31", "2023-01-01",
+         "2023-02-01", "2023-12-31", "2024-01-01"]
+
+
+# Cálculo original, com máscaras sobre a base
+def _ativos_mascara(df, data, desligamento_inclusivo=False):
+    data = pd.Timestamp(data)
+    saida = df["Desligado"] >= data if desligamento_inclusivo else df["Desligado"] > data
+    return int(((df["Contratado"] <= data) & (df["Desligado"].isna() | saida)).sum())
+
+
+def test_indice_igual_as_mascaras_da_base():
+    indice = IndiceEfetivoSegmentado(BASE)
+    recortes = [({}, BASE), ({"Sexo": "Feminino"}, BASE[BASE["Sexo"] == "Feminino"]),
+                ({"Sexo": "Masculino", "Função": "Analista"},
+                 BASE[(BASE["Sexo"] == "Masculino") & (BASE["Função"] == "Analista")])]
+    for filtros, df in recortes:
+        filtrado = indice.filtrar(filtros)
+        for inclusivo in (False, True):
+            esperado = [_ativos_mascara(df, data, inclusivo) for data in DATAS]
+            assert np.asarray(filtrado.ativos(DATAS, desligamento_inclusivo=inclusivo)).tolist() == esperado, (filtros, inclusivo)
+        assert filtrado.ativos("2022-06-15") == _ativos_mascara(df, "2022-06-15")
+        for ano in (2021, 2022, 2023, 2024):
+            assert filtrado.entradas_no_ano(ano) == int((df["Contratado"].dt.year == ano).sum()), (filtros, ano)
+            assert filtrado.saidas_no_ano(ano) == int((df["Desligado"].dt.year == ano).sum()), (filtros, ano)
@@ -0,0 +1,41 @@
+import os
+import sqlite3
+
+from rh.fonte_sql import FonteSQL
+
+
+def _criar_banco(caminho):
+    with sqlite3.connect(caminho) as conexao:
+        conexao.execute('CREATE TABLE colaboradores ("Contratado" TEXT, "Desligado" TEXT, "Sexo" TEXT, "Função" TEXT)')
+        conexao.executemany(
+            "INSERT INTO colaboradores VALUES (?, ?, ?, ?)",
+            [("2020-01-10", None, "Masculino", "Analista"), ("2021-03-05", "2022-01-31", "Feminino", "Gerente")],
+        )
+
+
+def test_versao_muda_com_o_conteudo(tmp_path):
+    caminho = str(tmp_path / "base.db")
+    _criar_banco(caminho)
+    fonte = FonteSQL.de_url(f"sqlite:///{caminho}")
+    antes = fonte.versao()
+    assert fonte.versao() == antes
+
+    # Troca de Sexo não muda contagens nem datas extremas
+    with sqlite3.connect(caminho) as conexao:
+        conexao.execute("UPDATE colaboradores SET \"Sexo\" = 'Feminino' WHERE \"Função\" = 'Analista'")
+    # Garante mtime diferente em sistemas de arquivos de resolução baixa
+    os.utime(caminho, ns=(os.stat(caminho).st_atime_ns, os.stat(caminho).st_mtime_ns + 1))
+    assert fonte.versao() != antes
+    fonte.fechar()
+
+
+def test_versao_rele_as_colunas(tmp_path):
+    caminho = str(tmp_path / "base.db")
+    _criar_banco(caminho)
+    fonte = FonteSQL.de_url(f"sqlite:///{caminho}")
+    fonte.versao()
+    with sqlite3.connect(caminho) as conexao:
+        conexao.execute('ALTER TABLE colaboradores ADD COLUMN "Cidade" TEXT')
+    fonte.versao()
+    assert "Cidade" in fonte.colunas()
+    fonte.fechar()
@@ -0,0 +1,108 @@
+import os
+import shutil
+
+import pytest
+
+from rh import geografia
+
+
+def test_estados_distribuidos_com_o_codigo():
+    geojson, por_sigla = geografia.carregar_estados()
+    assert len(geojson["features"]) == 27 and sorted(por_sigla) == sorted(geografia.CODIGOS_UF.values())
+
+
+def test_sem_arquivos_nao_baixa_por_padrao(tmp_path, monkeypatch):
+    monkeypatch.setattr(geografia, "DIRETORIO_DADOS", str(tmp_path / "dados"))
+    monkeypatch.setattr(geografia, "DIRETORIO_CACHE", str(tmp_path / "cache"))
+
+    def baixar(url):
+        raise AssertionError("download sem STOG_GEOGRAFIA_DOWNLOAD")
+
+    monkeypatch.setattr(geografia, "_baixar", baixar)
+    assert geografia.carregar_estados() == (None, {})
+
+
+def test_falha_no_download_dos_estados_nao_fica_em_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(geografia, "DIRETORIO_DADOS", str(tmp_path / "dados"))
+    monkeypatch.setattr(geografia, "DIRETORIO_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(geografia, "DOWNLOAD_GEOGRAFIA", True)
+    monkeypatch.setattr(geografia, "_download_estados", {"falha": None, "trava": geografia.threading.Lock()})
+    monkeypatch.setattr(geografia, "INTERVALO_NOVO_DOWNLOAD", 0)
+
+    def falhar(url):
+        raise OSError("sem rede")
+
+    monkeypatch.setattr(geografia, "_baixar", falhar)
+    assert geografia.carregar_estados() == (None, {})
+
+    estado = {"type": "Feature", "properties": {"sigla": "SP"},
+              "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 0]]]}}
+    monkeypatch.setattr(geografia, "_baixar", lambda url: {"type": "FeatureCollection", "features": [estado]})
+    geojson, por_sigla = geografia.carregar_estados()
+    assert geojson is not None and list(por_sigla) == ["SP"]
+
+
+DADOS_TESTE = os.path.join(os.path.dirname(__file__), "dados")
+
+
+@pytest.fixture
+def municipios(tmp_path, monkeypatch):
+    destino = str(tmp_path / "dados")
+    resumo = geografia.preparar_municipios(os.path.join(DADOS_TESTE, "ibge_malha_municipios.geojson"),
+                                           os.path.join(DADOS_TESTE, "ibge_municipios.json"), destino)
+    monkeypatch.setattr(geografia, "DIRETORIO_DADOS", destino)
+    monkeypatch.setattr(geografia, "DIRETORIO_CACHE", str(tmp_path / "cache"))
+    for funcao in (geografia.carregar_municipios, geografia._malha_uf, geografia._microrregioes):
+        funcao.cache_clear()
+    yield resumo
+    for funcao in (geografia.carregar_municipios, geografia._malha_uf, geografia._microrregioes):
+        funcao.cache_clear()
+
+
+def test_preparar_municipios(municipios):
+    assert municipios["municipios"] == 8
+    # A microrregião de São Pedro vem da região imediata
+    assert geografia.dados_municipios([3550407]) == [("São Pedro", "SP", 350012, "Piracicaba")]
+
+
+def test_codigos_municipios_por_nome(municipios):
+    cidades = ["Campinas", "CAMPINAS - SP", "Campinas/SP", "sao paulo", "Embu", "Parati", "Bom Jesus", "Bom Jesus",
+               "Bom Jesus", "Cidade Inexistente", None]
+    estados = ["São Paulo", None, None, "SP", "SP", "Rio de Janeiro", "PI", "Rio Grande do Sul", None, "SP", "SP"]
+    codigos = geografia.codigos_municipios(cidades, estados).tolist()
+    assert codigos == [3509502, 3509502, 3509502, 3550308, 3515004, 3303807, 2201903, 4302303, -1, -1, -1]
+
+
+def test_geometria_por_nivel(municipios):
+    assert geografia.escolher_nivel(10, 2) == ("microrregioes", None)
+    assert geografia.escolher_nivel(10, 1) == ("municipios", "detalhado")
+    assert geografia.escolher_nivel(geografia.LIMITE_MUNICIPIOS_DETALHADOS + 1, 1) == ("municipios", "medio")
+    assert geografia.escolher_nivel(10, 2, "municipios") == ("municipios", "detalhado")
+
+    detalhado = geografia.geojson_municipios([3509502, 3304557], "detalhado")
+    medio = geografia.geojson_municipios([3509502, 3304557], "medio")
+    assert [f["id"] for f in detalhado["features"]] == ["3509502", "3304557"]
+    assert geografia.contar_vertices(medio) < geografia.contar_vertices(detalhado)
+    assert [f["id"] for f in geografia.geojson_microrregioes([35032, 33018])["features"]] == ["35032", "33018"]
+
+
+def test_sem_malha_detalhada_usa_o_nivel_medio(municipios, tmp_path):
+    shutil.rmtree(tmp_path / "dados" / geografia.DIRETORIO_MALHA_MUNICIPIOS / "detalhado")
+    assert geografia.niveis_disponiveis() == ["medio"]
+    assert geografia.escolher_nivel(10, 1) == ("municipios", "medio")
+    assert geografia.municipios_disponiveis()
+
+    os.remove(tmp_path / "dados" / geografia.ARQUIVO_MICRORREGIOES)
+    assert not geografia.municipios_disponiveis()
+
+
+def test_municipios_distribuidos_com_o_codigo():
+    geografia.carregar_municipios.cache_clear()
+    try:
+        assert geografia.municipios_disponiveis()
+        assert len(geografia.carregar_municipios()["municipios"]) == 5564
+        assert geografia.codigos_municipios(["Embu", "Campinas"], ["SP", "SP"]).tolist() == [3515004, 3509502]
+        assert geografia.geojson_municipios([3509502], "medio")["features"][0]["id"] == "3509502"
+    finally:
+        geografia.carregar_municipios.cache_clear()
+        geografia._malha_uf.cache_clear()
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from rh.ingestao import ler_base
+from rh.validacao import COLUNA_INCONSISTENCIAS
+
+CABECALHO = "Matrícula;Contratado;Desligado;Sexo;Função;Data de Nascimento\n"
+
+
+def _ler_csv(linhas):
+    conteudo = (CABECALHO + "".join(linha + "\n" for linha in linhas)).encode("utf-8")
+    return ler_base(conteudo, "base.csv", validar=True)
+
+
+def test_csv_com_datas_iso_mantem_dia_e_mes():
+    df = _ler_csv([
+        "1;2020-01-05;2020-01-20;Feminino;Analista;1979-03-04",
+        "2;2021-12-31;;Masculino;Gerente;1985-07-15",
+    ])
+    assert df["Contratado"].tolist() == [pd.Timestamp("2020-01-05"), pd.Timestamp("2021-12-31")]
+    assert df["Desligado"].iloc[0] == pd.Timestamp("2020-01-20")
+    assert df["Data de Nascimento"].iloc[0] == pd.Timestamp("1979-03-04")
+    assert (df[COLUNA_INCONSISTENCIAS] == 0).all()
+
+
+def test_csv_com_datas_brasileiras_le_dia_primeiro():
+    df = _ler_csv([
+        "1;05/01/2020;20/01/2020;Feminino;Analista;04/03/1979",
+        "2;31/12/2021;;Masculino;Gerente;15/07/1985",
+    ])
+    assert df["Contratado"].tolist() == [pd.Timestamp("2020-01-05"), pd.Timestamp("2021-12-31")]
+    assert df["Desligado"].iloc[0] == pd.Timestamp("2020-01-20")
+    assert df["Data de Nascimento"].iloc[0] == pd.Timestamp("1979-03-04")
+    assert (df[COLUNA_INCONSISTENCIAS] == 0).all()
+
+
+def test_csv_com_data_nao_reconhecida_vai_para_quarentena():
+    df = _ler_csv([
+        "1;2020-01-05;;Feminino;Analista;1979-03-04",
+        "2;não sei;;Masculino;Gerente;1985-07-15",
+    ])
+    assert df[COLUNA_INCONSISTENCIAS].tolist()[0] == 0
+    assert df[COLUNA_INCONSISTENCIAS].tolist()[1] != 0
+
+
+def test_excel_sem_colunas_esperadas_levanta_value_error():
+    import io
+
+    import pytest
+
+    buffer = io.BytesIO()
+    pd.DataFrame({"Outra": [1, 2]}).to_excel(buffer, sheet_name="BD", index=False)
+    with pytest.raises(ValueError, match="colunas esperadas"):
+        ler_base(buffer.getvalue(), "base.xlsx")
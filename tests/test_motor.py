@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from rh import motor
+from rh.cubo_turnover import CuboTurnover
+from rh.efetivo import IndiceEfetivoSegmentado
+
+BASE = pd.DataFrame({
+    "Sexo": ["Feminino", "Feminino", "Masculino", "Masculino", "Feminino", "Masculino", "Feminino", "Masculino"],
+    "Função": ["Analista", "Gerente", "Analista", "Analista", "Analista", "Gerente", "Analista", "Gerente"],
+    "Contratado": pd.to_datetime(["2021-01-04", "2021-06-15", "2021-03-01", "2022-03-01", "2021-12-31", "2022-01-01",
+                                  "2023-07-31", "2020-05-05"]),
+    "Desligado": pd.to_datetime([None, "2022-06-15", "2023-02-01", "2022-12-31", "2023-01-01", None, None,
+                                 "2021-09-30"]),
+})
+
+
+@pytest.fixture
+def cubo():
+    return CuboTurnover(IndiceEfetivoSegmentado(BASE))
+
+
+def test_dezembro_igual_ao_turnover_anual(cubo):
+    geral = motor.tendencia_movel(cubo).set_index("Mês")
+    por_sexo = motor.tendencia_movel(cubo, quebra="Sexo").set_index(["Segmento", "Mês"])
+    for ano in sorted(set(cubo.periodos.year)):
+        dezembro = pd.Timestamp(f"{ano}-12-01")
+        anual = motor.indicadores_turnover(cubo, ano)
+        assert geral.loc[dezembro, "Turnover 12m"] == pytest.approx(anual["turnover_anual"])
+        assert geral.loc[dezembro, "Contratações 12m"] == anual["entradas"]
+        assert geral.loc[dezembro, "Desligamentos 12m"] == anual["saidas"]
+        assert geral.loc[dezembro, "Média de colaboradores"] == anual["media_colaboradores"]
+        for sexo in ("Feminino", "Masculino"):
+            anual = motor.indicadores_turnover(cubo, ano, {"Sexo": sexo})
+            assert por_sexo.loc[(sexo, dezembro), "Turnover 12m"] == pytest.approx(anual["turnover_anual"])
+
+
+def test_historico_menor_que_a_janela(cubo):
+    meses = len(cubo.periodos)
+    assert len(motor.tendencia_movel(cubo, janela=meses)) == 1
+    vazio = motor.tendencia_movel(cubo, janela=meses + 1)
+    assert vazio.empty and "Turnover 12m" in vazio.columns
+    assert motor.tendencia_movel(CuboTurnover.de_dataframe(pd.DataFrame(columns=["Ano", "Mês"]))).empty
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from rh import previsao
+from rh.previsao import CacheModelos, prever_series
+
+
+def _series(quantidade):
+    meses = pd.period_range("2021-01", periods=30, freq="M")
+    return {f"s{i}": pd.Series(np.arange(30, dtype=float) + i, index=meses) for i in range(quantidade)}
+
+
+def test_prever_series_em_paralelo(tmp_path):
+    series = _series(8)
+    resultados, ajustadas = prever_series(series, processos=2, cache=CacheModelos(str(tmp_path)))
+    assert ajustadas == 8 and set(resultados) == set(series)
+    # Na segunda vez, tudo vem do cache
+    assert prever_series(series, processos=2, cache=CacheModelos(str(tmp_path)))[1] == 0
+
+
+def test_cache_de_modelos_remove_os_antigos(tmp_path):
+    cache = CacheModelos(str(tmp_path))
+    cache.guardar("antigo", {"previsao": [1.0]})
+    cache.guardar("novo", {"previsao": [2.0]})
+    antigo = os.path.join(str(tmp_path), "antigo.json")
+    os.utime(antigo, (0, 0))
+    cache.limpar(idade_maxima_dias=1)
+    assert sorted(os.listdir(str(tmp_path))) == ["novo.json"]
+    cache.limpar(limite_mb=0)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_ajustes_em_memoria_limitados(tmp_path, monkeypatch):
+    monkeypatch.setattr(previsao, "MAX_MODELOS_MEMORIA", 2)
+    cache = CacheModelos(str(tmp_path))
+    for chave in ("a", "b", "c"):
+        cache.guardar(chave, {"previsao": [1.0]})
+    assert list(cache._memoria) == ["b", "c"]
+    # O mais antigo volta do disco e vira o mais recente
+    assert cache.obter("a") == {"previsao": [1.0]}
+    assert list(cache._memoria) == ["c", "a"]
+
+    cache.limpar(limite_mb=0)
+    assert not cache._memoria and cache.obter("a") is None
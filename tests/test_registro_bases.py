@@ -0,0 +1,54 @@
+import pandas as pd
+
+from rh import registro_bases
+from rh.registro_bases import RegistroBases
+
+
+def test_derivados_sao_descartados_com_a_base():
+    registro = RegistroBases(limite_mb=1)
+    registro.registrar("a", pd.DataFrame({"x": range(10)}), sessao="s1")
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        return object()
+
+    primeiro = registro.derivado("a", "indice", calcular)
+    assert registro.derivado("a", "indice", calcular) is primeiro
+    assert registro.derivado("a", "indice", calcular, parametros="2024-01-01") is not primeiro
+    assert len(chamadas) == 2
+
+    # O derivado conta na memória da entrada; sem sessão e acima do limite, sai junto com a base
+    registro.derivado("a", "grande", lambda: None, memoria=lambda objeto: 2 * 1024 * 1024)
+    assert "a" in registro
+    registro.liberar("s1")
+    assert "a" not in registro
+    assert registro.derivado("a", "indice", calcular) is not primeiro
+    assert len(chamadas) == 3
+
+
+def test_derivados_por_parametros(monkeypatch):
+    monkeypatch.setattr(registro_bases, "MAX_DERIVADOS_POR_NOME", 2)
+    registro = RegistroBases()
+    registro.registrar("a", pd.DataFrame({"x": range(10)}), sessao="s1")
+    bytes_base = registro._bases["a"].bytes
+
+    def calcular(data):
+        return lambda: {"data": data}
+
+    # Duas sessões alternando datas de referência não recalculam a cada troca
+    jan = registro.derivado("a", "base_preparada", calcular("2024-01"), "2024-01", memoria=lambda objeto: 100)
+    fev = registro.derivado("a", "base_preparada", calcular("2024-02"), "2024-02", memoria=lambda objeto: 100)
+    assert registro.derivado("a", "base_preparada", calcular("2024-01"), "2024-01") is jan
+    assert registro.derivado("a", "base_preparada", calcular("2024-02"), "2024-02") is fev
+    assert registro._bases["a"].bytes == bytes_base + 200
+
+    # Acima do limite por nome sai a variação usada há mais tempo (janeiro); outros nomes não contam
+    registro.derivado("a", "indice", calcular(None))
+    registro.derivado("a", "base_preparada", calcular("2024-03"), "2024-03", memoria=lambda objeto: 100)
+    assert registro.derivado("a", "base_preparada", calcular("2024-02"), "2024-02") is fev
+    assert registro.derivado("a", "base_preparada", calcular("2024-01"), "2024-01", memoria=lambda objeto: 100) is not jan
+    # Fevereiro foi usado depois de março, então março é o que sai agora
+    assert sorted(registro._bases["a"].derivados) == [("base_preparada", "2024-01"), ("base_preparada", "2024-02"),
+                                                      ("indice", None)]
+    assert registro._bases["a"].bytes == bytes_base + 200
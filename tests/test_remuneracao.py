@@ -0,0 +1,9 @@
+from rh.remuneracao import _mes_competencia
+
+
+def test_competencia_iso_e_brasileira():
+    meses = _mes_competencia(["2024-03-01", "2024-04-01", "2024-12-01", "2024-03", "03/2024", "15/03/2024", None])
+    assert [(mes // 12, mes % 12 + 1) for mes in meses[:-1]] == [
+        (2024, 3), (2024, 4), (2024, 12), (2024, 3), (2024, 3), (2024, 3)
+    ]
+    assert meses[-1] == -1